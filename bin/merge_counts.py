@@ -0,0 +1,14 @@
+#!/usr/bin/env python
+import argparse
+from snlp.mwes.spill import merge_partial_counts
+
+parser = argparse.ArgumentParser(
+    description="Merge partial counts written by MWE.build_counts(partial=True) into one count store."
+)
+parser.add_argument(
+    "output",
+    help="Output path: a CountStore directory, a .json file, or a .partial directory that can be merged again.",
+)
+parser.add_argument("partials", nargs="+", help="Directories of partial counts, e.g. count_data.partial.")
+args = parser.parse_args()
+merge_partial_counts(args.partials, output_path=args.output)
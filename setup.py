@@ -27,6 +27,6 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=requirements,
-    scripts=['bin/downloads.py'],
+    scripts=['bin/downloads.py', 'bin/merge_counts.py'],
     python_requires='>=3.9.9',
 )
\ No newline at end of file
@@ -1,6 +1,5 @@
 from pydoc import text
 import dash
-import json
 import random
 import dash_table
 
@@ -14,6 +13,7 @@ from operator import add
 from dash.dependencies import Input, Output
 from snlp.text_analysis.visual_analysis import do_analysis, plotly_wordcloud, generate_label_plots
 from snlp.mwes import MWE
+from snlp.mwes.mwe_utils import load_mwe_data
 
 
 # Process data
@@ -62,8 +62,7 @@ fig_verb_cloud.update_layout(word_cloud_setup)
 mwe = MWE(df=imdb_train, mwe_types=["NC", "JNC"], text_column='text')
 mwe.build_counts()
 mwe.extract_mwes()
-with open(mwe.mwe_file, "r") as file:
-    mwes_dict = json.load(file)
+mwes_dict = load_mwe_data(mwe.mwe_file)
 
 def mwe_dict_to_tabledata(mwe_dict, mwe_type, max_n=100):
     # ncs = []
@@ -1,2 +1,11 @@
-from snlp.mwes.mwe_utils import replace_mwes
-from snlp.mwes.mwe import MWE
\ No newline at end of file
+from snlp.mwes.mwe_utils import replace_mwes, replace_mwes_in_source, MWEReplacer
+from snlp.mwes.mwe import MWE
+from snlp.mwes.patterns import register_mwe_type
+from snlp.mwes.count_store import CountStore
+from snlp.mwes.ngrams import count_ngrams, NgramIndex
+from snlp.mwes.result_cache import ResultCache
+from snlp.mwes.spill import merge_partial_counts, write_partial_counts
+from snlp.mwes.score_index import MWEIndex
+from snlp.mwes.cooccurrence import count_cooccurrences, Cooccurrences
+from snlp.mwes.vectorizer import MWEVectorizer
+from snlp.mwes.windowed import WindowedCounts
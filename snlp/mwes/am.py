@@ -1,73 +1,592 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple, Union
 import math
+import re
+import numpy as np
+from snlp.mwes.count_store import CountStore, unpack_pairs
+from snlp.mwes.sketch import ApproximateCounts
+
+# Association measures supported by calculate_am. Besides these, pmi<k> such as pmi2 or pmi3 computes PMI^k.
+AMS = ["pmi", "npmi", "llr", "tscore", "chi2", "dice"]
+PMI_K_PATTERN = re.compile("pmi([2-9]|[1-9][0-9]+)$")
+
+
+def check_ams(am: Union[str, List[str]]) -> List[str]:
+    """Validate one or several association measures.
+
+    Args:
+        am: Name of an association measure, or a list of names. Can be any of AMS or pmi<k>, e.g. pmi3.
+
+    Returns:
+        ams: List of association measure names.
+    """
+    ams = [am] if isinstance(am, str) else list(am)
+    if len(ams) == 0:
+        raise ValueError("At least one association measure must be given.")
+    for a in ams:
+        if a not in AMS and not PMI_K_PATTERN.match(a):
+            raise ValueError(f"am must be any of {AMS} or pmi<k>, e.g. pmi3. Currently it is {a}.")
+    return ams
 
 
 def calculate_pmi(
-    compound_dict: dict, word_dic: dict, num_compound: int, num_words: int, normalize: bool = False
+    compound_dict: dict,
+    word_dic: dict,
+    num_compound: int,
+    num_words: int,
+    normalize: bool = False,
+    word_freq_cutoff: int = 10,
+    top_k: Optional[int] = None,
+    min_score: Optional[float] = None,
 ) -> Dict[str, float]:
     """Calculate Pointwise Mutual Information between the two words of every word pair in nn_dict.
 
     Args:
-        compound_dict: Dictionary of compounds and their count.
+        compound_dict: Dictionary of compounds and their count. It is not modified.
         word_dic: Dictionary of words and their count.
         num_compound: Number of compounds.
         num_words: Number of words.
         normalize: Whether or not normalize the pmi score. Normalized pmi is referred to as npmi.
+        word_freq_cutoff: Compounds with a word that occurs word_freq_cutoff times or fewer get a score of 0.0.
+                          This filters out compounds that are rare because of strange/misspelled words.
+        top_k: If given, only the top_k compounds with the highest scores are returned.
+        min_score: If given, only compounds with a score greater than or equal to min_score are returned.
 
     Returns:
         sorted_compound_dict: Dictionary of compounds and their pmi/npmi values, sorted wrt their pmi/npmi.
     """
-    tmp_compound_dict = compound_dict
-    for compound, count in tmp_compound_dict.items():
-        w1w2 = compound.split(" ")
-        # To filter out compounds that are rare/unique because of strange/misspelled component words.
-        if float(word_dic[w1w2[0]]) > 10 and float(word_dic[w1w2[1]]) > 10:
-            p_of_c = float(count) / float(num_words)
-            p_of_h = float(word_dic[w1w2[0]]) / float(num_words)
-            p_of_m = float(word_dic[w1w2[1]]) / float(num_words)
-            pmi = math.log(p_of_c / (p_of_h * p_of_m))
-            if not normalize:
-                tmp_compound_dict[compound] = round(pmi, 2)
+    am = "npmi" if normalize else "pmi"
+    compounds, counts, w1_counts, w2_counts = _dict_arrays(compound_dict, word_dic)
+    scores = association_scores(counts, w1_counts, w2_counts, num_words, [am], word_freq_cutoff)[am]
+    order = select_scores(scores, top_k=top_k, min_score=min_score)
+    return dict(zip([compounds[i] for i in order.tolist()], scores[order].tolist()))
+
+
+def _dict_arrays(compound_dict: dict, word_dic: dict):
+    """Helper function to split every compound once and gather its count and the counts of its words in arrays.
+
+    Args:
+        compound_dict: Dictionary of compounds and their count.
+        word_dic: Dictionary of words and their count.
+
+    Returns:
+        (compounds, counts, w1_counts, w2_counts): List of compounds and float64 arrays of counts.
+    """
+    compounds = list(compound_dict)
+    w1w2 = [c.split(" ") for c in compounds]
+    counts = np.fromiter(compound_dict.values(), dtype=np.float64, count=len(compounds))
+    w1_counts = np.array([word_dic[w[0]] for w in w1w2], dtype=np.float64)
+    w2_counts = np.array([word_dic[w[1]] for w in w1w2], dtype=np.float64)
+    return compounds, counts, w1_counts, w2_counts
+
+
+def select_scores(scores: np.ndarray, top_k: Optional[int] = None, min_score: Optional[float] = None) -> np.ndarray:
+    """Select and order the indices of scores by decreasing score. Ties keep their original order.
+
+    Args:
+        scores: Array of scores.
+        top_k: If given, only the indices of the top_k highest scores are returned. They are found with a
+               partial selection rather than a full sort.
+        min_score: If given, only the indices of scores greater than or equal to min_score are returned.
+
+    Returns:
+        order: Array of selected indices, sorted by decreasing score.
+    """
+    candidates = np.arange(len(scores))
+    if min_score is not None:
+        candidates = candidates[scores >= min_score]
+    if top_k is not None:
+        if top_k < 0:
+            raise ValueError(f"top_k must be a non-negative integer. Currently it is {top_k}.")
+        if top_k < len(candidates):
+            if top_k == 0:
+                return candidates[:0]
+            kth = np.partition(scores[candidates], len(candidates) - top_k)[len(candidates) - top_k]
+            above = candidates[scores[candidates] > kth]
+            ties = candidates[scores[candidates] == kth][: top_k - len(above)]
+            candidates = np.sort(np.concatenate([above, ties]))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def association_scores(
+    counts: np.ndarray,
+    w1_counts: np.ndarray,
+    w2_counts: np.ndarray,
+    num_words: int,
+    ams: List[str],
+    word_freq_cutoff: int = 10,
+) -> Dict[str, np.ndarray]:
+    """Vectorized association measures of every compound, all computed from one 2x2 contingency table.
+
+    For a compound w1 w2 with count c, o11 = c, o12 = f(w1) - c, o21 = f(w2) - c and
+    o22 = N - f(w1) - f(w2) + c, with expected counts e_ij computed from the marginals.
+
+    Args:
+        counts: Counts of the compounds.
+        w1_counts: Counts of the first words of the compounds.
+        w2_counts: Counts of the second words of the compounds.
+        num_words: Number of words, N.
+        ams: Association measures to compute. Any of AMS or pmi<k>, e.g. pmi3.
+        word_freq_cutoff: Compounds with a word that occurs word_freq_cutoff times or fewer get a score of 0.0.
+
+    Returns:
+        scores: Dictionary of association measure to the array of its scores rounded to two decimals,
+                0.0 for filtered compounds.
+    """
+    if len(counts) == 0 or num_words <= 0:
+        # Nothing to score, and log(N) is undefined without words.
+        return {am: np.zeros(len(counts), dtype=np.float64) for am in ams}
+    keep = (w1_counts > word_freq_cutoff) & (w2_counts > word_freq_cutoff)
+    o11 = counts[keep]
+    f1 = w1_counts[keep]
+    f2 = w2_counts[keep]
+    n = float(num_words)
+    log_n = math.log(num_words)
+    log_c = np.log(o11)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pmi = (log_c - np.log(f1) - np.log(f2)) + log_n
+        e11 = f1 * f2 / n
+        res = {}
+        for am in ams:
+            if am == "pmi":
+                score = pmi
+            elif am == "npmi":
+                score = pmi / (log_n - log_c)
+            elif am == "dice":
+                score = 2.0 * o11 / (f1 + f2)
+            elif am == "tscore":
+                score = (o11 - e11) / np.sqrt(o11)
+            elif am in ["llr", "chi2"]:
+                o12 = np.maximum(f1 - o11, 0.0)
+                o21 = np.maximum(f2 - o11, 0.0)
+                o22 = np.maximum(n - f1 - f2 + o11, 0.0)
+                if am == "chi2":
+                    denominator = f1 * f2 * (n - f1) * (n - f2)
+                    score = n * (o11 * o22 - o12 * o21) ** 2 / denominator
+                else:
+                    e12 = f1 * (n - f2) / n
+                    e21 = (n - f1) * f2 / n
+                    e22 = (n - f1) * (n - f2) / n
+                    score = 2.0 * (_xlogy(o11, e11) + _xlogy(o12, e12) + _xlogy(o21, e21) + _xlogy(o22, e22))
             else:
-                npmi = pmi / float(-math.log(p_of_c))
-                tmp_compound_dict[compound] = round(npmi, 2)
+                k = int(PMI_K_PATTERN.match(am).group(1))
+                score = pmi + (k - 1) * (log_c - log_n)
+            scores = np.zeros(len(counts), dtype=np.float64)
+            scores[keep] = np.round(np.nan_to_num(score, nan=0.0, posinf=0.0, neginf=0.0), 2)
+            res[am] = scores
+    return res
+
+
+def _xlogy(o: np.ndarray, e: np.ndarray) -> np.ndarray:
+    """o * log(o / e), with 0 for o == 0."""
+    return np.where(o > 0, o * np.log(np.where(o > 0, o, 1.0) / e), 0.0)
+
+
+def ngram_association_scores(
+    counts: np.ndarray,
+    word_counts: np.ndarray,
+    num_words: int,
+    ams: List[str],
+    word_freq_cutoff: int = 10,
+) -> Dict[str, np.ndarray]:
+    """Association measures of compounds of any number of words n, generalized from the two-word case.
+
+    With p(x) = c / N and p(w_i) = f(w_i) / N:
+        pmi = log p(x) - sum_i log p(w_i), which is 0 if the words are independent.
+        npmi = pmi / (-(n - 1) log p(x)), which is 1 if the words only occur together.
+        pmi<k> = k log p(x) - sum_i log p(w_i).
+        dice = n c / sum_i f(w_i).
+        tscore = (c - e) / sqrt(c) with e = N prod_i p(w_i).
+    llr and chi2 rely on the 2x2 contingency table and are only defined for two-word compounds.
+    For n = 2 this is the same as association_scores.
+
+    Args:
+        counts: Counts of the compounds.
+        word_counts: (k, n) array with the counts of the words of each compound.
+        num_words: Number of words, N.
+        ams: Association measures to compute.
+        word_freq_cutoff: Compounds with a word that occurs word_freq_cutoff times or fewer get a score of 0.0.
+
+    Returns:
+        scores: Dictionary of association measure to the array of its scores rounded to two decimals.
+    """
+    n_words = word_counts.shape[1]
+    if n_words == 2:
+        return association_scores(counts, word_counts[:, 0], word_counts[:, 1], num_words, ams, word_freq_cutoff)
+    for am in ams:
+        if am in ["llr", "chi2"]:
+            raise ValueError(f"{am} is only defined for two-word compounds. Compounds of {n_words} words were given.")
+    if len(counts) == 0 or num_words <= 0:
+        return {am: np.zeros(len(counts), dtype=np.float64) for am in ams}
+    keep = np.all(word_counts > word_freq_cutoff, axis=1)
+    c = counts[keep]
+    f = word_counts[keep]
+    log_n = math.log(num_words)
+    log_c = np.log(c)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        pmi = (log_c - np.log(f).sum(axis=1)) + (n_words - 1) * log_n
+        res = {}
+        for am in ams:
+            if am == "pmi":
+                score = pmi
+            elif am == "npmi":
+                score = pmi / ((n_words - 1) * (log_n - log_c))
+            elif am == "dice":
+                score = n_words * c / f.sum(axis=1)
+            elif am == "tscore":
+                score = (c - np.exp(np.log(f).sum(axis=1) - (n_words - 1) * log_n)) / np.sqrt(c)
+            else:
+                k = int(PMI_K_PATTERN.match(am).group(1))
+                score = pmi + (k - 1) * (log_c - log_n)
+            scores = np.zeros(len(counts), dtype=np.float64)
+            scores[keep] = np.round(np.nan_to_num(score, nan=0.0, posinf=0.0, neginf=0.0), 2)
+            res[am] = scores
+    return res
+
+
+def _dict_scores(
+    compound_dict: dict, word_dic: dict, num_words: int, ams: List[str], word_freq_cutoff: int
+) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """Helper function to score the compounds of a dictionary, grouping them by their number of words.
+
+    Args:
+        compound_dict: Dictionary of compounds and their count.
+        word_dic: Dictionary of words and their count.
+        num_words: Number of words.
+        ams: Association measures to compute.
+        word_freq_cutoff: See ngram_association_scores.
+
+    Returns:
+        (compounds, scores): List of compounds and dictionary of association measure to their scores.
+    """
+    compounds = list(compound_dict)
+    words = [c.split(" ") for c in compounds]
+    counts = np.fromiter(compound_dict.values(), dtype=np.float64, count=len(compounds))
+    lengths = np.array([len(w) for w in words], dtype=np.int64)
+    scores = {a: np.zeros(len(compounds), dtype=np.float64) for a in ams}
+    for n in np.unique(lengths).tolist():
+        rows = np.flatnonzero(lengths == n)
+        word_counts = np.array([[word_dic[w] for w in words[i]] for i in rows.tolist()], dtype=np.float64)
+        for a, s in ngram_association_scores(counts[rows], word_counts, num_words, ams, word_freq_cutoff).items():
+            scores[a][rows] = s
+    return compounds, scores
+
+
+def calculate_label_am(
+    label_counts: Dict[object, dict],
+    am: Union[str, List[str]],
+    mwe_types: List[str],
+    freq_cutoff: int = 0,
+    top_k: Optional[int] = None,
+    min_score: Optional[float] = None,
+) -> Dict:
+    """Score how strongly every compound is associated with every label versus the rest of the labels, from the
+    output of get_counts(..., label_column=...). Scores of compounds within one label are given by calculate_am
+    of the counts of that label.
+
+    The compound and the label take the place of the two words of calculate_am: for a compound with count c in
+    a label, f1 is the count of the compound in all labels, f2 the number of compounds of its type in the label
+    and N the number of compounds of its type in all labels. E.g. pmi is log(c * N / (f1 * f2)).
+
+    Args:
+        label_counts: Dictionary of every label to its counts, in the format of get_counts.
+        am: Association measure, or a list of measures, see calculate_am. llr is a common choice for
+            discriminative compounds.
+        mwe_types: Types of MWEs.
+        freq_cutoff: Compounds that occur freq_cutoff times or fewer in all labels get a score of 0.0.
+        top_k: If given, only the top_k compounds of every label and type are returned.
+        min_score: If given, only compounds with a score greater than or equal to min_score are returned.
+
+    Returns:
+        res: Dictionary of every label to MWE type to its compounds and their scores, sorted by decreasing score.
+             If am is a list, a dictionary of each measure to such a result.
+    """
+    ams = check_ams(am)
+    res = {a: {label: {} for label in label_counts} for a in ams}
+    for mt in mwe_types:
+        totals = {}
+        for counts in label_counts.values():
+            for k, v in counts.get(mt, {}).items():
+                totals[k] = totals.get(k, 0) + v
+        num_compounds = sum(totals.values())
+        for label, counts in label_counts.items():
+            compounds = list(counts.get(mt, {}))
+            if num_compounds == 0 or len(compounds) == 0:
+                for a in ams:
+                    res[a][label][mt] = {}
+                continue
+            c = np.array([counts[mt][k] for k in compounds], dtype=np.float64)
+            f1 = np.array([totals[k] for k in compounds], dtype=np.float64)
+            f2 = np.full(len(compounds), c.sum())
+            scores = association_scores(c, f1, f2, num_compounds, ams, word_freq_cutoff=freq_cutoff)
+            for a in ams:
+                order = select_scores(scores[a], top_k=top_k, min_score=min_score)
+                res[a][label][mt] = dict(zip([compounds[i] for i in order.tolist()], scores[a][order].tolist()))
+    return _format_scores(res, am)
+
+
+def _format_scores(res: Dict[str, object], am: Union[str, List[str]]) -> object:
+    """Helper function to return the result of a single measure as is, and of several measures by name."""
+    return res[am] if isinstance(am, str) else res
+
+
+class IncrementalAM(object):
+    def __init__(self, mwe_types: List[str]) -> None:
+        """Keep the counts of every compound and of its words in arrays, so that after new counts are
+        merged in, only the rows of compounds whose counts or word counts changed are refreshed. Scores are
+        then computed for all rows at once with the vectorized pmi/npmi.
+
+        Args:
+            mwe_types: Types of MWEs.
+
+        Returns:
+            None
+        """
+        self.mwe_types = list(mwe_types)
+        self.initialized = False
+        # Per type: compound to row, row to compound, and rows of (count, count of first word, ...).
+        self._rows = {mt: {} for mt in self.mwe_types}
+        self._compounds = {mt: [] for mt in self.mwe_types}
+        self._counts = {mt: np.zeros((0, 3), dtype=np.float64) for mt in self.mwe_types}
+        # Per type: word to the rows of the compounds it occurs in, to find the compounds affected by a changed
+        # word count. Rows rather than compounds are stored, so that every compound is only held once.
+        self._rows_by_word = {mt: {} for mt in self.mwe_types}
+        self._changed_words = set()
+        self._changed_compounds = {mt: {} for mt in self.mwe_types}
+
+    @property
+    def num_rows(self) -> int:
+        """Number of compounds with a row, including those whose count dropped to 0."""
+        return sum(len(rows) for rows in self._rows.values())
+
+    def mark_changed(self, delta: dict) -> None:
+        """Record the words and compounds whose counts changed, e.g. the output of get_counts on new data.
+
+        Args:
+            delta: Dictionary of WORDS and MWE types to the counts that were merged into the count data.
+
+        Returns:
+            None
+        """
+        if not self.initialized:
+            return
+        self._changed_words.update(delta.get("WORDS", {}))
+        for mt in self.mwe_types:
+            self._changed_compounds[mt].update(dict.fromkeys(delta.get(mt, {})))
+
+    def refresh(self, count_data: dict) -> int:
+        """Refresh the rows of all compounds affected by the changes recorded with mark_changed,
+        or of all compounds on the first call. Compounds that are no longer in count_data, e.g. because their
+        counts expired, keep a row with a count of 0 that is not scored until prune is called.
+
+        Args:
+            count_data: A dictionary that contains different MWE types and their counts.
+
+        Returns:
+            num_updated: Number of compounds whose rows were refreshed.
+        """
+        word_dic = count_data["WORDS"]
+        if not self.initialized:
+            affected = {mt: list(count_data[mt]) for mt in self.mwe_types}
+            self.initialized = True
         else:
-            tmp_compound_dict[compound] = 0.0
-    sorted_compound_dict = dict(sorted(tmp_compound_dict.items(), key=lambda e: e[1], reverse=True))
-    return sorted_compound_dict
+            # Changed compounds are kept in the order they were merged into count_data, so that new ones
+            # get rows in the same order as in a full recomputation.
+            affected = {mt: dict(self._changed_compounds[mt]) for mt in self.mwe_types}
+            for mt in self.mwe_types:
+                compounds, rows_by_word = self._compounds[mt], self._rows_by_word[mt]
+                for w in self._changed_words:
+                    for row in rows_by_word.get(w, ()):
+                        affected[mt][compounds[row]] = None
+        num_updated = 0
+        for mt in self.mwe_types:
+            rows = self._rows[mt]
+            new = [c for c in affected[mt] if c not in rows]
+            if new:
+                if not rows:
+                    # All compounds of a type have the same number of words, which sets the width of the rows.
+                    self._counts[mt] = np.zeros((0, 1 + len(new[0].split(" "))), dtype=np.float64)
+                width = self._counts[mt].shape[1]
+                self._counts[mt] = np.concatenate([self._counts[mt], np.zeros((len(new), width), dtype=np.float64)])
+                for compound in new:
+                    rows[compound] = len(rows)
+                    self._compounds[mt].append(compound)
+                    for w in compound.split(" "):
+                        self._rows_by_word[mt].setdefault(w, []).append(rows[compound])
+            counts = self._counts[mt]
+            mt_counts = count_data[mt]
+            for compound in affected[mt]:
+                counts[rows[compound], 0] = mt_counts.get(compound, 0)
+                counts[rows[compound], 1:] = [word_dic.get(w, 0) for w in compound.split(" ")]
+            num_updated += len(affected[mt])
+        self._changed_words = set()
+        self._changed_compounds = {mt: {} for mt in self.mwe_types}
+        return num_updated
+
+    def prune(self) -> int:
+        """Remove the rows of compounds whose count dropped to 0, so that they stop taking memory.
+
+        Args:
+            None
+
+        Returns:
+            num_removed: Number of rows that were removed.
+        """
+        num_removed = 0
+        for mt in self.mwe_types:
+            counts = self._counts[mt]
+            live = counts[:, 0] > 0
+            if live.all():
+                continue
+            compounds = [self._compounds[mt][i] for i in np.flatnonzero(live).tolist()]
+            num_removed += len(self._compounds[mt]) - len(compounds)
+            self._compounds[mt] = compounds
+            self._rows[mt] = {compound: row for row, compound in enumerate(compounds)}
+            self._rows_by_word[mt] = {}
+            for row, compound in enumerate(compounds):
+                for w in compound.split(" "):
+                    self._rows_by_word[mt].setdefault(w, []).append(row)
+            self._counts[mt] = counts[live]
+        return num_removed
+
+    def scores(
+        self,
+        count_data: dict,
+        am: Union[str, List[str]],
+        word_freq_cutoff: int = 10,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        num_words: Optional[float] = None,
+        scale: float = 1.0,
+    ) -> Dict[str, Dict]:
+        """Compute the association scores of every compound from the stored rows. Call refresh first.
 
+        Args:
+            count_data: A dictionary that contains different MWE types and their counts.
+            am: Association measure, or a list of them. See calculate_am.
+            word_freq_cutoff: See calculate_am.
+            top_k: See calculate_am.
+            min_score: See calculate_am.
+            num_words: Number of words of count_data, if it is already known. Otherwise it is summed up.
+            scale: Factor by which all counts, including num_words, are multiplied before scoring.
 
-def calculate_am(count_data: dict, am: str, mwe_types: List[str]) -> Dict[str, Dict]:
+        Returns:
+            res: Same as calculate_am.
+        """
+        ams = check_ams(am)
+        if num_words is None:
+            num_words = sum(count_data["WORDS"].values())
+        num_words *= scale
+        res = {a: {} for a in ams}
+        for mt in self.mwe_types:
+            counts = self._counts[mt]
+            compounds = self._compounds[mt]
+            live = counts[:, 0] > 0
+            if not live.all():
+                ids = np.flatnonzero(live)
+                counts = counts[ids]
+                compounds = [compounds[i] for i in ids.tolist()]
+            if scale != 1.0:
+                counts = counts * scale
+            scores = ngram_association_scores(counts[:, 0], counts[:, 1:], num_words, ams, word_freq_cutoff)
+            for a in ams:
+                order = select_scores(scores[a], top_k=top_k, min_score=min_score)
+                res[a][mt] = dict(zip([compounds[i] for i in order.tolist()], scores[a][order].tolist()))
+        return _format_scores(res, am)
+
+
+def calculate_am(
+    count_data: Union[dict, CountStore, ApproximateCounts],
+    am: Union[str, List[str]],
+    mwe_types: List[str],
+    return_store: bool = False,
+    word_freq_cutoff: int = 10,
+    top_k: Optional[int] = None,
+    min_score: Optional[float] = None,
+) -> Union[Dict[str, Dict], CountStore]:
     """Read the counts from path_to_counts and for each compound calculates the measure specified by am.
 
     Args:
-        count_data: A dictionary that contains different MWE types and their counts.
-        am: Association measure to be used in order to extract MWEs. Can be any of [pmi, npmi]
-        mwe_types: Types of MWEs. Can be any of [NC, JNC].
+        count_data: A dictionary that contains different MWE types and their counts, a CountStore, or
+                    ApproximateCounts, in which case only the heavy hitters of every type are scored.
+        am: Association measure to be used in order to extract MWEs. Can be any of
+            [pmi, npmi, llr, tscore, chi2, dice] or pmi<k> for PMI^k, e.g. pmi3. A list of measures is computed
+            in a single pass over the compounds.
+        mwe_types: Types of MWEs. Can be any of [NC, JNC], registered types or the NGRAM<n> types of
+                   snlp.mwes.ngrams.NgramIndex.to_count_data. Compounds of more than two words are scored
+                   with the generalized measures of ngram_association_scores.
+        return_store: Whether or not return the scores as a CountStore instead of dictionaries.
+                      Only supported if count_data is a CountStore.
+        word_freq_cutoff: Compounds with a word that occurs word_freq_cutoff times or fewer get a score of 0.0.
+        top_k: If given, only the top_k compounds of every type are returned.
+        min_score: If given, only compounds with a score greater than or equal to min_score are returned.
 
     Returns:
-        res: Dictionary of MWE type to their individual MWE to its score dictionary.
+        res: Dictionary of MWE type to their individual MWE to its score dictionary, or a CountStore
+             whose values are scores if return_store is True. If am is a list, a dictionary of each
+             measure to such a result.
     """
-    res = {}
-    num_words = sum(count_data["WORDS"].values())
-    if am == "pmi":
-        for mt in mwe_types:
-            compound_dict_tmp = calculate_pmi(
-                compound_dict=count_data[mt],
-                word_dic=count_data["WORDS"],
-                num_compound=sum(count_data[mt].values()),
-                num_words=num_words,
-                normalize=False,
-            )
-            res[mt] = compound_dict_tmp
-    elif am == "npmi":
-        for mt in mwe_types:
-            compound_dict_tmp = calculate_pmi(
-                compound_dict=count_data[mt],
-                word_dic=count_data["WORDS"],
-                num_compound=sum(count_data[mt].values()),
-                num_words=num_words,
-                normalize=True,
-            )
-            res[mt] = compound_dict_tmp
-    return res
+    ams = check_ams(am)
+    if isinstance(count_data, CountStore):
+        res = _calculate_am_store(count_data, ams, mwe_types, return_store, word_freq_cutoff, top_k, min_score)
+        return _format_scores(res, am)
+    if return_store:
+        raise ValueError("return_store is only supported if count_data is a CountStore.")
+    res = {a: {} for a in ams}
+    if isinstance(count_data, ApproximateCounts):
+        num_words = count_data.num_words
+        count_data = count_data.to_count_data(mwe_types)
+    else:
+        num_words = sum(count_data["WORDS"].values())
+    for mt in mwe_types:
+        compounds, scores = _dict_scores(count_data[mt], count_data["WORDS"], num_words, ams, word_freq_cutoff)
+        for a in ams:
+            order = select_scores(scores[a], top_k=top_k, min_score=min_score)
+            res[a][mt] = dict(zip([compounds[i] for i in order.tolist()], scores[a][order].tolist()))
+    return _format_scores(res, am)
+
+
+def _calculate_am_store(
+    store: CountStore,
+    ams: List[str],
+    mwe_types: List[str],
+    return_store: bool,
+    word_freq_cutoff: int,
+    top_k: Optional[int],
+    min_score: Optional[float],
+) -> Dict[str, Union[Dict[str, Dict], CountStore]]:
+    """Helper function of calculate_am that computes the measures directly on the arrays of a CountStore.
+
+    Args:
+        store: CountStore with the counts.
+        ams: Association measures.
+        mwe_types: Types of MWEs.
+        return_store: Whether or not return the scores as a CountStore.
+        word_freq_cutoff: See calculate_am.
+        top_k: See calculate_am.
+        min_score: See calculate_am.
+
+    Returns:
+        res: Dictionary of each measure to a dictionary of MWE type to their individual MWE to its score
+             dictionary, or to a CountStore.
+    """
+    word_counts = store.word_counts.astype(np.float64)
+    num_words = store.num_words
+    scored = {a: CountStore(store.vocab, store.word_counts, {}) for a in ams}
+    res = {a: {} for a in ams}
+    for mt in mwe_types:
+        keys, counts = store.pairs[mt]
+        ids1, ids2 = unpack_pairs(keys)
+        scores = association_scores(
+            counts.astype(np.float64), word_counts[ids1], word_counts[ids2], num_words, ams, word_freq_cutoff
+        )
+        for a in ams:
+            if return_store:
+                if top_k is None and min_score is None:
+                    scored[a].pairs[mt] = (keys, scores[a])
+                else:
+                    selected = np.sort(select_scores(scores[a], top_k=top_k, min_score=min_score))
+                    scored[a].pairs[mt] = (keys[selected], scores[a][selected])
+            else:
+                order = select_scores(scores[a], top_k=top_k, min_score=min_score)
+                res[a][mt] = dict(zip(store.pair_strings(mt, keys[order]), scores[a][order].tolist()))
+    return scored if return_store else res
@@ -0,0 +1,80 @@
+import os
+import pickle
+from typing import Optional, Tuple
+from snlp import logger
+
+
+class CountCheckpoint(object):
+    def __init__(self, path: str, every: int = 10, params: Optional[dict] = None) -> None:
+        """Periodic checkpoint of partial counts and of the number of sentences they cover, so that an
+        interrupted counting job can continue where it stopped instead of starting over.
+
+        Args:
+            path: File in which the checkpoint is stored. It is written atomically, so it always holds
+                  either the previous or the new checkpoint, even if the job is killed while writing.
+            every: Number of chunks after which a checkpoint is written.
+            params: Parameters of the counting job, e.g. mwe_types. A checkpoint written with other
+                    parameters is not resumed from.
+
+        Returns:
+            None
+        """
+        if every < 1:
+            raise ValueError(f"every must be a positive integer. Currently it is {every}.")
+        self.path = path
+        self.every = every
+        self.params = params or {}
+
+    def load(self) -> Optional[Tuple[object, int]]:
+        """Load the last checkpoint, if there is one.
+
+        Args:
+            None
+
+        Returns:
+            (counts, offset): Partial counts and the number of sentences they cover, or None.
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as file:
+            state = pickle.load(file)
+        if state["params"] != self.params:
+            raise ValueError(
+                f"Checkpoint {self.path} was written with {state['params']}, not with {self.params}. "
+                "Remove it or count without resuming."
+            )
+        logger.info(f"Resuming from checkpoint {self.path} after {state['offset']} sentences.")
+        return state["counts"], state["offset"]
+
+    def save(self, counts: object, offset: int) -> None:
+        """Atomically store partial counts and the number of sentences they cover.
+
+        Args:
+            counts: Partial counts, e.g. the dictionary of get_counts or ApproximateCounts.
+            offset: Number of sentences of the corpus that are included in counts.
+
+        Returns:
+            None
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump({"params": self.params, "offset": offset, "counts": counts}, file, pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        """Remove the checkpoint.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        for path in [self.path, self.path + ".tmp"]:
+            if os.path.exists(path):
+                os.remove(path)
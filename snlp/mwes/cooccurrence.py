@@ -0,0 +1,211 @@
+from typing import Dict, Iterable, List, Optional, Union
+import numpy as np
+import scipy.sparse
+import tqdm
+from snlp import logger
+from snlp.mwes.am import association_scores, check_ams, select_scores
+from snlp.mwes.mwe_utils import _chunked
+from snlp.mwes.patterns import WORD_PATTERN, parse_pattern
+from snlp.tagging import TagCache, log_cache_stats, pos_tag
+
+
+# Minimum number of pairs that are collected across batches before equal pairs are summed. Pairs are summed
+# again once the new pairs outnumber the distinct pairs so far, so every pair is summed a few times on average.
+COMPACT_PAIRS = 1 << 22
+
+
+def _compact(
+    rows: List[np.ndarray], cols: List[np.ndarray], data: List[np.ndarray], size: int
+) -> scipy.sparse.coo_matrix:
+    """Helper function to sum the counts of equal pairs of the collected pairs of several batches.
+
+    Args:
+        rows: Arrays of first word ids.
+        cols: Arrays of second word ids.
+        data: Arrays of counts.
+        size: Size of the vocabulary so far.
+
+    Returns:
+        counts: COO matrix of shape (size, size) without duplicate entries.
+    """
+    rows, cols, data = np.concatenate(rows), np.concatenate(cols), np.concatenate(data)
+    counts = scipy.sparse.coo_matrix((data, (rows, cols)), shape=(size, size))
+    counts.sum_duplicates()
+    return counts
+
+
+class Cooccurrences(object):
+    def __init__(self, vocab: List[str], word_counts: np.ndarray, matrix: scipy.sparse.csr_matrix, window: int) -> None:
+        """Counts of ordered word pairs that co-occur within a window of tokens, e.g. 'make ... decision'.
+        Use count_cooccurrences to build it.
+
+        Args:
+            vocab: List of words, indexed by word id.
+            word_counts: Count of every word, indexed by word id.
+            matrix: Sparse (len(vocab), len(vocab)) matrix. Entry (i, j) counts how often word j follows word i
+                    at a distance of at most window tokens.
+            window: Maximum distance between the words of a pair.
+
+        Returns:
+            None
+        """
+        self.vocab = vocab
+        self.word_counts = word_counts
+        self.matrix = matrix
+        self.window = window
+        self._word_ids = None
+
+    @property
+    def num_words(self) -> int:
+        return int(self.word_counts.sum())
+
+    @property
+    def word_ids(self) -> Dict[str, int]:
+        """Dictionary of word to word id, built on first access."""
+        if self._word_ids is None:
+            self._word_ids = {w: i for i, w in enumerate(self.vocab)}
+        return self._word_ids
+
+    def lookup(self, w1: str, w2: str) -> int:
+        """Number of times w2 follows w1 within the window.
+
+        Args:
+            w1: First word.
+            w2: Second word.
+
+        Returns:
+            count (int)
+        """
+        i, j = self.word_ids.get(w1), self.word_ids.get(w2)
+        if i is None or j is None:
+            return 0
+        return int(self.matrix[i, j])
+
+    def scores(
+        self,
+        am: Union[str, List[str]] = "pmi",
+        word_freq_cutoff: int = 10,
+        min_count: int = 1,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+    ) -> Dict:
+        """Association scores of the co-occurring pairs, computed with the vectorized measures of calculate_am.
+        Every word has window pair slots to its right, so the contingency tables are built over
+        N = window * num_words pair slots instead of num_words, and every word fills window * f(w) of them as
+        either word of a pair. Words that occur independently then get a pmi of about 0 for any window.
+
+        Args:
+            am: Association measure, or a list of measures, see snlp.mwes.am.calculate_am.
+            word_freq_cutoff: Pairs with a word that occurs word_freq_cutoff times or fewer get a score of 0.0.
+            min_count: Pairs that co-occur fewer than min_count times are not scored.
+            top_k: If given, only the top_k pairs are returned.
+            min_score: If given, only pairs with a score greater than or equal to min_score are returned.
+
+        Returns:
+            res: Dictionary of 'w1 w2' to its score, sorted by decreasing score. If am is a list, a dictionary
+                 of each measure to such a dictionary.
+        """
+        ams = check_ams(am)
+        coo = self.matrix.tocoo()
+        keep = coo.data >= min_count
+        rows, cols, counts = coo.row[keep], coo.col[keep], coo.data[keep].astype(np.float64)
+        # Marginals over pair slots. The cutoff is scaled as well, so that it still applies to word counts.
+        slot_counts = self.window * self.word_counts.astype(np.float64)
+        scores = association_scores(
+            counts,
+            slot_counts[rows],
+            slot_counts[cols],
+            self.window * self.num_words,
+            ams,
+            self.window * word_freq_cutoff,
+        )
+        res = {}
+        for a in ams:
+            order = select_scores(scores[a], top_k=top_k, min_score=min_score)
+            pairs = [f"{self.vocab[i]} {self.vocab[j]}" for i, j in zip(rows[order].tolist(), cols[order].tolist())]
+            res[a] = dict(zip(pairs, scores[a][order].tolist()))
+        return res[am] if isinstance(am, str) else res
+
+
+def count_cooccurrences(
+    texts: Iterable[str],
+    window: int = 5,
+    pos_pattern: Optional[str] = None,
+    batch_size: int = 10000,
+    tag_cache: Optional[TagCache] = None,
+) -> Cooccurrences:
+    """Count the ordered pairs of words that occur within window tokens of each other in the same sentence.
+
+    Sentences are encoded as arrays of word ids batch by batch, and for every distance d up to window, all
+    pairs at distance d are selected with one vectorized comparison and added to a scipy.sparse matrix.
+    Tokens that are not words, e.g. punctuation, are counted in word_counts but are never part of a pair.
+
+    Args:
+        texts: Iterable of tokenized sentences.
+        window: Maximum distance between the words of a pair. 1 counts adjacent pairs only.
+        pos_pattern: Optional POS constraint of two positions, e.g. "VB|VBD|VBZ NN|NNS" for verb ... noun
+                     pairs, see snlp.mwes.patterns.parse_pattern. Sentences are then POS tagged.
+        batch_size: Number of sentences that are encoded and counted at a time.
+        tag_cache: Optional TagCache in which POS tags are looked up before calling the tagger.
+
+    Returns:
+        cooccurrences (Cooccurrences)
+    """
+    if window < 1:
+        raise ValueError(f"window must be a positive integer. Currently it is {window}.")
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be a positive integer. Currently it is {batch_size}.")
+    tags = parse_pattern(pos_pattern) if pos_pattern is not None else None
+    if tags is not None and len(tags) != 2:
+        raise ValueError(f"pos_pattern must have exactly two positions. Currently it is {pos_pattern}.")
+    word_ids = {}
+    is_word = []
+    word_counts = np.zeros(0, dtype=np.int64)
+    # Pairs of all batches so far. The first arrays hold the distinct pairs of the last compaction.
+    all_rows, all_cols, all_data = [], [], []
+    num_distinct, num_pending = 0, 0
+    for batch in tqdm.tqdm(_chunked(texts, batch_size)):
+        ids, sents, first, second = [], [], [], []
+        for s, sent in enumerate(batch):
+            tokens = sent.split(" ")
+            for t in tokens:
+                if t not in word_ids:
+                    word_ids[t] = len(word_ids)
+                    is_word.append(WORD_PATTERN.match(t) is not None)
+                ids.append(word_ids[t])
+            sents.extend([s] * len(tokens))
+            if tags is not None:
+                sent_tags = [t for _, t in pos_tag(tokens, cache=tag_cache)]
+                first.extend([t in tags[0] for t in sent_tags])
+                second.extend([t in tags[1] for t in sent_tags])
+        ids = np.array(ids, dtype=np.int64)
+        sents = np.array(sents, dtype=np.int64)
+        words = np.array(is_word, dtype=bool)[ids]
+        left = words & np.array(first, dtype=bool) if tags is not None else words
+        right = words & np.array(second, dtype=bool) if tags is not None else words
+        rows, cols = [], []
+        for d in range(1, window + 1):
+            pairs = (sents[:-d] == sents[d:]) & left[:-d] & right[d:]
+            rows.append(ids[:-d][pairs])
+            cols.append(ids[d:][pairs])
+        size = len(word_ids)
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        all_rows.append(rows)
+        all_cols.append(cols)
+        all_data.append(np.ones(len(rows), dtype=np.int64))
+        num_pending += len(rows)
+        if num_pending >= max(COMPACT_PAIRS, num_distinct):
+            counts = _compact(all_rows, all_cols, all_data, size)
+            all_rows, all_cols, all_data = [counts.row], [counts.col], [counts.data]
+            num_distinct, num_pending = counts.nnz, 0
+        word_counts = np.concatenate([word_counts, np.zeros(size - len(word_counts), dtype=np.int64)])
+        word_counts += np.bincount(ids, minlength=size)
+    if tags is not None:
+        log_cache_stats(tag_cache)
+    size = len(word_ids)
+    if all_rows:
+        matrix = _compact(all_rows, all_cols, all_data, size).tocsr()
+    else:
+        matrix = scipy.sparse.csr_matrix((size, size), dtype=np.int64)
+    logger.info(f"Counted {matrix.nnz} distinct pairs within a window of {window} tokens.")
+    return Cooccurrences(list(word_ids), word_counts, matrix, window)
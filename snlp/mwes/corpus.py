@@ -0,0 +1,119 @@
+import gzip
+import itertools
+import os
+from typing import IO, Iterable, Iterator, Optional, Union
+
+import pandas
+
+CORPUS_FORMATS = ["tsv", "csv", "jsonl", "txt"]
+
+
+def infer_format(path: str) -> str:
+    """Infer the format of a corpus file from its extension, ignoring a trailing .gz.
+
+    Args:
+        path: Path to the corpus file, e.g. data/train.tsv.gz.
+
+    Returns:
+        file_format: Any of ['tsv', 'csv', 'jsonl', 'txt'].
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    ext = os.path.splitext(name)[1].lstrip(".").lower()
+    if ext == "json":
+        ext = "jsonl"
+    if ext not in CORPUS_FORMATS:
+        raise ValueError(f"Cannot infer the format of {path}. Pass file_format as any of {CORPUS_FORMATS}.")
+    return ext
+
+
+def open_text(path: str, mode: str = "r") -> IO:
+    """Open a text file for reading or writing, transparently (de)compressing it if it ends with .gz.
+
+    Args:
+        path: Path to the file.
+        mode: Either 'r' or 'w'.
+
+    Returns:
+        handle: File object in text mode.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_corpus_chunks(
+    source: Union[str, Iterable[str]],
+    text_column: str,
+    chunk_size: int = 10000,
+    file_format: Optional[str] = None,
+    **read_kwargs,
+) -> Iterator[pandas.DataFrame]:
+    """Read a corpus chunk by chunk, so that it never has to be held in memory as a whole.
+
+    Args:
+        source: Path to a TSV/CSV/JSONL/TXT file, optionally gzip compressed, or any iterable of strings.
+        text_column: Column that contains the text. Iterables and TXT files, which have one sentence
+                     per line, are put in a column with this name.
+        chunk_size: Number of rows per chunk.
+        file_format: Any of ['tsv', 'csv', 'jsonl', 'txt']. Inferred from the file extension if not given.
+        read_kwargs: Extra keyword arguments passed to pandas.read_csv or pandas.read_json,
+                     e.g. names=['label', 'text'] for a TSV file without a header.
+
+    Returns:
+        chunks: Iterator of pandas.DataFrame with at most chunk_size rows each.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be a positive integer. Currently it is {chunk_size}.")
+    if not isinstance(source, (str, os.PathLike)):
+        iterator = iter(source)
+        while True:
+            texts = list(itertools.islice(iterator, chunk_size))
+            if not texts:
+                return
+            yield pandas.DataFrame({text_column: texts})
+
+    path = os.fspath(source)
+    file_format = file_format or infer_format(path)
+    if file_format == "txt":
+        with open_text(path) as handle:
+            yield from read_corpus_chunks(
+                (line.rstrip("\n") for line in handle), text_column=text_column, chunk_size=chunk_size
+            )
+        return
+    if file_format in ["tsv", "csv"]:
+        sep = "\t" if file_format == "tsv" else ","
+        reader = pandas.read_csv(path, sep=read_kwargs.pop("sep", sep), chunksize=chunk_size, **read_kwargs)
+    elif file_format == "jsonl":
+        reader = pandas.read_json(path, lines=True, chunksize=chunk_size, **read_kwargs)
+    else:
+        raise ValueError(f"file_format must be any of {CORPUS_FORMATS}. Currently it is {file_format}.")
+    with reader:
+        for chunk in reader:
+            if text_column not in chunk.columns:
+                raise KeyError(f"Column {text_column} does not exist in {path}.")
+            yield chunk
+
+
+def write_corpus_chunk(chunk: pandas.DataFrame, handle: IO, file_format: str, text_column: str, first: bool) -> None:
+    """Append a chunk of a corpus to an open file.
+
+    Args:
+        chunk: DataFrame to be written.
+        handle: File object opened with open_text in write mode.
+        file_format: Any of ['tsv', 'csv', 'jsonl', 'txt'].
+        text_column: Column that contains the text. Only this column is written for TXT files.
+        first: Whether or not this is the first chunk, in which case the header of TSV/CSV files is written.
+
+    Returns:
+        None
+    """
+    if file_format in ["tsv", "csv"]:
+        chunk.to_csv(handle, sep="\t" if file_format == "tsv" else ",", header=first, index=False)
+    elif file_format == "jsonl":
+        if len(chunk):
+            handle.write(chunk.to_json(orient="records", lines=True, force_ascii=False).rstrip("\n") + "\n")
+    elif file_format == "txt":
+        for text in chunk[text_column]:
+            handle.write(f"{text}\n")
+    else:
+        raise ValueError(f"file_format must be any of {CORPUS_FORMATS}. Currently it is {file_format}.")
@@ -0,0 +1,415 @@
+import json
+import os
+import shutil
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+STORE_FORMAT = "snlp-count-store"
+STORE_VERSION = 1
+
+
+def pack_pairs(ids1: np.ndarray, ids2: np.ndarray) -> np.ndarray:
+    """Pack pairs of word ids into int64 keys.
+
+    Args:
+        ids1: Ids of the first words.
+        ids2: Ids of the second words.
+
+    Returns:
+        keys: id1 << 32 | id2 for every pair.
+    """
+    return (np.asarray(ids1, dtype=np.int64) << ID_BITS) | np.asarray(ids2, dtype=np.int64)
+
+
+def unpack_pairs(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Unpack int64 keys created by pack_pairs into the ids of their two words.
+
+    Args:
+        keys: Packed pair keys.
+
+    Returns:
+        (ids1, ids2): Ids of the first and second words.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    return keys >> ID_BITS, keys & ID_MASK
+
+
+class Vocab(Sequence[str]):
+    def __init__(self, data: np.ndarray, offsets: np.ndarray) -> None:
+        """Read-only vocabulary stored as concatenated UTF-8 bytes and an array of offsets, typically
+        memory-mapped from disk. Words are only decoded when they are accessed.
+
+        Args:
+            data: uint8 array of concatenated UTF-8 encoded words.
+            offsets: int64 array with len(vocab) + 1 entries; word i is data[offsets[i]:offsets[i + 1]].
+
+        Returns:
+            None
+        """
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_words(cls, words: Sequence[str]) -> "Vocab":
+        encoded = [w.encode("utf-8") for w in words]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self.data[self.offsets[i] : self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        data = self.data
+        offsets = self.offsets.tolist()
+        for i in range(len(offsets) - 1):
+            yield data[offsets[i] : offsets[i + 1]].tobytes().decode("utf-8")
+
+
+class CountStore(object):
+    def __init__(self, vocab: Sequence[str], word_counts: np.ndarray, pairs: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> None:
+        """Compact representation of the output of get_counts: a word to id vocabulary, an array of word
+        counts and, for every MWE type, an array of int64 keys that pack the ids of the two words of each
+        compound together with an array of their values. Words and compounds are in the order in which they
+        were first counted, as in the dictionaries of get_counts, so that ties between scores are broken
+        in the same order in both formats.
+
+        The values are counts for the output of get_counts, and association scores for the output of
+        calculate_am(..., return_store=True).
+
+        Args:
+            vocab: Sequence of words, e.g. a list or a Vocab. The id of a word is its position in vocab.
+            word_counts: Count of every word in vocab.
+            pairs: Dictionary of MWE type to (keys, values) arrays. Keys must be unique.
+
+        Returns:
+            None
+        """
+        if len(vocab) > ID_MASK >> 1:
+            raise ValueError(f"Vocabulary of {len(vocab)} words does not fit in {ID_BITS - 1}-bit word ids.")
+        self.vocab = vocab
+        self.word_counts = np.asarray(word_counts)
+        self.pairs = pairs
+        self.path = None
+        self._word_ids = None
+        self._sorted = {}
+
+    def __reduce__(self):
+        # A store that was opened from disk is shipped to other processes by path, so that they map
+        # the same pages instead of receiving a copy of the arrays.
+        if self.path is not None:
+            return (CountStore.load, (self.path,))
+        return (CountStore, (list(self.vocab), np.asarray(self.word_counts), self.pairs))
+
+    @property
+    def mwe_types(self) -> List[str]:
+        return list(self.pairs)
+
+    @property
+    def num_words(self) -> int:
+        return int(self.word_counts.sum())
+
+    @property
+    def word_ids(self) -> Dict[str, int]:
+        """Dictionary of word to its id, built on first use."""
+        if self._word_ids is None:
+            self._word_ids = {w: i for i, w in enumerate(self.vocab)}
+        return self._word_ids
+
+    @classmethod
+    def from_dict(cls, count_data: dict, mwe_types: Optional[List[str]] = None) -> "CountStore":
+        """Convert the dictionary format of get_counts to a CountStore.
+
+        Args:
+            count_data: Dictionary of WORDS and MWE types to their counts, as returned by get_counts.
+            mwe_types: Types of MWEs to be converted. Defaults to all keys of count_data except WORDS.
+
+        Returns:
+            store (CountStore)
+        """
+        if mwe_types is None:
+            mwe_types = [k for k in count_data if k != "WORDS"]
+        if "WORDS" in count_data:
+            words = count_data["WORDS"]
+        else:
+            # Dictionaries of scores, e.g. the content of mwe_data.json, have no word counts.
+            words = {}
+            for mt in mwe_types:
+                for compound in count_data[mt]:
+                    for w in compound.split(" "):
+                        words[w] = 0
+        vocab = list(words)
+        word_counts = np.fromiter(words.values(), dtype=np.int64, count=len(words))
+        store = cls(vocab, word_counts, {})
+        word_ids = store.word_ids
+        for mt in mwe_types:
+            compounds = count_data[mt]
+            ids1 = np.empty(len(compounds), dtype=np.int64)
+            ids2 = np.empty(len(compounds), dtype=np.int64)
+            for i, compound in enumerate(compounds):
+                w1w2 = compound.split(" ")
+                if len(w1w2) != 2:
+                    raise ValueError(f"CountStore only supports two-word MWEs. {mt} contains '{compound}'.")
+                ids1[i] = word_ids[w1w2[0]]
+                ids2[i] = word_ids[w1w2[1]]
+            values = np.array(list(compounds.values()))
+            store.add_pairs(mt, pack_pairs(ids1, ids2), values)
+        return store
+
+    def add_pairs(self, mwe_type: str, keys: np.ndarray, values: np.ndarray) -> None:
+        """Set the pairs of mwe_type.
+
+        Args:
+            mwe_type: Type of MWE.
+            keys: Packed pair keys, in the order in which the compounds were first counted. Must be unique.
+            values: Value of every key.
+
+        Returns:
+            None
+        """
+        self.pairs[mwe_type] = (np.asarray(keys), np.asarray(values))
+        self._sorted.pop(mwe_type, None)
+
+    def _sorted_keys(self, mwe_type: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Helper method to get the keys of mwe_type in ascending order and their positions, built on first use.
+
+        Args:
+            mwe_type: Type of MWE.
+
+        Returns:
+            (sorted_keys, order): Sorted keys and the position of every sorted key in the pairs of mwe_type.
+        """
+        if mwe_type not in self._sorted:
+            keys = self.pairs[mwe_type][0]
+            order = np.argsort(keys, kind="stable")
+            self._sorted[mwe_type] = (np.asarray(keys)[order], order)
+        return self._sorted[mwe_type]
+
+    def pair_strings(self, mwe_type: str, keys: Optional[np.ndarray] = None) -> List[str]:
+        """Convert packed keys back to space-joined compounds, e.g. 'climate change'.
+
+        Args:
+            mwe_type: Type of MWE.
+            keys: Keys to convert. Defaults to all keys of mwe_type.
+
+        Returns:
+            compounds: List of compounds, in the order of keys.
+        """
+        if keys is None:
+            keys = self.pairs[mwe_type][0]
+        ids1, ids2 = unpack_pairs(keys)
+        vocab = self.vocab
+        return [vocab[i] + " " + vocab[j] for i, j in zip(ids1.tolist(), ids2.tolist())]
+
+    def lookup(self, mwe_type: str, w1: str, w2: str):
+        """Return the value of the compound 'w1 w2' of mwe_type, or None if it does not exist.
+
+        Args:
+            mwe_type: Type of MWE.
+            w1: First word.
+            w2: Second word.
+
+        Returns:
+            value: Count or score of the compound, or None.
+        """
+        word_ids = self.word_ids
+        if w1 not in word_ids or w2 not in word_ids:
+            return None
+        sorted_keys, order = self._sorted_keys(mwe_type)
+        key = (word_ids[w1] << ID_BITS) | word_ids[w2]
+        i = int(np.searchsorted(sorted_keys, key))
+        if i < len(sorted_keys) and sorted_keys[i] == key:
+            return self.pairs[mwe_type][1][order[i]].item()
+        return None
+
+    def to_dict(self, include_words: bool = True, sort_by_value: bool = False) -> dict:
+        """Convert the CountStore to the dictionary format of get_counts.
+
+        Args:
+            include_words: Whether or not include the WORDS counts. Set to False for stores of scores.
+            sort_by_value: Whether or not sort the compounds of every type by decreasing value, as in
+                           the output of calculate_am.
+
+        Returns:
+            count_data: Dictionary of MWE types and WORDS to dictionaries of compounds/words and their values.
+        """
+        res = {}
+        for mt, (keys, values) in self.pairs.items():
+            if sort_by_value:
+                order = np.argsort(-values, kind="stable")
+                keys, values = keys[order], values[order]
+            res[mt] = dict(zip(self.pair_strings(mt, keys), values.tolist()))
+        if include_words:
+            res["WORDS"] = dict(zip(self.vocab, self.word_counts.tolist()))
+        return res
+
+    def save(self, path: str) -> None:
+        """Write the store to directory path as .npy arrays that can be memory-mapped by CountStore.load.
+
+        The directory contains meta.json, vocab.npy and vocab_offsets.npy (the UTF-8 vocabulary),
+        word_counts.npy and <type>.keys.npy/<type>.values.npy for every MWE type. It is written to a
+        temporary directory first and then moved into place.
+
+        Args:
+            path: Directory to write the store to. It is replaced if it exists.
+
+        Returns:
+            None
+        """
+        vocab = self.vocab if isinstance(self.vocab, Vocab) else Vocab.from_words(self.vocab)
+        tmp_path = path.rstrip(os.sep) + ".tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, "vocab.npy"), vocab.data)
+        np.save(os.path.join(tmp_path, "vocab_offsets.npy"), vocab.offsets)
+        np.save(os.path.join(tmp_path, "word_counts.npy"), self.word_counts)
+        for i, (keys, values) in enumerate(self.pairs.values()):
+            np.save(os.path.join(tmp_path, f"{i}.keys.npy"), keys)
+            np.save(os.path.join(tmp_path, f"{i}.values.npy"), values)
+        meta = {"format": STORE_FORMAT, "version": STORE_VERSION, "mwe_types": self.mwe_types}
+        with open(os.path.join(tmp_path, "meta.json"), "w") as file:
+            json.dump(meta, file)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CountStore":
+        """Open a store written by CountStore.save.
+
+        Args:
+            path: Directory of the store.
+            mmap: Whether or not memory-map the arrays. Mapped arrays are read lazily, loading is close to
+                  instant and processes that open the same store share its pages.
+
+        Returns:
+            store (CountStore)
+        """
+        if not is_count_store(path):
+            raise ValueError(f"{path} is not a CountStore directory.")
+        with open(os.path.join(path, "meta.json"), "r") as file:
+            meta = json.load(file)
+        if meta["version"] > STORE_VERSION:
+            raise ValueError(f"{path} has version {meta['version']}, which is newer than {STORE_VERSION}.")
+        mmap_mode = "r" if mmap else None
+
+        def _load(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+
+        vocab = Vocab(_load("vocab.npy"), _load("vocab_offsets.npy"))
+        pairs = {}
+        for i, mt in enumerate(meta["mwe_types"]):
+            pairs[mt] = (_load(f"{i}.keys.npy"), _load(f"{i}.values.npy"))
+        store = cls(vocab, _load("word_counts.npy"), pairs)
+        store.path = path if mmap else None
+        return store
+
+    @classmethod
+    def from_json(cls, path: str) -> "CountStore":
+        """Read a count_data.json or mwe_data.json file into a CountStore.
+
+        Args:
+            path: Path to the json file.
+
+        Returns:
+            store (CountStore)
+        """
+        with open(path, "r") as file:
+            return cls.from_dict(json.load(file))
+
+    def to_json(self, path: str, include_words: bool = True, sort_by_value: bool = False) -> None:
+        """Write the store in the json format of count_data.json or mwe_data.json.
+
+        Args:
+            path: Path to the json file.
+            include_words: Whether or not include the WORDS counts. Set to False for stores of scores.
+            sort_by_value: Whether or not sort the compounds of every type by decreasing value.
+
+        Returns:
+            None
+        """
+        with open(path, "w") as file:
+            json.dump(self.to_dict(include_words=include_words, sort_by_value=sort_by_value), file)
+
+
+class CountStoreBuilder(object):
+    def __init__(self, mwe_types: List[str]) -> None:
+        """Accumulate the counts of parts of a corpus, e.g. the shards of get_counts, directly under word ids,
+        so that compounds are held as packed int64 keys rather than as strings while counting. Words and
+        compounds keep the order in which they were first added, as with merge_counts.
+
+        Args:
+            mwe_types: Types of MWEs. Only two-word types are supported.
+
+        Returns:
+            None
+        """
+        self.mwe_types = list(mwe_types)
+        self.word_ids = {}
+        self.word_counts = array("q")
+        self.pairs = {mt: {} for mt in self.mwe_types}
+
+    def add(self, partial: dict) -> None:
+        """Add counts in the dictionary format of get_counts.
+
+        Args:
+            partial: Dictionary of WORDS and MWE types to their counts, e.g. the counts of one shard.
+
+        Returns:
+            None
+        """
+        word_ids, word_counts = self.word_ids, self.word_counts
+        for w, c in partial.get("WORDS", {}).items():
+            i = word_ids.get(w)
+            if i is None:
+                word_ids[w] = len(word_counts)
+                word_counts.append(c)
+            else:
+                word_counts[i] += c
+        for mt in self.mwe_types:
+            target = self.pairs[mt]
+            for compound, c in partial.get(mt, {}).items():
+                w1w2 = compound.split(" ")
+                if len(w1w2) != 2:
+                    raise ValueError(f"CountStore only supports two-word MWEs. {mt} contains '{compound}'.")
+                key = (word_ids[w1w2[0]] << ID_BITS) | word_ids[w1w2[1]]
+                target[key] = target.get(key, 0) + c
+
+    def to_count_store(self) -> CountStore:
+        """Convert the accumulated counts to a CountStore.
+
+        Args:
+            None
+
+        Returns:
+            store (CountStore)
+        """
+        store = CountStore(list(self.word_ids), np.frombuffer(self.word_counts, dtype=np.int64).copy(), {})
+        for mt, counts in self.pairs.items():
+            keys = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+            store.add_pairs(mt, keys, values)
+        return store
+
+
+def is_count_store(path: str) -> bool:
+    """Check whether path is a directory written by CountStore.save.
+
+    Args:
+        path: Path to check.
+
+    Returns:
+        bool
+    """
+    return os.path.isfile(os.path.join(path, "meta.json"))
+
@@ -2,71 +2,125 @@ import os
 import sys
 import pandas
 import json
+import pickle
+import tempfile
 from pathlib import Path
-from typing import List
+from typing import Iterable, List, Optional, Union
+import nltk
 from nltk import word_tokenize
-from snlp.mwes.am import calculate_am
-from snlp.mwes.mwe_utils import replace_mwes, get_counts
+from snlp.mwes.am import calculate_am, check_ams, IncrementalAM
+from snlp.mwes.checkpoint import CountCheckpoint
+from snlp.mwes.count_store import CountStore
+from snlp.mwes.corpus import read_corpus_chunks
+from snlp.mwes.mwe_utils import replace_mwes, get_counts, get_counts_from_source, get_approximate_counts, merge_counts
+from snlp.mwes.mwe_utils import tokenize_texts
+from snlp.mwes.ngrams import count_ngrams
+from snlp.mwes.patterns import check_mwe_types, mwe_type_length, ngram_length
+from snlp.mwes.result_cache import ResultCache, corpus_fingerprint, file_fingerprint, fingerprint, patterns_fingerprint
+from snlp.mwes.sketch import ApproximateCounts, parse_memory_size
+from snlp.mwes.spill import merge_partial_counts, write_partial_counts
+from snlp.tagging import TagCache
 from snlp import logger
 
 
 class MWE(object):
     def __init__(
         self,
-        df: pandas.DataFrame,
+        df: Optional[pandas.DataFrame],
         text_column: str,
         mwe_types: List[str] = ["NC"],
         output_dir: str = "tmp",
         tokenize=False,
+        storage: str = "json",
+        cache: Optional[ResultCache] = None,
+        n_jobs: int = 1,
     ) -> None:
         """Provide functionalities around MWEs, for unsupervised extraction of MWEs from text and replacing
         them in the corpus.
 
         Args:
-            df: DataFrame with a text_column that contains the corpus.
+            df: DataFrame with a text_column that contains the corpus. Can be None if counts are only built
+                from a streamed source, see build_counts.
             text_col: Specifies the column of DataFrame that contains the corpus. 'text_column' must contain tokenized text.
-            mwe_types: Types of MWEs. Can be a list containing any of ['NC', 'JNC'].
+            mwe_types: Types of MWEs. Can be a list containing any of ['NC', 'JNC'], types registered with
+                       snlp.mwes.patterns.register_mwe_type or NGRAM<n> types, e.g. NGRAM3 for all frequent
+                       n-grams of 3 words, which are counted with snlp.mwes.ngrams.count_ngrams.
             output_dir: Output directory where counts, MWEs and corpus with replaced MWEs are stored.
             count_dir: Directory where count_file is sotred.
             count_file: File in which counts are sotred.
             mwe_dir: Directory where mwe_file is sotred.
             mwe_file: File in which MWEs are sotred.
             tokenize: Tokenize the content of 'text_column'.
+            storage: Format of count_file and mwe_file. Can be any of ['json', 'binary']. 'binary' stores them
+                     as snlp.mwes.count_store.CountStore directories of .npy arrays, which are memory-mapped
+                     when they are read Only two-word MWE types are supported.
+            cache: Optional snlp.mwes.result_cache.ResultCache. build_counts and extract_mwes then reuse the
+                   count and MWE files of earlier calls with the same corpus content and parameters, and the
+                   tokenized text_column of an earlier instance with the same corpus content.
+            n_jobs: Number of worker processes used for tokenization. -1 uses all available cores.
 
         Returns:
             None
         """
+        if storage not in ["json", "binary"]:
+            raise ValueError(f"storage must be any of ['json', 'binary']. Currently it is {storage}.")
+        self.storage = storage
+        self.cache = cache
         self.df = df
         self.text_col = text_column
-        for mt in mwe_types:
-            if mt not in ["NC", "JNC"]:
-                raise ValueError(f"{mt} type is not recognized.")
+        self.tokenize = tokenize
+        check_mwe_types(mwe_types, ngrams=True)
+        if storage == "binary":
+            long_types = [mt for mt in mwe_types if mwe_type_length(mt) != 2]
+            if long_types:
+                raise ValueError(
+                    f"Binary storage only supports two-word MWE types, but {long_types} have more words. "
+                    "Use storage='json'."
+                )
         self.mwe_types = mwe_types
 
         self.output_dir = output_dir
         self.count_dir = os.path.join(self.output_dir, "counts")
-        self.count_file = os.path.join(self.count_dir, "count_data.json")
+        ext = "json" if storage == "json" else "store"
+        self.count_file = os.path.join(self.count_dir, f"count_data.{ext}")
         self.mwe_dir = os.path.join(self.output_dir, "mwes")
-        self.mwe_file = os.path.join(self.mwe_dir, "mwe_data.json")
+        self.mwe_file = os.path.join(self.mwe_dir, f"mwe_data.{ext}")
         
         Path(self.output_dir).mkdir(exist_ok=True)
 
-        if tokenize:
+        if self.df is None:
+            if tokenize:
+                raise ValueError('"tokenize" flag requires a DataFrame. Tokenize streamed corpora before counting.')
+        elif tokenize:
             logger.info('"tokenize" flag set to True. This might lead to a slow instantiation.')
-            self.df[text_column] = self.df[text_column].apply(self._tokenize)
+            self.df[text_column] = self._tokenize(self.df[text_column], n_jobs)
         else:
             self._check_tokenized()
 
-    def _tokenize(self, x):
-        """Helper function to tokenize and join the results with a space.
+    def _tokenize(self, texts: pandas.Series, n_jobs: int = 1) -> List[str]:
+        """Helper method to tokenize texts in n_jobs processes, or to read them from the cache if the same texts
+        were tokenized before.
 
         Args:
-            None
+            texts: Series of texts.
+            n_jobs: Number of worker processes.
 
         Returns:
-            None
+            texts: List of tokenized texts.
         """
-        return " ".join(word_tokenize(x))
+        if self.cache is None:
+            return tokenize_texts(texts, n_jobs=n_jobs)
+        key = fingerprint("tokens", corpus_fingerprint(texts), nltk.__version__)
+        with tempfile.TemporaryDirectory(dir=self.output_dir) as tmp_dir:
+            tokens_file = os.path.join(tmp_dir, "tokens.pickle")
+            if self.cache.get(key, [tokens_file]):
+                with open(tokens_file, "rb") as file:
+                    return pickle.load(file)
+            tokenized = tokenize_texts(texts, n_jobs=n_jobs)
+            with open(tokens_file, "wb") as file:
+                pickle.dump(tokenized, file, protocol=pickle.HIGHEST_PROTOCOL)
+            self.cache.put(key, [tokens_file], description=f"tokenized {self.text_col}")
+        return tokenized
 
     def _check_tokenized(self) -> None:
         """Helper function to check if the content of text_column is tokenized.
@@ -94,54 +148,513 @@ class MWE(object):
                 f"It seems that the content of {self.text_col} in the input data frame is not (fully) tokenized.\nThis can lead to poor results. Consider re-instantiating your MWE instance with 'tokenize' flag set to True.\nNote that this might lead to a slower instantiation."
             )
 
-    def build_counts(self, file_name: str=None) -> None:
+    def build_counts(
+        self,
+        file_name: str=None,
+        n_jobs: int = 1,
+        chunk_size: int = 10000,
+        tag_cache: Optional[TagCache] = None,
+        source: Optional[Union[str, Iterable[str]]] = None,
+        approximate: bool = False,
+        memory_budget: Union[int, str] = "1GB",
+        word_freq_cutoff: Optional[int] = None,
+        memory_limit: Optional[Union[int, str]] = None,
+        checkpoint_every: Optional[int] = None,
+        resume: bool = False,
+        partial: bool = False,
+        ngram_min_count: int = 2,
+        **read_kwargs,
+    ) -> None:
         """Create various count files to be used by downstream methods 
-        by calling snlp.mwes.counter.get_counts.
+        by calling snlp.mwes.mwe_utils.get_counts.
 
         Args:
-            None
+            file_name: File in which counts are stored. Defaults to output_dir/counts/count_data.json, or
+                       output_dir/counts/count_data.store for binary storage.
+            n_jobs: Number of worker processes used for counting. -1 uses all available cores.
+            chunk_size: Number of sentences per shard when n_jobs > 1.
+            tag_cache: Optional snlp.tagging.TagCache that persists POS tags across runs.
+            source: Optional path to a TSV/CSV/JSONL/TXT file, optionally gzip compressed, or an iterable of
+                    strings. If given, the corpus is streamed from source in chunks of chunk_size instead of
+                    being read from the DataFrame. See snlp.mwes.mwe_utils.get_counts_from_source.
+            approximate: Whether or not count in a fixed amount of memory, with a count-min sketch for words and
+                         heavy-hitter tables for MWE candidates, see snlp.mwes.mwe_utils.get_approximate_counts.
+                         The counts are stored in output_dir/counts/count_data.sketch.
+            memory_budget: Memory for approximate counting, in bytes or as a string such as 512MB.
+            word_freq_cutoff: If given, count in two passes and skip compounds with a word that occurs
+                              word_freq_cutoff times or fewer, see snlp.mwes.mwe_utils.get_counts. Use the same
+                              or a higher word_freq_cutoff in extract_mwes.
+            memory_limit: If given, e.g. 8GB, count exactly in external memory, spilling sorted runs to
+                          output_dir/counts and merging them into a CountStore, see get_counts. Peak memory only
+                          stays bounded with binary storage, since json storage converts the store to a dictionary.
+            checkpoint_every: If given, the partial counts and the number of sentences they cover are written
+                              atomically to checkpoint_file every checkpoint_every chunks of chunk_size sentences.
+                              The checkpoint is removed once count_file is written.
+            resume: Whether or not continue from the checkpoint of an interrupted call with the same parameters,
+                    if there is one, instead of counting from the start. Checkpoints are written every 10 chunks
+                    unless checkpoint_every is given.
+            partial: Whether or not write the counts as partial counts to output_dir/counts/count_data.partial,
+                     e.g. when every machine counts its own shard of the corpus. Partial counts of all shards
+                     are combined with snlp.mwes.spill.merge_partial_counts or the merge_counts.py script.
+                     With memory_limit, the run files are merged straight into the partial counts. Not
+                     supported with word_freq_cutoff, which would prune by the word counts of one shard.
+            ngram_min_count: Minimum count of the n-grams of NGRAM<n> types, see count_ngrams. N-grams are only
+                             counted exactly and in memory, so NGRAM<n> types do not support approximate,
+                             memory_limit, checkpoints or partial counts.
+            read_kwargs: Extra keyword arguments passed to get_counts_from_source, e.g. file_format or names.
 
         Returns:
             None
         """
         logger.info("Creating counts...")
-        res = get_counts(df=self.df, text_column=self.text_col, mwe_types=self.mwe_types)
+        ngram_types = [mt for mt in self.mwe_types if ngram_length(mt)]
+        if ngram_types:
+            if approximate or memory_limit is not None or checkpoint_every is not None or resume or partial:
+                raise ValueError(
+                    "NGRAM<n> types are only counted exactly in memory. approximate, memory_limit, "
+                    "checkpoint_every, resume and partial are not supported."
+                )
+            if source is not None and not isinstance(source, str):
+                raise ValueError("NGRAM<n> types need a second pass over source, so source must be a path.")
+        if approximate and partial:
+            raise ValueError("Approximate counts cannot be written as partial counts. Use ApproximateCounts.merge.")
+        if partial and word_freq_cutoff is not None:
+            # A shard only knows its own word counts, so it would prune compounds that are frequent in the corpus.
+            raise ValueError("word_freq_cutoff is not supported for partial counts. Apply it in extract_mwes.")
+        if file_name and approximate != file_name.endswith(".sketch"):
+            raise ValueError("file_name must end with .sketch if and only if approximate is True.")
+        if file_name and partial != file_name.endswith(".partial"):
+            raise ValueError("file_name must end with .partial if and only if partial is True.")
+        if file_name is None:
+            # Switch between the extensions of approximate, partial and regular counts, keeping other file names.
+            modes = (".sketch", ".partial")
+            ext = ".json" if self.storage == "json" else ".store"
+            ext = ".sketch" if approximate else ".partial" if partial else ext
+            if not self.count_file.endswith(ext) and (ext in modes or self.count_file.endswith(modes)):
+                self.count_file = os.path.splitext(self.count_file)[0] + ext
+        if file_name:
+            self.count_file = file_name
+        key = None
+        if self.cache is not None and not resume:
+            key = self._counts_key(
+                source, approximate, memory_budget, word_freq_cutoff, chunk_size, read_kwargs, ngram_min_count
+            )
+            if key is not None and self.cache.get(key, [self.count_file]):
+                self._finish_counts(key)
+                return
+        checkpoint = None
+        if checkpoint_every is not None or resume:
+            params = {
+                "mwe_types": list(self.mwe_types),
+                "text_column": self.text_col,
+                "source": source if isinstance(source, str) else None,
+                "num_rows": None if self.df is None or source is not None else len(self.df),
+                "approximate": approximate,
+                "memory_budget": memory_budget if approximate else None,
+                "word_freq_cutoff": word_freq_cutoff,
+                "storage": self.storage,
+            }
+            checkpoint = CountCheckpoint(self.checkpoint_file, every=checkpoint_every or 10, params=params)
+            if not resume:
+                checkpoint.clear()
+        # Binary counts are accumulated under word ids instead of being converted from dictionaries at the end.
+        # N-gram counts are merged into the dictionary of the other types and words first.
+        return_store = self.storage == "binary" and not partial and not ngram_types
+        pos_types = [mt for mt in self.mwe_types if mt not in ngram_types]
+        if approximate:
+            if word_freq_cutoff is not None or memory_limit is not None:
+                raise ValueError("word_freq_cutoff and memory_limit are not supported for approximate counts.")
+            if source is not None:
+                chunks = read_corpus_chunks(source, self.text_col, chunk_size=chunk_size, **read_kwargs)
+                texts = (t for chunk in chunks for t in chunk[self.text_col])
+            elif self.df is None:
+                raise ValueError("MWE was instantiated without a DataFrame. Pass a source to build_counts.")
+            else:
+                texts = self.df[self.text_col]
+            res = get_approximate_counts(
+                texts=texts,
+                mwe_types=self.mwe_types,
+                memory_budget=memory_budget,
+                n_jobs=n_jobs,
+                chunk_size=chunk_size,
+                tag_cache=tag_cache,
+                checkpoint=checkpoint,
+            )
+        elif source is not None:
+            res = get_counts_from_source(
+                source=source,
+                text_column=self.text_col,
+                mwe_types=pos_types,
+                n_jobs=n_jobs,
+                chunk_size=chunk_size,
+                tag_cache=tag_cache,
+                word_freq_cutoff=word_freq_cutoff,
+                memory_limit=memory_limit,
+                spill_dir=self.count_dir,
+                checkpoint=checkpoint,
+                return_store=return_store,
+                partial_path=self.count_file if partial else None,
+                **read_kwargs,
+            )
+        elif self.df is None:
+            raise ValueError("MWE was instantiated without a DataFrame. Pass a source to build_counts.")
+        else:
+            res = get_counts(
+                df=self.df,
+                text_column=self.text_col,
+                mwe_types=pos_types,
+                n_jobs=n_jobs,
+                chunk_size=chunk_size,
+                tag_cache=tag_cache,
+                word_freq_cutoff=word_freq_cutoff,
+                memory_limit=memory_limit,
+                spill_dir=self.count_dir,
+                checkpoint=checkpoint,
+                return_store=return_store,
+                partial_path=self.count_file if partial else None,
+            )
+        if ngram_types:
+            res.update(self._count_ngrams(ngram_types, source, chunk_size, ngram_min_count, read_kwargs))
         # Directory
         try:
             Path(self.count_dir).mkdir(exist_ok=True)
         except Exception as e:
             logger.error(e)
             raise e
-        # File
-        if not file_name:
-            try:
-                with open(self.count_file, "w") as file:
-                    json.dump(res, file)
-            except Exception as e:
-                logger.error(e)
-                raise e
+        if not partial:
+            self._write_count_data(res)
+        if checkpoint is not None:
+            checkpoint.clear()
+        if key is not None:
+            self.cache.put(key, [self.count_file], description=f"counts of {self.mwe_types}")
+        self._finish_counts(key)
+
+    def _count_ngrams(
+        self,
+        ngram_types: List[str],
+        source: Optional[str],
+        chunk_size: int,
+        min_count: int,
+        read_kwargs: dict,
+    ) -> dict:
+        """Helper method to count the n-grams of ngram_types in the DataFrame or in source with count_ngrams.
+
+        Args:
+            ngram_types: NGRAM<n> types.
+            source, chunk_size, read_kwargs: See build_counts.
+            min_count: Minimum count of an n-gram to be kept.
+
+        Returns:
+            counts: Dictionary of every type of ngram_types to the counts of its n-grams.
+        """
+        if source is None:
+            texts = self.df[self.text_col]
         else:
-            try:            
-                with open(file_name, "w") as file:
-                    json.dump(res, file)
-            except Exception as e:
-                logger.error(e)
-                raise e
-            self.count_file = file_name
+            chunks = read_corpus_chunks(source, self.text_col, chunk_size=chunk_size, **read_kwargs)
+            texts = (t for chunk in chunks for t in chunk[self.text_col])
+        index = count_ngrams(texts, max_n=max(ngram_length(mt) for mt in ngram_types), min_count=min_count)
+        count_data = index.to_count_data()
+        return {mt: count_data[mt] for mt in ngram_types}
+
+    def _counts_key(
+        self,
+        source: Optional[Union[str, Iterable[str]]],
+        approximate: bool,
+        memory_budget: Union[int, str],
+        word_freq_cutoff: Optional[int],
+        chunk_size: int,
+        read_kwargs: dict,
+        ngram_min_count: int,
+    ) -> Optional[str]:
+        """Helper method to compute the cache key of the counts of build_counts, from the content of the corpus
+        and every parameter that changes the counts.
+
+        Args:
+            source, approximate, memory_budget, word_freq_cutoff, chunk_size, read_kwargs, ngram_min_count: See
+                build_counts.
+
+        Returns:
+            key: Cache key, or None if the corpus is an iterable that cannot be fingerprinted without consuming it.
+        """
+        if source is None:
+            if self.df is None:
+                return None
+            corpus = corpus_fingerprint(self.df[self.text_col])
+        elif isinstance(source, str) and os.path.isfile(source):
+            corpus = file_fingerprint(source)
+        else:
+            logger.info("Counts of an iterable source are not cached.")
+            return None
+        return fingerprint(
+            "counts",
+            corpus,
+            self.text_col if source is not None else None,
+            read_kwargs,
+            patterns_fingerprint(self.mwe_types),
+            self.tokenize,
+            os.path.splitext(self.count_file)[1],
+            approximate,
+            # Approximate counts depend on the order in which chunks are added.
+            (parse_memory_size(memory_budget), chunk_size) if approximate else None,
+            word_freq_cutoff,
+            ngram_min_count if any(ngram_length(mt) for mt in self.mwe_types) else None,
+        )
+
+    def _finish_counts(self, key: Optional[str]) -> None:
+        """Helper method to record the cache key of freshly built counts and drop state of earlier counts.
+
+        Args:
+            key: Cache key of the counts, or None if they are not cached.
+
+        Returns:
+            None
+        """
+        self._write_counts_key(key)
+        # Counts were rebuilt from scratch, so incremental AM state of earlier counts is stale.
+        if os.path.exists(self.am_state_file):
+            os.remove(self.am_state_file)
+
+    @property
+    def counts_key_file(self) -> str:
+        """File in which the cache key of count_file is stored, so that extract_mwes can reuse cached MWEs."""
+        return os.path.splitext(self.count_file)[0] + ".key"
+
+    def _read_counts_key(self) -> Optional[str]:
+        if not os.path.exists(self.counts_key_file):
+            return None
+        with open(self.counts_key_file, "r") as file:
+            return file.read().strip() or None
+
+    def _write_counts_key(self, key: Optional[str]) -> None:
+        if key is None:
+            if os.path.exists(self.counts_key_file):
+                os.remove(self.counts_key_file)
+            return
+        with open(self.counts_key_file, "w") as file:
+            file.write(key)
+
+    @property
+    def checkpoint_file(self) -> str:
+        """File in which build_counts stores the checkpoints of count_file."""
+        return os.path.splitext(self.count_file)[0] + ".checkpoint"
+
+    @property
+    def am_state_file(self) -> str:
+        """File in which the state for incremental AM recomputation of count_file is stored."""
+        return os.path.splitext(self.count_file)[0] + "_am_state.pickle"
+
+    def update_counts(
+        self,
+        new_df: pandas.DataFrame,
+        n_jobs: int = 1,
+        chunk_size: int = 10000,
+        tag_cache: Optional[TagCache] = None,
+    ) -> None:
+        """Count new_df and merge its counts into the existing count_file, instead of rebuilding the counts
+        of the whole history. Only new_df is tagged, which dominates the cost of counting, but count_file is
+        still read, merged with the new counts and rewritten as a whole, so the I/O and memory of an update grow
+        with the history. The next call to extract_mwes only recomputes the scores of the compounds whose counts,
+        or the counts of whose words, changed, but it still reads count_file and sorts the scores of all
+        compounds. For a stream in which only recent data matters, see snlp.mwes.windowed.WindowedCounts.
+
+        Args:
+            new_df: DataFrame with new data in text_column. It is tokenized if the tokenize flag was set.
+            n_jobs: Number of worker processes used for counting. -1 uses all available cores.
+            chunk_size: Number of sentences per shard when n_jobs > 1.
+            tag_cache: Optional snlp.tagging.TagCache that persists POS tags across runs.
+
+        Returns:
+            None
+        """
+        if not os.path.exists(self.count_file):
+            raise FileNotFoundError(f"{self.count_file} does not exist. Call build_counts first.")
+        if any(ngram_length(mt) for mt in self.mwe_types):
+            # N-grams below ngram_min_count were never counted, so their counts cannot be updated.
+            raise ValueError("Counts of NGRAM<n> types cannot be updated. Call build_counts on the whole corpus.")
+        if self.tokenize:
+            new_df = new_df.copy()
+            new_df[self.text_col] = self._tokenize(new_df[self.text_col], n_jobs)
+        logger.info("Counting new data...")
+        if self.count_file.endswith(".sketch"):
+            # Approximate counts are mergeable, so the new data is simply added to the sketch and tables.
+            counts = get_approximate_counts(
+                texts=new_df[self.text_col],
+                mwe_types=self.mwe_types,
+                n_jobs=n_jobs,
+                chunk_size=chunk_size,
+                tag_cache=tag_cache,
+                counts=self._read_count_data(),
+            )
+            self._write_count_data(counts)
+            self._update_counts_key(new_df)
+            return
+        delta = get_counts(
+            df=new_df,
+            text_column=self.text_col,
+            mwe_types=self.mwe_types,
+            n_jobs=n_jobs,
+            chunk_size=chunk_size,
+            tag_cache=tag_cache,
+        )
+        count_data = self._read_count_data(as_dict=True)
+        merge_counts(count_data, delta)
+        self._write_count_data(count_data)
+        state = self._load_am_state() or IncrementalAM(self.mwe_types)
+        state.mark_changed(delta)
+        self._save_am_state(state)
+        self._update_counts_key(new_df)
+
+    def _update_counts_key(self, new_df: pandas.DataFrame) -> None:
+        """Helper method to derive the cache key of updated counts from the key of the old counts and the
+        content of new_df, so that MWEs of the updated counts can be cached as well.
+
+        Args:
+            new_df: DataFrame that was added to the counts, after tokenization.
 
-    def extract_mwes(self, am: str = "pmi", file_name: str=None) -> None:
+        Returns:
+            None
         """
+        key = self._read_counts_key()
+        if key is not None and self.cache is not None:
+            key = fingerprint("update", key, corpus_fingerprint(new_df[self.text_col]))
+        self._write_counts_key(None if self.cache is None else key)
+
+    def _write_count_data(self, count_data: Union[dict, CountStore, ApproximateCounts]) -> None:
+        """Helper method to write count_data to count_file in the storage format of this instance.
+
         Args:
-            mwe_types: Types of MWEs. Can be any of [NC, JNC]
-            am: The association measure to be used. Can be any of [pmi, npmi]
+            count_data: Dictionary of WORDS and MWE types to their counts, a CountStore or ApproximateCounts.
 
         Returns:
             None
         """
+        try:
+            if isinstance(count_data, ApproximateCounts):
+                count_data.save(self.count_file)
+            elif self.count_file.endswith(".partial"):
+                write_partial_counts(count_data, self.count_file, self.mwe_types)
+            elif isinstance(count_data, CountStore):
+                if self.storage == "binary":
+                    count_data.save(self.count_file)
+                else:
+                    count_data.to_json(self.count_file)
+            elif self.storage == "binary":
+                CountStore.from_dict(count_data, mwe_types=self.mwe_types).save(self.count_file)
+            else:
+                with open(self.count_file, "w") as file:
+                    json.dump(count_data, file)
+        except Exception as e:
+            logger.error(e)
+            raise e
+
+    def _read_count_data(self, as_dict: bool = False) -> Union[dict, CountStore, ApproximateCounts]:
+        """Helper method to read count_file.
+
+        Args:
+            as_dict: Whether or not convert binary counts to the dictionary format of get_counts.
+
+        Returns:
+            count_data: Dictionary of WORDS and MWE types to their counts, a memory-mapped CountStore,
+                        or ApproximateCounts.
+        """
+        if self.count_file.endswith(".sketch"):
+            counts = ApproximateCounts.load(self.count_file)
+            return counts.to_count_data() if as_dict else counts
+        if self.count_file.endswith(".partial"):
+            store = merge_partial_counts([self.count_file])
+            return store.to_dict() if as_dict else store
+        if self.storage == "binary":
+            store = CountStore.load(self.count_file)
+            return store.to_dict() if as_dict else store
         with open(self.count_file, "r") as file:
-            count_data = json.load(file)
+            return json.load(file)
+
+    def _load_am_state(self) -> Optional[IncrementalAM]:
+        """Helper method to load the incremental AM state of count_file, if there is a usable one.
+
+        Args:
+            None
+
+        Returns:
+            state (IncrementalAM or None)
+        """
+        if not os.path.exists(self.am_state_file):
+            return None
+        with open(self.am_state_file, "rb") as file:
+            state = pickle.load(file)
+        if state.mwe_types != list(self.mwe_types):
+            return None
+        return state
+
+    def _save_am_state(self, state: IncrementalAM) -> None:
+        """Helper method to store the incremental AM state of count_file.
+
+        Args:
+            state: IncrementalAM to be stored.
+
+        Returns:
+            None
+        """
+        tmp_file = self.am_state_file + ".tmp"
+        with open(tmp_file, "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, self.am_state_file)
+
+    def extract_mwes(
+        self,
+        am: Union[str, List[str]] = "pmi",
+        file_name: str=None,
+        word_freq_cutoff: int = 10,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            am: The association measure to be used. Can be any of [pmi, npmi, llr, tscore, chi2, dice] or
+                pmi<k>, e.g. pmi3. If a list of measures is given, they are computed in one pass and each is
+                stored in its own file, e.g. mwe_data_llr.json.
+            file_name: File in which MWEs are stored. Defaults to mwe_file.
+            word_freq_cutoff: Compounds with a word that occurs word_freq_cutoff times or fewer get a score of 0.0.
+            top_k: If given, only the top_k MWEs of every type are stored.
+            min_score: If given, only MWEs with a score greater than or equal to min_score are stored.
+
+        Returns:
+            None
+        """
+        ams = check_ams(am)
+        file_name = file_name or self.mwe_file
+        if isinstance(am, str):
+            file_names = [file_name]
+        else:
+            base, ext = os.path.splitext(file_name)
+            file_names = [f"{base}_{a}{ext}" for a in ams]
+        key = self._read_counts_key() if self.cache is not None else None
+        if key is not None:
+            key = fingerprint("mwes", key, ams, isinstance(am, str), word_freq_cutoff, top_k, min_score, self.storage)
+            if self.cache.get(key, file_names):
+                return
         logger.info(f"Extracting {self.mwe_types} based on {am}")
-        mwe_am_dict = calculate_am(count_data=count_data, am=am, mwe_types=self.mwe_types)
+        state = self._load_am_state()
+        if state is not None:
+            # Counts were updated with update_counts: only recompute compounds that were affected.
+            count_data = self._read_count_data(as_dict=True)
+            num_updated = state.refresh(count_data)
+            logger.info(f"Recomputed {num_updated} compounds affected by updated counts.")
+            mwe_am_dict = state.scores(
+                count_data, am, word_freq_cutoff=word_freq_cutoff, top_k=top_k, min_score=min_score
+            )
+            self._save_am_state(state)
+        else:
+            count_data = self._read_count_data()
+            mwe_am_dict = calculate_am(
+                count_data=count_data,
+                am=am,
+                mwe_types=self.mwe_types,
+                return_store=isinstance(count_data, CountStore),
+                word_freq_cutoff=word_freq_cutoff,
+                top_k=top_k,
+                min_score=min_score,
+            )
         # Dir
         try:
             Path(self.mwe_dir).mkdir(exist_ok=True)
@@ -149,20 +662,38 @@ class MWE(object):
             logger.error(e)
             raise e
         # File
-        if not file_name:
-            try:
-                with open(self.mwe_file, "w") as file:
-                    json.dump(mwe_am_dict, file)
-            except Exception as e:
-                logger.error(e)
-                raise e
+        if isinstance(am, str):
+            self._write_mwe_data(mwe_am_dict, file_name)
         else:
-            try:
+            for a, f in zip(ams, file_names):
+                self._write_mwe_data(mwe_am_dict[a], f)
+        if key is not None:
+            self.cache.put(key, file_names, description=f"{am} MWEs of {self.mwe_types}")
+
+    def _write_mwe_data(self, mwe_am_dict: Union[dict, CountStore], file_name: str) -> None:
+        """Helper method to write the scores of one association measure in the storage format of this instance.
+
+        Args:
+            mwe_am_dict: Output of calculate_am for one measure.
+            file_name: File in which MWEs are stored.
+
+        Returns:
+            None
+        """
+        logger.info(f"Writing MWEs to {file_name}")
+        try:
+            if self.storage == "binary":
+                if not isinstance(mwe_am_dict, CountStore):
+                    mwe_am_dict = CountStore.from_dict(mwe_am_dict)
+                mwe_am_dict.save(file_name)
+            elif isinstance(mwe_am_dict, CountStore):
+                mwe_am_dict.to_json(file_name, include_words=False, sort_by_value=True)
+            else:
                 with open(file_name, "w") as file:
                     json.dump(mwe_am_dict, file)
-            except Exception as e:
-                logger.error(e)
-                raise e
+        except Exception as e:
+            logger.error(e)
+            raise e
 
 
 if __name__ == "__main__":
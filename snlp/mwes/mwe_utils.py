@@ -1,38 +1,202 @@
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from collections import Counter, deque
+import itertools
 import json
+import os
 import sys
+import multiprocessing
+import multiprocessing.pool
+import numpy as np
 import pandas
-import re
 import tqdm
+from nltk import word_tokenize
 from snlp import logger
-import nltk
-from collections import Counter
+from snlp.mwes.checkpoint import CountCheckpoint
+from snlp.mwes.count_store import CountStore, CountStoreBuilder, is_count_store
+from snlp.mwes.corpus import infer_format, open_text, read_corpus_chunks, write_corpus_chunk
+from snlp.mwes.patterns import MWEMatcher
+from snlp.mwes.sketch import ApproximateCounts
+from snlp.mwes.spill import ExternalCounter, write_partial_counts
+from snlp.tagging import TagCache, pos_tag, log_cache_stats
 
 
 def replace_mwes(
-    path_to_mwes: str,
+    path_to_mwes: Union[str, CountStore],
     mwe_types: List[str],
     df: pandas.DataFrame,
     text_column: str,
     am_threshold: float = 0.7,
     only_mwes: bool = False,
     lower_case: bool = False,
+    n_jobs: int = 1,
+    chunk_size: int = 10000,
+    copy: bool = False,
 ) -> pandas.DataFrame:
     """Hyphenates the mwes in the corpus so that they are treated as a single token by downstream applications.
+    MWEs of any number of words are supported. Where MWEs overlap, the longest one that starts first is replaced.
+    The text column is processed in chunks of chunk_size rows, in parallel if n_jobs > 1, and every chunk is
+    written back as soon as it is replaced, so peak memory grows by about one chunk per worker rather than by
+    a second copy of the corpus. Chunks are read through short-lived slices of df, since with pandas
+    copy-on-write any reference to the column that is still alive would make the first write copy all of it.
+    Only object and python string columns are written in place. For any other dtype, e.g. arrow-backed strings,
+    which are immutable, or category, the replaced chunks are collected in one object array, which is assigned
+    at the end, so the old and the new column are then both held in memory.
 
     Args:
         path_to_mwes: Path to a json file that contains a dictionary of MWE type for each type,
-                    unique MWEs to their count. E.g. {'NC': {'mwe1': 10}}.
-        mwe_types: Types of MWEs to be replaced. Can be any of [NC, JNC].
+                    unique MWEs to their count. E.g. {'NC': {'mwe1': 10}}. Can also be a CountStore of scores,
+                    as returned by calculate_am(..., return_store=True), or the path to a saved one.
+        mwe_types: Types of MWEs to be replaced. Can be any of [NC, JNC], registered types or NGRAM<n> types.
         df: DataFrame comprising training data with a tokenized text column.
         text_column: Text (content) column of df.
         am_threshold: MWEs with an am greater than or equal to this threshold are selected for replacement.
         only_mwes: Whether or not keep only MWEs and drop the rest of the text.
         lower_case: Whether or not lowercase the sentence before replacing MWEs.
+        n_jobs: Number of worker processes. -1 uses all available cores. Every worker receives the selected
+                MWEs once. The order of the rows is preserved.
+        chunk_size: Number of rows that are replaced at a time.
+        copy: Whether or not leave df unchanged and return a new DataFrame. By default text_column of df is
+              replaced in place, which does not hold the corpus in memory twice if text_column is of object
+              or python string dtype.
 
     Returns:
         df (pandas.FataFrame)
     """
+    n_jobs = _check_parallel_args(n_jobs, chunk_size)
+    replacer = MWEReplacer.from_file(path_to_mwes, mwe_types, am_threshold, only_mwes, lower_case)
+    logger.info("Replacing compounds in text")
+    column = df.columns.get_loc(text_column)
+    num_rows = len(df)
+    # No reference to the column may outlive a slice, so that writing to it in place does not copy it.
+    chunks = (df.iloc[i : i + chunk_size, column].tolist() for i in range(0, num_rows, chunk_size))
+    replaced = _iter_replaced_chunks(chunks, replacer, n_jobs, num_chunks=-(-num_rows // chunk_size))
+    # Only object and python string columns can be written chunk by chunk. Arrow-backed strings are immutable,
+    # so every write would copy the column, and other dtypes, e.g. category, cannot hold the new sentences.
+    dtype = df.dtypes.iloc[column]
+    in_place = dtype == object or (isinstance(dtype, pandas.StringDtype) and dtype.storage == "python")
+    if copy or not in_place:
+        new_text = np.empty(num_rows, dtype=object)
+        start = 0
+        for chunk in replaced:
+            new_text[start : start + len(chunk)] = chunk
+            start += len(chunk)
+        if copy:
+            return df.assign(**{text_column: new_text})
+        df[text_column] = new_text
+        return df
+    start = 0
+    for chunk in replaced:
+        df.iloc[start : start + len(chunk), column] = chunk
+        start += len(chunk)
+    return df
+
+
+def _iter_replaced_chunks(
+    chunks: Iterable[List[str]], replacer: "MWEReplacer", n_jobs: int, num_chunks: Optional[int] = None
+) -> Iterator[List[str]]:
+    """Replace the MWEs in every chunk of sentences, serially or in a process pool, and yield the chunks in order.
+
+    Args:
+        chunks: Iterable of lists of tokenized sentences.
+        replacer: MWEReplacer with the selected MWEs. It is sent to every worker process once.
+        n_jobs: Number of worker processes.
+        num_chunks: Number of chunks, if known. Only used for the progress bar.
+
+    Returns:
+        replaced: Iterator of lists of sentences with hyphenated MWEs.
+    """
+    if n_jobs == 1:
+        for chunk in tqdm.tqdm(chunks, total=num_chunks):
+            yield replacer.replace_batch(chunk)
+        return
+    with multiprocessing.Pool(processes=n_jobs, initializer=_init_replace_worker, initargs=(replacer,)) as pool:
+        yield from tqdm.tqdm(
+            _imap_bounded(pool, _replace_chunk_worker, chunks, max_pending=2 * n_jobs), total=num_chunks
+        )
+
+
+# MWEReplacer of a worker process of _iter_replaced_chunks, set once by _init_replace_worker.
+_worker_replacer = None
+
+
+def _init_replace_worker(replacer: "MWEReplacer") -> None:
+    global _worker_replacer
+    _worker_replacer = replacer
+
+
+def _replace_chunk_worker(chunk: List[str]) -> List[str]:
+    return _worker_replacer.replace_batch(chunk)
+
+
+def replace_mwes_in_source(
+    path_to_mwes: Union[str, CountStore],
+    mwe_types: List[str],
+    source: Union[str, Iterable[str]],
+    output_path: str,
+    text_column: str,
+    am_threshold: float = 0.7,
+    only_mwes: bool = False,
+    lower_case: bool = False,
+    chunk_size: int = 10000,
+    file_format: Optional[str] = None,
+    output_format: Optional[str] = None,
+    **read_kwargs,
+) -> None:
+    """Streaming version of replace_mwes that reads the corpus and writes the output chunk by chunk.
+
+    Args:
+        path_to_mwes: Path to a json file that contains a dictionary of MWE type for each type,
+                    unique MWEs to their count. E.g. {'NC': {'mwe1': 10}}, or a CountStore of scores.
+        mwe_types: Types of MWEs to be replaced. Can be any of [NC, JNC].
+        source: Path to a TSV/CSV/JSONL/TXT file, optionally gzip compressed, or any iterable of strings.
+        output_path: File to which the corpus with replaced MWEs is written. It is gzip compressed if it ends with .gz.
+        text_column: Text (content) column of the corpus.
+        am_threshold: MWEs with an am greater than or equal to this threshold are selected for replacement.
+        only_mwes: Whether or not keep only MWEs and drop the rest of the text.
+        lower_case: Whether or not lowercase the sentence before replacing MWEs.
+        chunk_size: Number of rows that are read, processed and written at a time.
+        file_format: Format of source. Inferred from its extension if not given.
+        output_format: Format of output_path. Inferred from its extension if not given.
+        read_kwargs: Extra keyword arguments passed to pandas.read_csv or pandas.read_json.
+
+    Returns:
+        None
+    """
+    replacer = MWEReplacer.from_file(path_to_mwes, mwe_types, am_threshold, only_mwes, lower_case)
+    output_format = output_format or infer_format(output_path)
+    # Files read with explicit column names have no header, so none is written either.
+    write_header = "names" not in read_kwargs
+    logger.info(f"Replacing compounds in text and writing the results to {output_path}")
+    with open_text(output_path, "w") as handle:
+        chunks = read_corpus_chunks(source, text_column, chunk_size=chunk_size, file_format=file_format, **read_kwargs)
+        for i, chunk in enumerate(tqdm.tqdm(chunks)):
+            chunk[text_column] = replacer.replace_batch(chunk[text_column])
+            write_corpus_chunk(chunk, handle, output_format, text_column, first=i == 0 and write_header)
+
+
+def _load_good_mwes(path_to_mwes: Union[str, CountStore], mwe_types: List[str], am_threshold: float) -> set:
+    """Read MWEs from path_to_mwes and select those of mwe_types whose am is at least am_threshold.
+
+    Args:
+        path_to_mwes: Path to a json file that contains a dictionary of MWE type for each type,
+                    unique MWEs to their am, sorted by am. Can also be a CountStore of scores.
+        mwe_types: Types of MWEs to be selected.
+        am_threshold: MWEs with an am greater than or equal to this threshold are selected.
+
+    Returns:
+        good_mwes: Set of selected MWEs.
+    """
+    if not isinstance(path_to_mwes, CountStore) and is_count_store(path_to_mwes):
+        path_to_mwes = CountStore.load(path_to_mwes)
+    if isinstance(path_to_mwes, CountStore):
+        good_mwes = set()
+        for t in mwe_types:
+            if t not in path_to_mwes.pairs:
+                raise ValueError(f"MWEs of type {t} do not exist in the given CountStore.")
+            keys, scores = path_to_mwes.pairs[t]
+            good_mwes.update(path_to_mwes.pair_strings(t, keys[scores >= am_threshold]))
+        logger.info("Number of MWEs to be replaced in corpus based on the association threshold: %d" % len(good_mwes))
+        return good_mwes
     try:
         with open(path_to_mwes, "r") as file:
             mwe_type_mwe_am = json.load(file)
@@ -52,26 +216,196 @@ def replace_mwes(
             else:
                 break
         logger.info("Number of MWEs to be replaced in corpus based on the association threshold: %d" % len(good_mwes))
+    return good_mwes
 
-    logger.info("Replacing compounds in text")
-    new_text = []
-    for sent in tqdm.tqdm(df[text_column]):
-        sent = sent.lower() if lower_case else sent
-        bigrams = get_ngrams(sent, 2)
-        if only_mwes:
-            tmp = ""
-            for bg in bigrams:
-                if bg in good_mwes:
-                    tmp += bg.split(" ")[0] + "-" + bg.split(" ")[1] + " "
-            if tmp != "":
-                sent = tmp.strip()
+
+def _build_mwe_trie(good_mwes: Iterable[str]) -> dict:
+    """Helper function to index MWEs in a token trie, so that all MWEs that start at a position of a sentence
+    are found by following one dictionary lookup per token, however many MWEs there are.
+
+    Args:
+        good_mwes: MWEs to be replaced, with words separated by space.
+
+    Returns:
+        trie: Nested dictionary of token to the subtrie of its continuations. The key None marks the end of an MWE
+              and maps to the position of the MWE in good_mwes.
+    """
+    trie = {}
+    for i, mwe in enumerate(good_mwes):
+        node = trie
+        for token in mwe.split(" "):
+            node = node.setdefault(token, {})
+        node[None] = i
+    return trie
+
+
+def _iter_trie_matches(tokens: List[str], trie: dict) -> Iterator[Tuple[int, int, int]]:
+    """Find the MWEs indexed in trie that occur in tokens, in one walk over them. At every position the trie is
+    followed as far as the next tokens allow and the longest MWE that starts there is taken, so 'state of the art'
+    wins over 'state of', and the walk continues after it. The cost per token is bounded by the length of the
+    longest MWE, and tokens are compared whole, so MWEs are never matched inside other words.
+
+    Args:
+        tokens: A tokenized sentence, i.e. list of tokens.
+        trie: MWEs indexed with _build_mwe_trie.
+
+    Returns:
+        matches: Iterator of (start, end, index) of the non-overlapping MWEs, from left to right, where
+                 tokens[start:end] is the MWE at position index of the MWEs of the trie.
+    """
+    num_tokens = len(tokens)
+    i = 0
+    while i < num_tokens:
+        node = trie.get(tokens[i])
+        end, index = i, None
+        j = i + 1
+        while node is not None:
+            if None in node:
+                end, index = j, node[None]
+            if j == num_tokens:
+                break
+            node = node.get(tokens[j])
+            j += 1
+        if index is not None:
+            yield i, end, index
+            i = end
         else:
-            for bg in bigrams:
-                if bg in good_mwes:
-                    sent = re.sub(bg, bg.split(" ")[0] + "-" + bg.split(" ")[1], sent)
-        new_text.append(sent)
-    df[text_column] = new_text
-    return df
+            i += 1
+
+
+def _replace_in_sent(sent: str, trie: dict, only_mwes: bool, lower_case: bool) -> str:
+    """Hyphenate the MWEs indexed in trie that occur in sent, where they are found by _iter_trie_matches.
+
+    Args:
+        sent: Tokenized sentence.
+        trie: MWEs to be replaced, indexed with _build_mwe_trie.
+        only_mwes: Whether or not keep only MWEs and drop the rest of the text.
+        lower_case: Whether or not lowercase the sentence before replacing MWEs.
+
+    Returns:
+        sent: Sentence with hyphenated MWEs.
+    """
+    sent = sent.lower() if lower_case else sent
+    tokens = sent.split(" ")
+    out = []
+    i = 0
+    for start, end, _ in _iter_trie_matches(tokens, trie):
+        if not only_mwes:
+            out.extend(tokens[i:start])
+        out.append("-".join(tokens[start:end]))
+        i = end
+    if only_mwes and not out:
+        return sent
+    if not only_mwes:
+        out.extend(tokens[i:])
+    return " ".join(out)
+
+
+class MWEReplacer(object):
+    __slots__ = ("_mwes", "_trie", "only_mwes", "lower_case")
+
+    def __init__(self, mwes: Iterable[str], only_mwes: bool = False, lower_case: bool = False) -> None:
+        """Hyphenates a fixed set of MWEs in texts, for use at inference time. The MWEs are indexed once, and
+        replace only reads the index, so one instance can be shared across threads. Instances are immutable
+        and are pickled as one string of MWEs, which is cheap to ship to worker processes.
+
+        Args:
+            mwes: MWEs to be replaced, with words separated by space. Where MWEs overlap, the longest one
+                  that starts first is replaced.
+            only_mwes: Whether or not keep only MWEs and drop the rest of the text.
+            lower_case: Whether or not lowercase texts before replacing MWEs.
+
+        Returns:
+            None
+        """
+        mwes = frozenset(mwes)
+        object.__setattr__(self, "_mwes", mwes)
+        object.__setattr__(self, "_trie", _build_mwe_trie(mwes))
+        object.__setattr__(self, "only_mwes", only_mwes)
+        object.__setattr__(self, "lower_case", lower_case)
+
+    @classmethod
+    def from_file(
+        cls,
+        path_to_mwes: Union[str, CountStore],
+        mwe_types: List[str],
+        am_threshold: float = 0.7,
+        only_mwes: bool = False,
+        lower_case: bool = False,
+    ) -> "MWEReplacer":
+        """Select the MWEs of mwe_types whose am is at least am_threshold from the output of MWE.extract_mwes.
+
+        Args:
+            path_to_mwes: Path to a json file that contains a dictionary of MWE type to its MWEs and their am,
+                          sorted by am, or a CountStore of scores, or the path to a saved one.
+            mwe_types: Types of MWEs to be replaced.
+            am_threshold: MWEs with an am greater than or equal to this threshold are selected for replacement.
+            only_mwes: Whether or not keep only MWEs and drop the rest of the text.
+            lower_case: Whether or not lowercase texts before replacing MWEs.
+
+        Returns:
+            replacer (MWEReplacer)
+        """
+        return cls(_load_good_mwes(path_to_mwes, mwe_types, am_threshold), only_mwes, lower_case)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MWEReplacer is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("MWEReplacer is immutable.")
+
+    def __reduce__(self):
+        return self._unpack, ("\x00".join(self._mwes), self.only_mwes, self.lower_case)
+
+    @classmethod
+    def _unpack(cls, mwes: str, only_mwes: bool, lower_case: bool) -> "MWEReplacer":
+        return cls(mwes.split("\x00") if mwes else [], only_mwes, lower_case)
+
+    @property
+    def mwes(self) -> frozenset:
+        """MWEs that are replaced."""
+        return self._mwes
+
+    def __len__(self) -> int:
+        return len(self._mwes)
+
+    def replace(self, text: str) -> str:
+        """Hyphenate the MWEs in a tokenized text.
+
+        Args:
+            text: Tokenized text, with tokens separated by space.
+
+        Returns:
+            text: Text with hyphenated MWEs.
+        """
+        return _replace_in_sent(text, self._trie, self.only_mwes, self.lower_case)
+
+    def replace_batch(self, texts: Iterable[str]) -> List[str]:
+        """Hyphenate the MWEs in several tokenized texts.
+
+        Args:
+            texts: Iterable of tokenized texts.
+
+        Returns:
+            texts: List of texts with hyphenated MWEs, in the order of texts.
+        """
+        trie, only_mwes, lower_case = self._trie, self.only_mwes, self.lower_case
+        return [_replace_in_sent(t, trie, only_mwes, lower_case) for t in texts]
+
+
+def load_mwe_data(path_to_mwes: str) -> Dict[str, Dict[str, float]]:
+    """Read the output of MWE.extract_mwes, in json or binary format.
+
+    Args:
+        path_to_mwes: Path to mwe_data.json or to a mwe_data.store directory.
+
+    Returns:
+        mwe_data: Dictionary of MWE type to its MWEs and their scores, sorted by score.
+    """
+    if is_count_store(path_to_mwes):
+        return CountStore.load(path_to_mwes).to_dict(include_words=False, sort_by_value=True)
+    with open(path_to_mwes, "r") as file:
+        return json.load(file)
 
 
 def get_ngrams(sentence: str, n: int) -> List:
@@ -96,33 +430,537 @@ def get_ngrams(sentence: str, n: int) -> List:
     return ngrams
 
 
-def get_counts(df: pandas.DataFrame, text_column: str, mwe_types: List[str]) -> dict:
+def get_counts(
+    df: pandas.DataFrame,
+    text_column: str,
+    mwe_types: List[str],
+    n_jobs: int = 1,
+    chunk_size: int = 10000,
+    tag_cache: Optional[TagCache] = None,
+    word_freq_cutoff: Optional[int] = None,
+    memory_limit: Optional[Union[int, str]] = None,
+    spill_dir: Optional[str] = None,
+    checkpoint: Optional[CountCheckpoint] = None,
+    label_column: Optional[str] = None,
+    return_store: bool = False,
+    partial_path: Optional[str] = None,
+) -> Optional[Union[dict, CountStore]]:
     """Read a corpus in pandas.DataFrame format and generates all counts necessary for calculating AMs.
 
     Args:
         df (pandas.DataFrame): DataFrame with input data, which contains a column with text content
                                from which compounds and their counts are extracted.
         text_column: Name of the column the contains the text content.
-        mwe_types: Types of MWEs. Can be any of [NC, JNC]
+        mwe_types: Types of MWEs. Can be any of [NC, JNC] or types registered with
+                   snlp.mwes.patterns.register_mwe_type. Each sentence is tagged once for all types.
+        n_jobs: Number of worker processes. With n_jobs > 1 the corpus is split into shards of chunk_size
+                sentences that are counted in parallel and merged in order, which gives the same result
+                as the serial path. -1 uses all available cores.
+        chunk_size: Number of sentences per shard when n_jobs > 1.
+        tag_cache: Optional snlp.tagging.TagCache in which POS tags are looked up before calling the tagger.
+        word_freq_cutoff: If given, count in two passes. The first pass only counts words, without tagging.
+                          The second pass only counts compounds whose words all occur more than
+                          word_freq_cutoff times, and does not tag sentences without such a candidate.
+                          Compounds that calculate_am with the same word_freq_cutoff would score 0.0 are then
+                          left out, while all other counts are the same as in a single pass.
+        memory_limit: If given, e.g. 8GB, count exactly in external memory: counts are spilled to sorted run
+                      files in spill_dir whenever their estimated size reaches memory_limit, and the runs are
+                      merged into a CountStore, which is returned instead of a dictionary. The counts are
+                      identical to those of the in-memory path. Only two-word MWE types are supported.
+        spill_dir: Directory for the run files. Defaults to the system temporary directory.
+        checkpoint: Optional snlp.mwes.checkpoint.CountCheckpoint. The partial counts and the number of
+                    sentences they cover are saved to it every checkpoint.every chunks, and if it already
+                    holds a checkpoint, counting continues from there. Not supported with memory_limit.
+        label_column: If given, count the sentences of every label of label_column separately, in the same single
+                      pass, e.g. to find compounds that are typical of a class with snlp.mwes.am.calculate_label_am.
+                      Not supported with memory_limit or checkpoint.
+        return_store: Whether or not return a CountStore instead of a dictionary. The counts of every chunk of
+                      chunk_size sentences are then added to a snlp.mwes.count_store.CountStoreBuilder, so that
+                      compounds are held as packed word ids instead of strings while counting. Only two-word MWE
+                      types are supported. Not supported with label_column.
+        partial_path: If given, the counts are written to partial_path as partial counts, see
+                      snlp.mwes.spill.write_partial_counts, and None is returned. With memory_limit, the run
+                      files are merged straight into the partial counts, without building a CountStore.
+                      Not supported with label_column.
 
     Returns:
         res: Dictionary of mwe_types to dictionary of individual mwe within that type and their count.
             E.g. {'NC':{'climate change': 10, 'brain drain': 3}, 'JNC': {'black sheep': 3, 'red flag': 2}}
+            A CountStore with the same counts if memory_limit is given or return_store is True. If label_column
+            is given, a dictionary of every label to such a dictionary. None if partial_path is given.
+    """
+    n_jobs = _check_parallel_args(n_jobs, chunk_size)
+    texts = df[text_column]
+    vocab, word_counts = _frequent_words(texts, word_freq_cutoff)
+    matcher = MWEMatcher(mwe_types, vocab=vocab)
+    if label_column is not None:
+        if memory_limit is not None or checkpoint is not None or return_store or partial_path is not None:
+            raise ValueError(
+                "label_column is not supported with memory_limit, checkpoint, return_store or partial_path."
+            )
+        return _count_labelled(texts, df[label_column], matcher, n_jobs, chunk_size, tag_cache)
+    if n_jobs == 1 and memory_limit is None and checkpoint is None and not return_store and partial_path is None:
+        res = _count_shard(tqdm.tqdm(texts), matcher, tag_cache, count_words=word_counts is None)
+        if word_counts is not None:
+            res["WORDS"] = dict(word_counts)
+        log_cache_stats(tag_cache)
+        return res
+
+    res, offset = _resume(checkpoint, memory_limit, matcher.mwe_types, return_store)
+    shards = (texts.iloc[i : i + chunk_size].tolist() for i in range(offset, len(texts), chunk_size))
+    num_shards = (len(texts) - offset + chunk_size - 1) // chunk_size
+    logger.info(f"Counting {num_shards} shards of up to {chunk_size} sentences with {n_jobs} processes.")
+    return _count_chunks(
+        shards, matcher, n_jobs, tag_cache, num_shards, memory_limit, spill_dir, checkpoint, res, offset, word_counts,
+        partial_path,
+    )
+
+
+def get_counts_from_source(
+    source: Union[str, Iterable[str]],
+    text_column: str,
+    mwe_types: List[str],
+    n_jobs: int = 1,
+    chunk_size: int = 10000,
+    tag_cache: Optional[TagCache] = None,
+    file_format: Optional[str] = None,
+    word_freq_cutoff: Optional[int] = None,
+    memory_limit: Optional[Union[int, str]] = None,
+    spill_dir: Optional[str] = None,
+    checkpoint: Optional[CountCheckpoint] = None,
+    return_store: bool = False,
+    partial_path: Optional[str] = None,
+    **read_kwargs,
+) -> Optional[Union[dict, CountStore]]:
+    """Streaming version of get_counts that reads the corpus chunk by chunk from a file or an iterable,
+    so that peak memory is bounded by the counts rather than the corpus.
+
+    Args:
+        source: Path to a TSV/CSV/JSONL/TXT file, optionally gzip compressed, or any iterable of strings.
+        text_column: Name of the column the contains the text content.
+        mwe_types: Types of MWEs. Can be any of [NC, JNC] or types registered with
+                   snlp.mwes.patterns.register_mwe_type.
+        n_jobs: Number of worker processes. -1 uses all available cores.
+        chunk_size: Number of sentences that are read and counted at a time.
+        tag_cache: Optional snlp.tagging.TagCache in which POS tags are looked up before calling the tagger.
+        file_format: Any of ['tsv', 'csv', 'jsonl', 'txt']. Inferred from the file extension if not given.
+        word_freq_cutoff: If given, count in two passes over source, see get_counts. source must then be a
+                          file or an iterable that can be iterated over twice, e.g. a list.
+        memory_limit: If given, count in external memory and return a CountStore, see get_counts.
+        spill_dir: Directory for the run files of external-memory counting.
+        checkpoint: Optional snlp.mwes.checkpoint.CountCheckpoint, see get_counts. When resuming, the sentences
+                    that were already counted are read and skipped without being tagged.
+        return_store: Whether or not count into a CountStore instead of a dictionary, see get_counts.
+        partial_path: If given, write the counts to partial_path as partial counts and return None, see get_counts.
+        read_kwargs: Extra keyword arguments passed to pandas.read_csv or pandas.read_json,
+                     e.g. names=['label', 'text'] for a TSV file without a header.
+
+    Returns:
+        res: Dictionary of mwe_types to dictionary of individual mwe within that type and their count.
+    """
+    n_jobs = _check_parallel_args(n_jobs, chunk_size)
+    vocab, word_counts = None, None
+    if word_freq_cutoff is not None:
+        if not isinstance(source, (str, os.PathLike)) and iter(source) is source:
+            raise ValueError("Two-pass counting with word_freq_cutoff cannot read a one-shot iterator twice.")
+        chunks = read_corpus_chunks(source, text_column, chunk_size=chunk_size, file_format=file_format, **read_kwargs)
+        vocab, word_counts = _frequent_words((t for chunk in chunks for t in chunk[text_column]), word_freq_cutoff)
+    matcher = MWEMatcher(mwe_types, vocab=vocab)
+    res, offset = _resume(checkpoint, memory_limit, matcher.mwe_types, return_store)
+    chunks = read_corpus_chunks(source, text_column, chunk_size=chunk_size, file_format=file_format, **read_kwargs)
+    if offset:
+        chunks = _chunked((t for chunk in chunks for t in chunk[text_column]), chunk_size, offset)
+    else:
+        chunks = (chunk[text_column].tolist() for chunk in chunks)
+    return _count_chunks(
+        chunks, matcher, n_jobs, tag_cache, None, memory_limit, spill_dir, checkpoint, res, offset, word_counts,
+        partial_path,
+    )
+
+
+def _chunked(texts: Iterable[str], chunk_size: int, offset: int = 0) -> Iterator[List[str]]:
+    """Helper function to split texts into lists of chunk_size sentences, after skipping the first offset.
+
+    Args:
+        texts: Iterable of tokenized sentences.
+        chunk_size: Number of sentences per chunk.
+        offset: Number of sentences to skip.
+
+    Returns:
+        chunks: Iterator of lists of sentences.
+    """
+    iterator = itertools.islice(texts, offset, None)
+    return iter(lambda: list(itertools.islice(iterator, chunk_size)), [])
+
+
+def _resume(
+    checkpoint: Optional[CountCheckpoint],
+    memory_limit: Optional[Union[int, str]],
+    mwe_types: List[str],
+    return_store: bool = False,
+) -> Tuple[Union[dict, CountStoreBuilder], int]:
+    """Helper function to load the counts and offset to continue from.
+
+    Args:
+        checkpoint: Optional CountCheckpoint.
+        memory_limit: memory_limit of the counting call, which cannot be combined with checkpoints.
+        mwe_types: Types of MWEs.
+        return_store: Whether or not count into a CountStoreBuilder instead of a dictionary.
+
+    Returns:
+        (res, offset): Counts of the checkpoint and the number of sentences they cover, or empty counts and 0.
+    """
+    empty = CountStoreBuilder(mwe_types) if return_store else _empty_counts(mwe_types)
+    if checkpoint is None:
+        return empty, 0
+    if memory_limit is not None:
+        raise ValueError("Checkpoints are not supported for external-memory counting with memory_limit.")
+    return checkpoint.load() or (empty, 0)
+
+
+def _frequent_words(texts: Iterable[str], word_freq_cutoff: Optional[int]) -> Tuple[Optional[set], Optional[Counter]]:
+    """First pass of two-pass counting: count words without tagging and keep those above the cutoff.
+
+    Args:
+        texts: Iterable of tokenized sentences.
+        word_freq_cutoff: Words that occur word_freq_cutoff times or fewer are not kept. If None, nothing is
+                          counted and (None, None) is returned.
+
+    Returns:
+        (vocab, word_counts): Set of words that occur more than word_freq_cutoff times, and the counts of all
+                              words, in the order in which they were first seen, which the second pass reuses
+                              as WORDS instead of counting them again. Both None if word_freq_cutoff is None.
+    """
+    if word_freq_cutoff is None:
+        return None, None
+    logger.info(f"Counting words to prune compounds with words that occur {word_freq_cutoff} times or fewer.")
+    word_counts = Counter()
+    for sent in tqdm.tqdm(texts):
+        word_counts.update(sent.split(" "))
+    vocab = {w for w, c in word_counts.items() if c > word_freq_cutoff}
+    logger.info(f"{len(vocab)} of {len(word_counts)} words occur more than {word_freq_cutoff} times.")
+    return vocab, word_counts
+
+
+def _check_parallel_args(n_jobs: int, chunk_size: int) -> int:
+    """Validate n_jobs and chunk_size.
+
+    Args:
+        n_jobs: Number of worker processes, or -1 for all available cores.
+        chunk_size: Number of sentences per shard.
+
+    Returns:
+        n_jobs: Number of worker processes, with -1 resolved to the number of cores.
+    """
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs < 1:
+        raise ValueError(f"n_jobs must be a positive integer or -1. Currently it is {n_jobs}.")
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be a positive integer. Currently it is {chunk_size}.")
+    return n_jobs
+
+
+def _count_chunks(
+    chunks: Iterable[List[str]],
+    matcher: MWEMatcher,
+    n_jobs: int,
+    tag_cache: Optional[TagCache] = None,
+    num_chunks: Optional[int] = None,
+    memory_limit: Optional[Union[int, str]] = None,
+    spill_dir: Optional[str] = None,
+    checkpoint: Optional[CountCheckpoint] = None,
+    res: Optional[dict] = None,
+    offset: int = 0,
+    word_counts: Optional[Counter] = None,
+    partial_path: Optional[str] = None,
+) -> Optional[Union[dict, CountStore]]:
+    """Count every chunk of sentences, serially or in a process pool, and merge the counts in order.
+
+    Args:
+        chunks: Iterable of lists of tokenized sentences.
+        matcher: MWEMatcher compiled for the requested MWE types.
+        n_jobs: Number of worker processes.
+        tag_cache: Optional TagCache used for POS tagging.
+        num_chunks: Number of chunks, if known. Only used for the progress bar.
+        memory_limit: If given, merge the counts in external memory, see get_counts.
+        spill_dir: Directory for the run files of external-memory counting.
+        checkpoint: Optional CountCheckpoint to which the merged counts are saved periodically.
+        res: Counts to merge into, e.g. of a checkpoint, as a dictionary or a CountStoreBuilder. Defaults to
+             empty counts.
+        offset: Number of sentences that res already covers.
+        word_counts: Counts of all words of the corpus, if a first pass already counted them. They are added
+                     to res before the first chunk, unless res already covers some sentences, and the chunks
+                     are then counted without their words.
+        partial_path: If given, write the counts to partial_path as partial counts instead of returning them.
+
+    Returns:
+        res: Dictionary of mwe_types and WORDS to their counts, or a CountStore if memory_limit is given or
+             res is a CountStoreBuilder. None if partial_path is given.
+    """
+    count_words = word_counts is None
+    words = None if count_words or offset else dict(_empty_counts(matcher.mwe_types), WORDS=dict(word_counts))
+    if memory_limit is not None:
+        with ExternalCounter(matcher.mwe_types, memory_limit, tmp_dir=spill_dir) as counter:
+            if words is not None:
+                counter.add(words)
+            for partial in _iter_chunk_counts(chunks, matcher, n_jobs, tag_cache, num_chunks, count_words):
+                counter.add(partial)
+            logger.info(f"Merging {sum(len(r) for r in counter.runs.values())} run files.")
+            if partial_path is not None:
+                counter.to_partial_counts(partial_path)
+                return None
+            return counter.to_count_store()
+    if res is None:
+        res = _empty_counts(matcher.mwe_types)
+    add = CountStoreBuilder.add if isinstance(res, CountStoreBuilder) else merge_counts
+    if words is not None:
+        add(res, words)
+    _accumulate_chunks(chunks, matcher, n_jobs, tag_cache, num_chunks, res, add, checkpoint, offset, count_words)
+    res = res.to_count_store() if isinstance(res, CountStoreBuilder) else res
+    if partial_path is not None:
+        write_partial_counts(res, partial_path, matcher.mwe_types)
+        return None
+    return res
+
+
+def _accumulate_chunks(
+    chunks: Iterable[List[str]],
+    matcher: MWEMatcher,
+    n_jobs: int,
+    tag_cache: Optional[TagCache],
+    num_chunks: Optional[int],
+    res,
+    add,
+    checkpoint: Optional[CountCheckpoint] = None,
+    offset: int = 0,
+    count_words: bool = True,
+):
+    """Count every chunk and add its counts to res with add(res, partial), in order, saving res and the number
+    of sentences it covers to checkpoint every checkpoint.every chunks.
+
+    Args:
+        chunks: Iterable of lists of tokenized sentences.
+        matcher: MWEMatcher compiled for the requested MWE types.
+        n_jobs: Number of worker processes.
+        tag_cache: Optional TagCache used for POS tagging.
+        num_chunks: Number of chunks, if known. Only used for the progress bar.
+        res: Counts to add to, e.g. a dictionary or ApproximateCounts.
+        add: Function that adds the counts of one chunk to res.
+        checkpoint: Optional CountCheckpoint.
+        offset: Number of sentences that res already covers.
+        count_words: Whether or not count the words of every chunk as WORDS.
+
+    Returns:
+        res: The updated counts.
+    """
+    # Chunks are consumed ahead of their results by the process pool, so their sizes are queued.
+    sizes = deque()
+
+    def _tracked():
+        for chunk in chunks:
+            sizes.append(len(chunk))
+            yield chunk
+
+    for i, partial in enumerate(_iter_chunk_counts(_tracked(), matcher, n_jobs, tag_cache, num_chunks, count_words)):
+        add(res, partial)
+        offset += sizes.popleft()
+        if checkpoint is not None and (i + 1) % checkpoint.every == 0:
+            checkpoint.save(res, offset)
+    return res
+
+
+def _iter_chunk_counts(
+    chunks: Iterable[List[str]],
+    matcher: MWEMatcher,
+    n_jobs: int,
+    tag_cache: Optional[TagCache] = None,
+    num_chunks: Optional[int] = None,
+    count_words: bool = True,
+) -> Iterator[dict]:
+    """Count every chunk of sentences, serially or in a process pool, and yield the counts of each chunk in order.
+    The matcher and tag_cache are sent to every worker process once, not with every chunk.
+
+    Args:
+        chunks: Iterable of lists of tokenized sentences.
+        matcher: MWEMatcher compiled for the requested MWE types.
+        n_jobs: Number of worker processes.
+        tag_cache: Optional TagCache used for POS tagging.
+        num_chunks: Number of chunks, if known. Only used for the progress bar.
+        count_words: Whether or not count the words of every chunk as WORDS.
+
+    Returns:
+        partials: Iterator of dictionaries of mwe_types and WORDS to the counts of one chunk.
+    """
+    if n_jobs == 1:
+        for chunk in tqdm.tqdm(chunks, total=num_chunks):
+            yield _count_shard(chunk, matcher, tag_cache, count_words)
+    else:
+        initargs = (matcher, tag_cache, count_words)
+        with multiprocessing.Pool(processes=n_jobs, initializer=_init_count_worker, initargs=initargs) as pool:
+            for partial, cache_stats in tqdm.tqdm(
+                _imap_bounded(pool, _count_shard_worker, chunks, max_pending=2 * n_jobs), total=num_chunks
+            ):
+                if tag_cache is not None:
+                    tag_cache.record(*cache_stats)
+                yield partial
+    log_cache_stats(tag_cache)
+
+
+def get_approximate_counts(
+    texts: Iterable[str],
+    mwe_types: List[str],
+    memory_budget: Union[int, str] = "1GB",
+    n_jobs: int = 1,
+    chunk_size: int = 10000,
+    tag_cache: Optional[TagCache] = None,
+    counts: Optional[ApproximateCounts] = None,
+    checkpoint: Optional[CountCheckpoint] = None,
+) -> ApproximateCounts:
+    """Approximate version of get_counts whose memory does not grow with the corpus. Every chunk of
+    chunk_size sentences is counted exactly and then folded into a count-min sketch of words and
+    Misra-Gries heavy-hitter tables of MWE candidates. See snlp.mwes.sketch.ApproximateCounts for the
+    error bounds.
+
+    Args:
+        texts: Iterable of tokenized sentences, e.g. a DataFrame column or a streamed corpus.
+        mwe_types: Types of MWEs.
+        memory_budget: Memory for the sketch and the tables, in bytes or as a string such as 512MB. The exact
+                       counts of one chunk at a time come on top of it.
+        n_jobs: Number of worker processes. -1 uses all available cores.
+        chunk_size: Number of sentences that are counted exactly at a time.
+        tag_cache: Optional snlp.tagging.TagCache in which POS tags are looked up before calling the tagger.
+        counts: Optional ApproximateCounts, e.g. of earlier data, to which the counts of texts are added.
+        checkpoint: Optional snlp.mwes.checkpoint.CountCheckpoint, see get_counts.
+
+    Returns:
+        counts (ApproximateCounts)
+    """
+    n_jobs = _check_parallel_args(n_jobs, chunk_size)
+    matcher = MWEMatcher(mwe_types)
+    state = checkpoint.load() if checkpoint is not None else None
+    offset = 0
+    if state is not None:
+        counts, offset = state
+    elif counts is None:
+        counts = ApproximateCounts(mwe_types, memory_budget=memory_budget)
+    if counts.mwe_types != list(mwe_types):
+        raise ValueError(f"counts were created for {counts.mwe_types}, not for {mwe_types}.")
+    chunks = _chunked(texts, chunk_size, offset)
+    _accumulate_chunks(chunks, matcher, n_jobs, tag_cache, None, counts, ApproximateCounts.add, checkpoint, offset)
+    for mt, bound in counts.error_bounds().items():
+        logger.info(f"Approximate counts of {mt}: maximum error {bound['max_error']:.1f} "
+                    f"with probability {bound['probability']:.3f}.")
+    return counts
+
+
+def _imap_bounded(pool: multiprocessing.pool.Pool, func, iterable: Iterable, max_pending: int) -> Iterator:
+    """Like pool.imap, but keep at most max_pending tasks in flight instead of consuming iterable eagerly,
+    so that a streamed corpus is never read into memory ahead of the workers.
+
+    Args:
+        pool: Process pool.
+        func: Function applied to every item of iterable.
+        iterable: Input items.
+        max_pending: Maximum number of submitted tasks whose results have not been consumed yet.
+
+    Returns:
+        results: Iterator of func(item), in the order of iterable.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def tokenize_texts(texts: Iterable[str], n_jobs: int = 1, chunk_size: int = 10000) -> List[str]:
+    """Tokenize texts with nltk.word_tokenize and join the tokens of every text with a space.
+
+    Args:
+        texts: Iterable of texts.
+        n_jobs: Number of worker processes. -1 uses all available cores.
+        chunk_size: Number of texts that are sent to a worker at a time.
+
+    Returns:
+        texts: List of tokenized texts, in the order of texts.
+    """
+    n_jobs = _check_parallel_args(n_jobs, chunk_size)
+    chunks = _chunked(texts, chunk_size)
+    if n_jobs == 1:
+        return [t for chunk in tqdm.tqdm(chunks) for t in _tokenize_chunk(chunk)]
+    with multiprocessing.Pool(processes=n_jobs) as pool:
+        return [t for chunk in tqdm.tqdm(_imap_bounded(pool, _tokenize_chunk, chunks, 2 * n_jobs)) for t in chunk]
+
+
+def _tokenize_chunk(texts: List[str]) -> List[str]:
+    return [" ".join(word_tokenize(t)) for t in texts]
+
+
+def merge_counts(res: dict, partial: dict) -> dict:
+    """Merge the counts in partial into res, in place.
+
+    Args:
+        res: Dictionary of WORDS and MWE types to their counts, as returned by get_counts.
+        partial: Dictionary with the same structure as res, e.g. the counts of one shard of the corpus.
+
+    Returns:
+        res: The updated res dictionary.
+    """
+    for key, counts in partial.items():
+        target = res.setdefault(key, {})
+        for k, v in counts.items():
+            if k in target:
+                target[k] += v
+            else:
+                target[k] = v
+    return res
+
+
+def _empty_counts(mwe_types: List[str]) -> dict:
+    """Helper function to create an empty count dictionary for mwe_types.
+
+    Args:
+        mwe_types: Types of MWEs.
+
+    Returns:
+        res: Dictionary of each MWE type and WORDS to an empty dictionary.
     """
     res = {}
     for mt in mwe_types:
         res[mt] = {}
     res["WORDS"] = {}
-    for sent in tqdm.tqdm(df[text_column]):
+    return res
+
+
+def _count_shard(
+    texts: Iterable[str], matcher: MWEMatcher, tag_cache: Optional[TagCache] = None, count_words: bool = True
+) -> dict:
+    """Count words and MWEs of the types compiled into matcher in texts.
+
+    Args:
+        texts: Iterable of tokenized sentences.
+        matcher: MWEMatcher compiled for the requested MWE types.
+        tag_cache: Optional TagCache used for POS tagging.
+        count_words: Whether or not count words. If False, WORDS is left empty, e.g. because a first pass
+                     already counted them.
+
+    Returns:
+        res: Dictionary of mwe_types and WORDS to their counts.
+    """
+    res = _empty_counts(matcher.mwe_types)
+    for sent in texts:
         tokens = sent.split(" ")
-        word_count_dict = Counter(tokens)
-        for k, v in word_count_dict.items():
-            if k in res["WORDS"]:
-                res["WORDS"][k] += v
-            else:
-                res["WORDS"][k] = v
-        for mt in mwe_types:
-            mwes_count_dic = extract_mwes_from_sent(tokens, mwe_type=mt)
+        if count_words:
+            word_count_dict = Counter(tokens)
+            for k, v in word_count_dict.items():
+                if k in res["WORDS"]:
+                    res["WORDS"][k] += v
+                else:
+                    res["WORDS"][k] = v
+        for mt, mwes_count_dic in extract_all_mwes_from_sent(tokens, matcher, tag_cache).items():
             for k, v in mwes_count_dic.items():
                 if k in res[mt]:
                     res[mt][k] += v
@@ -131,47 +969,152 @@ def get_counts(df: pandas.DataFrame, text_column: str, mwe_types: List[str]) ->
     return res
 
 
-def extract_mwes_from_sent(tokens: List[str], mwe_type: str) -> Dict:
-    """Extract two-word noun compounds from tokenized input.
+def _count_labelled(
+    texts: pandas.Series,
+    labels: pandas.Series,
+    matcher: MWEMatcher,
+    n_jobs: int,
+    chunk_size: int,
+    tag_cache: Optional[TagCache] = None,
+) -> dict:
+    """Count words and MWEs separately for every label, in one pass in which every sentence is tagged once.
+
+    Args:
+        texts: Tokenized sentences.
+        labels: Label of every sentence.
+        matcher: MWEMatcher compiled for the requested MWE types.
+        n_jobs: Number of worker processes.
+        chunk_size: Number of sentences per shard.
+        tag_cache: Optional TagCache used for POS tagging.
+
+    Returns:
+        res: Dictionary of every label to the dictionary of WORDS and MWE types to their counts.
+    """
+    shards = (
+        (texts.iloc[i : i + chunk_size].tolist(), labels.iloc[i : i + chunk_size].tolist())
+        for i in range(0, len(texts), chunk_size)
+    )
+    num_shards = (len(texts) + chunk_size - 1) // chunk_size
+    res = {}
+
+    def _merge(partial: dict) -> None:
+        for label, counts in partial.items():
+            merge_counts(res.setdefault(label, _empty_counts(matcher.mwe_types)), counts)
+
+    if n_jobs == 1:
+        for shard_texts, shard_labels in tqdm.tqdm(shards, total=num_shards):
+            _merge(_count_labelled_shard(shard_texts, shard_labels, matcher, tag_cache))
+    else:
+        # The matcher is sent to every worker once, as in _iter_chunk_counts.
+        initargs = (matcher, tag_cache)
+        with multiprocessing.Pool(processes=n_jobs, initializer=_init_count_worker, initargs=initargs) as pool:
+            for partial, cache_stats in tqdm.tqdm(
+                _imap_bounded(pool, _count_labelled_shard_worker, shards, max_pending=2 * n_jobs), total=num_shards
+            ):
+                if tag_cache is not None:
+                    tag_cache.record(*cache_stats)
+                _merge(partial)
+    log_cache_stats(tag_cache)
+    return res
+
+
+def _count_labelled_shard(
+    texts: List[str], labels: list, matcher: MWEMatcher, tag_cache: Optional[TagCache] = None
+) -> dict:
+    """Group the sentences of a shard by label and count every group with _count_shard."""
+    groups = {}
+    for text, label in zip(texts, labels):
+        groups.setdefault(label, []).append(text)
+    return {label: _count_shard(group, matcher, tag_cache) for label, group in groups.items()}
+
+
+def _count_labelled_shard_worker(args: Tuple[List[str], list]) -> Tuple[dict, Tuple[int, int]]:
+    """Call _count_labelled_shard on (texts, labels) with the matcher of the worker process.
+
+    Returns:
+        (res, (hits, misses)): Counts of every label of the shard and the tag cache statistics of the worker
+                               for the shard.
+    """
+    texts, labels = args
+    res = _count_labelled_shard(texts, labels, _worker_matcher, _worker_tag_cache)
+    return res, _worker_cache_stats()
+
+
+# MWEMatcher, TagCache and count_words flag of a worker process of _iter_chunk_counts, set once by
+# _init_count_worker, so that the matcher and its vocabulary are not pickled with every shard.
+_worker_matcher = None
+_worker_tag_cache = None
+_worker_count_words = True
+
+
+def _init_count_worker(matcher: MWEMatcher, tag_cache: Optional[TagCache], count_words: bool = True) -> None:
+    global _worker_matcher, _worker_tag_cache, _worker_count_words
+    _worker_matcher = matcher
+    _worker_tag_cache = tag_cache
+    _worker_count_words = count_words
+
+
+def _worker_cache_stats() -> Tuple[int, int]:
+    """Helper function to flush the tag cache of a worker process and return the hits and misses since the
+    last call, which the parent adds to its own cache with TagCache.record."""
+    tag_cache = _worker_tag_cache
+    if tag_cache is None:
+        return 0, 0
+    tag_cache.close()
+    stats = (tag_cache.hits, tag_cache.misses)
+    tag_cache.hits, tag_cache.misses = 0, 0
+    return stats
+
+
+def _count_shard_worker(texts: List[str]) -> Tuple[dict, Tuple[int, int]]:
+    """Call _count_shard with the matcher of the worker process. Used as the target of worker processes.
+
+    Returns:
+        (res, (hits, misses)): Counts of the shard and the tag cache statistics of the worker for the shard.
+    """
+    res = _count_shard(texts, _worker_matcher, _worker_tag_cache, _worker_count_words)
+    return res, _worker_cache_stats()
+
+
+def extract_mwes_from_sent(tokens: List[str], mwe_type: str, tag_cache: Optional[TagCache] = None) -> Dict:
+    """Extract MWEs of type mwe_type, e.g. two-word noun compounds, from tokenized input.
 
     Args:
         tokens: A tokenized sentence, i.e. list of tokens.
-        type: Type of MWE. Any of ['NC', 'JNC'].
+        mwe_type: Type of MWE. Any of ['NC', 'JNC'] or a type registered with
+                  snlp.mwes.patterns.register_mwe_type.
+        tag_cache: Optional TagCache in which POS tags are looked up before calling the tagger.
 
     Returns:
         mwes_count_dic: Dictionary of compounds to their count.
     """
+    return extract_all_mwes_from_sent(tokens, MWEMatcher([mwe_type]), tag_cache)[mwe_type]
+
+
+def extract_all_mwes_from_sent(
+    tokens: List[str], matcher: MWEMatcher, tag_cache: Optional[TagCache] = None
+) -> Dict[str, Counter]:
+    """Tag tokens once and extract MWEs of all the types compiled into matcher.
+
+    Args:
+        tokens: A tokenized sentence, i.e. list of tokens.
+        matcher: MWEMatcher compiled for the requested MWE types.
+        tag_cache: Optional TagCache in which POS tags are looked up before calling the tagger.
+
+    Returns:
+        res: Dictionary of MWE type to a Counter of its MWEs in tokens.
+    """
     if not isinstance(tokens, list):
         raise TypeError(
             f'Input argument "tokens" must be a list of string. Currently it is of type {type(tokens)} \
             with a value of: {tokens}.'
         )
-    if len(tokens) == 0:
-        return
-    mwes = []
-    postag_tokens = nltk.pos_tag(tokens)
-    w1_pos_tags = []
-    w2_pos_tags = []
-    if mwe_type == "NC":
-        w1_pos_tags = ["NN", "NNS"]
-        w2_pos_tags = ["NN", "NNS"]
-    elif mwe_type == "JNC":
-        w1_pos_tags = ["JJ"]
-        w2_pos_tags = ["NN", "NNS"]
-    for i in range(len(postag_tokens) - 1):
-        w1 = postag_tokens[i]
-        if w1[1] not in w1_pos_tags:
-            continue
-        else:
-            w2 = postag_tokens[i + 1]
-            if not re.match("[a-zA-Z0-9]{2,}", w1[0]) or not re.match("[a-zA-Z0-9]{2,}", w2[0]):
-                continue
-            if w2[1] in w2_pos_tags:
-                if i + 2 < len(postag_tokens):
-                    w3 = postag_tokens[i + 2]
-                    if w3 not in ["NN", "NNS"]:
-                        mwes.append(w1[0] + " " + w2[0])
-                else:
-                    mwes.append(w1[0] + " " + w2[0])
-    mwes_count_dic = Counter(mwes)
-    return mwes_count_dic
+    if (
+        len(tokens) == 0
+        or not matcher.patterns
+        or (matcher.vocab is not None and not matcher.has_candidates(tokens))
+    ):
+        # Without patterns, e.g. for NGRAM<n> types only, there is nothing to tag for.
+        return {mt: Counter() for mt in matcher.mwe_types}
+    postag_tokens = pos_tag(tokens, cache=tag_cache)
+    return matcher.match(postag_tokens)
@@ -0,0 +1,188 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import tqdm
+from snlp import logger
+from snlp.mwes.patterns import WORD_PATTERN
+
+# Name of the MWE type under which n-grams of length n are stored in count data, e.g. NGRAM3.
+NGRAM_TYPE = "NGRAM{}"
+
+
+def ngram_type(n: int) -> str:
+    """Name of the MWE type of n-grams of length n, as used in the output of NgramIndex.to_count_data."""
+    return NGRAM_TYPE.format(n)
+
+
+class NgramIndex(object):
+    def __init__(
+        self,
+        vocab: List[str],
+        word_counts: np.ndarray,
+        grams: Dict[int, Tuple[np.ndarray, np.ndarray]],
+        min_count: int,
+    ) -> None:
+        """Counts of frequent n-grams, stored per length n as a lexicographically sorted (k, n) array of word ids
+        and an array of counts. The sorted rows form a flattened trie: the n-grams that start with a given
+        prefix are a contiguous range of rows, found with one binary search per word. Use count_ngrams to build it.
+
+        Args:
+            vocab: List of words, indexed by word id.
+            word_counts: Count of every word, indexed by word id.
+            grams: Dictionary of n to (ids, counts), where ids is a sorted (k, n) int32 array.
+            min_count: Minimum count with which n-grams were kept.
+
+        Returns:
+            None
+        """
+        self.vocab = vocab
+        self.word_counts = word_counts
+        self.grams = grams
+        self.min_count = min_count
+        self._word_ids = None
+
+    @property
+    def max_n(self) -> int:
+        """Length of the longest indexed n-grams."""
+        return max(self.grams) if self.grams else 1
+
+    @property
+    def word_ids(self) -> Dict[str, int]:
+        """Dictionary of word to word id, built on first access."""
+        if self._word_ids is None:
+            self._word_ids = {w: i for i, w in enumerate(self.vocab)}
+        return self._word_ids
+
+    @staticmethod
+    def _prefix_range(rows: np.ndarray, ids: List[int]) -> Tuple[int, int]:
+        """Helper method to find the rows that start with the word ids in ids, one binary search per word.
+
+        Args:
+            rows: Sorted (k, n) array of word ids.
+            ids: Word ids of the prefix, at most n of them.
+
+        Returns:
+            (lo, hi): Range of matching rows.
+        """
+        lo, hi = 0, len(rows)
+        for j, i in enumerate(ids):
+            column = rows[lo:hi, j]
+            lo, hi = lo + np.searchsorted(column, i, side="left"), lo + np.searchsorted(column, i, side="right")
+            if lo == hi:
+                break
+        return int(lo), int(hi)
+
+    def lookup(self, ngram: str) -> Optional[int]:
+        """Count of a space-separated n-gram.
+
+        Args:
+            ngram: N-gram such as 'state of the art'.
+
+        Returns:
+            count: Count of ngram, or None if it is not in the index, e.g. because it occurs fewer than
+                   min_count times.
+        """
+        words = ngram.split(" ")
+        if len(words) not in self.grams and len(words) != 1:
+            return None
+        ids = [self.word_ids.get(w) for w in words]
+        if None in ids:
+            return None
+        if len(ids) == 1:
+            return int(self.word_counts[ids[0]])
+        lo, hi = self._prefix_range(self.grams[len(ids)][0], ids)
+        return int(self.grams[len(ids)][1][lo]) if hi > lo else None
+
+    def continuations(self, prefix: str, n: int) -> Dict[str, int]:
+        """All indexed n-grams of length n that start with prefix.
+
+        Args:
+            prefix: Space-separated prefix of one or more words.
+            n: Length of the n-grams.
+
+        Returns:
+            ngrams: Dictionary of n-gram to its count.
+        """
+        words = prefix.split(" ")
+        ids = [self.word_ids.get(w) for w in words]
+        if n not in self.grams or len(ids) > n or None in ids:
+            return {}
+        rows, counts = self.grams[n]
+        lo, hi = self._prefix_range(rows, ids)
+        return dict(zip(self._strings(rows[lo:hi]), counts[lo:hi].tolist()))
+
+    def _strings(self, rows: np.ndarray) -> List[str]:
+        """Helper method to decode rows of word ids into space-separated n-grams."""
+        return [" ".join(self.vocab[i] for i in row) for row in rows.tolist()]
+
+    def to_count_data(self, min_n: int = 2, max_n: Optional[int] = None) -> dict:
+        """Convert the index to the count data format of get_counts, with one NGRAM<n> type per length,
+        so that it can be scored with snlp.mwes.am.calculate_am.
+
+        Args:
+            min_n: Length of the shortest n-grams to be included.
+            max_n: Length of the longest n-grams to be included. Defaults to all indexed lengths.
+
+        Returns:
+            count_data: Dictionary of WORDS and NGRAM<n> to their counts.
+        """
+        max_n = max_n or self.max_n
+        res = {}
+        for n in range(max(min_n, 2), max_n + 1):
+            rows, counts = self.grams.get(n, (np.zeros((0, n), dtype=np.int32), np.zeros(0, dtype=np.int64)))
+            res[ngram_type(n)] = dict(zip(self._strings(rows), counts.tolist()))
+        res["WORDS"] = dict(zip(self.vocab, self.word_counts.tolist()))
+        return res
+
+
+def count_ngrams(texts: Iterable[str], max_n: int = 4, min_count: int = 2) -> NgramIndex:
+    """Count all n-grams of 2 to max_n words that occur at least min_count times in texts.
+
+    The corpus is encoded once as an array of word ids, 4 bytes per token. N-grams are then counted
+    level by level: an n-gram can only occur min_count times if both of its (n-1)-grams do, so only
+    positions where two frequent (n-1)-grams overlap are candidates at level n. Infrequent n-grams are
+    therefore never materialized, and each level is counted with one vectorized sort.
+    N-grams do not cross sentence boundaries or tokens that are not words, e.g. punctuation.
+
+    Args:
+        texts: Iterable of tokenized sentences.
+        max_n: Length of the longest n-grams.
+        min_count: Minimum count of an n-gram to be kept.
+
+    Returns:
+        index (NgramIndex)
+    """
+    if max_n < 2:
+        raise ValueError(f"max_n must be at least 2. Currently it is {max_n}.")
+    if min_count < 1:
+        raise ValueError(f"min_count must be a positive integer. Currently it is {min_count}.")
+    word_ids = {}
+    ids = array("i")
+    for sent in tqdm.tqdm(texts):
+        ids.extend([word_ids.setdefault(t, len(word_ids)) for t in sent.split(" ")])
+        ids.append(-1)
+    ids = np.frombuffer(ids, dtype=np.int32) if len(ids) else np.zeros(0, dtype=np.int32)
+    vocab = list(word_ids)
+    word_counts = np.bincount(ids[ids >= 0], minlength=len(vocab)).astype(np.int64)
+    is_word = np.array([WORD_PATTERN.match(w) is not None for w in vocab], dtype=bool)
+
+    # frequent[i] is True if the (n-1)-gram that starts at position i is kept.
+    frequent = np.zeros(len(ids), dtype=bool)
+    tokens = ids >= 0
+    frequent[tokens] = is_word[ids[tokens]] & (word_counts[ids[tokens]] >= min_count)
+    grams = {}
+    for n in range(2, max_n + 1):
+        positions = np.flatnonzero(frequent[:-1] & frequent[1:])
+        rows = np.stack([ids[positions + j] for j in range(n)], axis=1)
+        order = np.lexsort(rows.T[::-1])
+        rows = rows[order]
+        starts = np.ones(len(rows), dtype=bool)
+        starts[1:] = np.any(rows[1:] != rows[:-1], axis=1)
+        group = np.cumsum(starts) - 1
+        counts = np.bincount(group).astype(np.int64)
+        keep = counts >= min_count
+        grams[n] = (rows[starts][keep], counts[keep])
+        frequent = np.zeros(max(len(ids) - n + 1, 0), dtype=bool)
+        frequent[positions[order]] = keep[group]
+        logger.info(f"Counted {keep.sum()} n-grams of length {n} that occur at least {min_count} times.")
+    return NgramIndex(vocab, word_counts, grams, min_count)
@@ -0,0 +1,174 @@
+import re
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+# Each MWE type is a sequence of positions, and each position is the set of POS tags allowed there.
+MWE_PATTERNS = {
+    "NC": (frozenset(["NN", "NNS"]), frozenset(["NN", "NNS"])),
+    "JNC": (frozenset(["JJ"]), frozenset(["NN", "NNS"])),
+}
+
+WORD_PATTERN = re.compile("[a-zA-Z0-9]{2,}")
+
+# N-grams of n words are counted by snlp.mwes.ngrams.count_ngrams under the MWE type NGRAM<n>, not matched by POS.
+NGRAM_TYPE_PATTERN = re.compile(r"NGRAM([0-9]+)")
+
+
+def parse_pattern(pattern: Union[str, Iterable[Iterable[str]]]) -> Tuple[FrozenSet[str], ...]:
+    """Parse a POS pattern into a tuple of allowed tag sets, one per position.
+
+    Args:
+        pattern: Either a string such as "JJ NN|NNS", where positions are separated by space and alternative
+                 tags by "|", or a sequence of tag collections such as [["JJ"], ["NN", "NNS"]].
+
+    Returns:
+        parsed: Tuple of frozensets of POS tags.
+    """
+    if isinstance(pattern, str):
+        positions = [p.split("|") for p in pattern.split()]
+    else:
+        positions = [[p] if isinstance(p, str) else list(p) for p in pattern]
+    if len(positions) < 2:
+        raise ValueError(f"An MWE pattern must have at least two positions. Currently it is {pattern}.")
+    for p in positions:
+        if len(p) == 0 or not all(isinstance(t, str) and t for t in p):
+            raise ValueError(f"Every position of an MWE pattern must contain at least one POS tag: {pattern}.")
+    return tuple(frozenset(p) for p in positions)
+
+
+def register_mwe_type(name: str, pattern: Union[str, Iterable[Iterable[str]]]) -> None:
+    """Register a user-defined MWE type so that it can be used wherever mwe_types are accepted.
+
+    Args:
+        name: Name of the MWE type, e.g. 'NPN'.
+        pattern: POS pattern of the type, e.g. "NN|NNS IN NN|NNS". See parse_pattern.
+
+    Returns:
+        None
+    """
+    if name == "WORDS":
+        raise ValueError('"WORDS" is reserved for word counts and cannot be used as an MWE type.')
+    if NGRAM_TYPE_PATTERN.fullmatch(name):
+        raise ValueError(f'"{name}" is reserved for n-gram counts and cannot be used as an MWE type.')
+    MWE_PATTERNS[name] = parse_pattern(pattern)
+
+
+def ngram_length(mwe_type: str) -> Optional[int]:
+    """Number of words of an NGRAM<n> type, e.g. 3 for NGRAM3, or None if mwe_type is not an n-gram type."""
+    match = NGRAM_TYPE_PATTERN.fullmatch(mwe_type)
+    if match is None or int(match.group(1)) < 2:
+        return None
+    return int(match.group(1))
+
+
+def check_mwe_types(mwe_types: List[str], ngrams: bool = False) -> None:
+    """Raise ValueError if any of mwe_types is not a registered MWE type.
+
+    Args:
+        mwe_types: Types of MWEs.
+        ngrams: Whether or not NGRAM<n> types with n >= 2 are accepted as well.
+
+    Returns:
+        None
+    """
+    for mt in mwe_types:
+        if mt not in MWE_PATTERNS and not (ngrams and ngram_length(mt)):
+            raise ValueError(f"{mt} type is not recognized.")
+
+
+def mwe_type_length(mwe_type: str) -> int:
+    """Number of words of the MWEs of a registered MWE type or of an NGRAM<n> type.
+
+    Args:
+        mwe_type: Type of MWE.
+
+    Returns:
+        length (int)
+    """
+    check_mwe_types([mwe_type], ngrams=True)
+    return ngram_length(mwe_type) or len(MWE_PATTERNS[mwe_type])
+
+
+class MWEMatcher(object):
+    def __init__(self, mwe_types: List[str], vocab: Optional[Set[str]] = None) -> None:
+        """Compile the POS patterns of mwe_types into one matcher that finds candidates of every type
+        in a single scan over a tagged sentence.
+
+        Args:
+            mwe_types: Types of MWEs. Can be any of the keys of MWE_PATTERNS.
+            vocab: Optional set of eligible words. If given, only candidates whose words are all in vocab
+                   are matched, and has_candidates tells which sentences can be skipped without tagging.
+
+        Returns:
+            None
+        """
+        check_mwe_types(mwe_types)
+        self.mwe_types = list(mwe_types)
+        self.vocab = vocab
+        self.patterns = {mt: MWE_PATTERNS[mt] for mt in self.mwe_types}
+        self.min_length = min(len(p) for p in self.patterns.values()) if self.patterns else 0
+        # First POS tag to the (type, pattern) pairs that can start with it.
+        self._by_first_tag: Dict[str, List[Tuple[str, Tuple[FrozenSet[str], ...]]]] = {}
+        for mt, pattern in self.patterns.items():
+            for tag in pattern[0]:
+                self._by_first_tag.setdefault(tag, []).append((mt, pattern))
+
+    def _is_word(self, token: str) -> bool:
+        """Helper method to check if token can be part of a candidate."""
+        return WORD_PATTERN.match(token) is not None and (self.vocab is None or token in self.vocab)
+
+    def has_candidates(self, tokens: List[str]) -> bool:
+        """Check, without POS tags, whether tokens contain a run of eligible words long enough for the shortest
+        pattern. Sentences without one cannot contain a candidate and do not need to be tagged.
+
+        Args:
+            tokens: A tokenized sentence, i.e. list of tokens.
+
+        Returns:
+            has_candidates (bool)
+        """
+        if not self.patterns:
+            return False
+        run = 0
+        for token in tokens:
+            run = run + 1 if self._is_word(token) else 0
+            if run >= self.min_length:
+                return True
+        return False
+
+    def match(self, postag_tokens: List[Tuple[str, str]]) -> Dict[str, Counter]:
+        """Find candidates of all MWE types in a POS-tagged sentence.
+
+        Args:
+            postag_tokens: List of (token, tag) tuples, as returned by nltk.pos_tag.
+
+        Returns:
+            res: Dictionary of MWE type to a Counter of its candidates in the sentence.
+        """
+        res = {mt: Counter() for mt in self.mwe_types}
+        n = len(postag_tokens)
+        is_word = [None] * n
+        for i in range(n):
+            candidates = self._by_first_tag.get(postag_tokens[i][1])
+            if not candidates:
+                continue
+            for mt, pattern in candidates:
+                end = i + len(pattern)
+                if end > n:
+                    continue
+                matched = True
+                for j in range(i + 1, end):
+                    if postag_tokens[j][1] not in pattern[j - i]:
+                        matched = False
+                        break
+                if not matched:
+                    continue
+                for j in range(i, end):
+                    if is_word[j] is None:
+                        is_word[j] = self._is_word(postag_tokens[j][0])
+                    if not is_word[j]:
+                        matched = False
+                        break
+                if matched:
+                    res[mt][" ".join(t[0] for t in postag_tokens[i:end])] += 1
+        return res
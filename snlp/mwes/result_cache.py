@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from typing import List, Union
+
+import pandas
+from snlp import logger
+from snlp.mwes.patterns import MWE_PATTERNS
+from snlp.mwes.sketch import parse_memory_size
+
+# Number of bytes read at a time when a source file is fingerprinted.
+READ_BLOCK = 1 << 20
+
+
+def fingerprint(*parts) -> str:
+    """Stable hex digest of JSON serializable parts, e.g. a corpus fingerprint and parameters.
+
+    Args:
+        parts: Values to be hashed. Dictionaries are hashed independently of their key order.
+
+    Returns:
+        digest (str)
+    """
+    data = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def corpus_fingerprint(texts: pandas.Series) -> str:
+    """Fingerprint of the content of a column of texts, independent of its index.
+
+    Args:
+        texts: Series of texts.
+
+    Returns:
+        digest (str)
+    """
+    hashes = pandas.util.hash_pandas_object(texts.astype(str), index=False).to_numpy()
+    digest = hashlib.blake2b(hashes.tobytes(), digest_size=16)
+    digest.update(str(len(hashes)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: str) -> str:
+    """Fingerprint of the content of a file.
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        digest (str)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def patterns_fingerprint(mwe_types: List[str]) -> dict:
+    """POS patterns of mwe_types, so that results of a re-registered type are not reused. NGRAM<n> types have
+    no pattern."""
+    return {mt: [sorted(p) for p in MWE_PATTERNS[mt]] if mt in MWE_PATTERNS else None for mt in mwe_types}
+
+
+def _size(path: str) -> int:
+    """Helper function to compute the size in bytes of a file or of all files in a directory."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def _copy(src: str, dst: str) -> None:
+    """Helper function to copy a file or a directory to dst, replacing dst if it exists."""
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+    directory = os.path.dirname(dst)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if os.path.isdir(src):
+        shutil.copytree(src, dst)
+    else:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache(object):
+    def __init__(self, path: str, max_size: Union[int, str] = "2GB") -> None:
+        """On-disk cache of the artifacts of MWE.build_counts and MWE.extract_mwes, i.e. count and MWE files,
+        keyed by a fingerprint of the corpus content and of the parameters that produced them.
+
+        Every entry is a directory under path. An sqlite index records the size of every entry and when it
+        was last used, and entries are evicted in least recently used order once their total size exceeds
+        max_size.
+
+        Args:
+            path: Directory of the cache. It is created if it does not exist.
+            max_size: Maximum total size of the cached artifacts, in bytes or as a string such as 512MB.
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.max_size = parse_memory_size(max_size)
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+
+    def __getstate__(self) -> dict:
+        return {"path": self.path, "max_size": self.max_size}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Helper method to open the sqlite index on first use.
+
+        Args:
+            None
+
+        Returns:
+            conn (sqlite3.Connection)
+        """
+        if self._conn is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.path, "index.sqlite"), timeout=60)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, description TEXT NOT NULL, "
+                "size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.path, key)
+
+    def get(self, key: str, targets: List[str]) -> bool:
+        """Copy the artifacts cached under key to targets, if there are any.
+
+        Args:
+            key: Fingerprint of the artifacts.
+            targets: Paths to which the artifacts are copied, in the order in which they were put.
+
+        Returns:
+            hit: Whether or not the artifacts were found and copied.
+        """
+        conn = self._connect()
+        row = conn.execute("SELECT key FROM entries WHERE key = ?", (key,)).fetchone()
+        entry_dir = self._entry_dir(key)
+        names = []
+        if row is not None and os.path.isdir(entry_dir):
+            names = sorted(os.listdir(entry_dir), key=lambda n: int(n.split(".", 1)[0]))
+        if len(names) != len(targets):
+            self.misses += 1
+            return False
+        for name, target in zip(names, targets):
+            _copy(os.path.join(entry_dir, name), target)
+        with conn:
+            conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        logger.info(f"Reused cached results {key} for {targets}.")
+        return True
+
+    def put(self, key: str, sources: List[str], description: str = "") -> None:
+        """Cache copies of the artifacts in sources under key and evict least recently used entries
+        if the cache exceeds max_size.
+
+        Args:
+            key: Fingerprint of the artifacts.
+            sources: Paths to the files or directories to be cached.
+            description: Short description of the entry, shown by info.
+
+        Returns:
+            None
+        """
+        size = sum(_size(s) for s in sources)
+        if size > self.max_size:
+            logger.warning(f"Results of {size} bytes do not fit in the cache of {self.max_size} bytes and are not cached.")
+            return
+        conn = self._connect()
+        entry_dir = self._entry_dir(key)
+        tmp_dir = entry_dir + ".tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        for i, source in enumerate(sources):
+            _copy(source, os.path.join(tmp_dir, f"{i}.{os.path.basename(source.rstrip(os.sep))}"))
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir)
+        os.replace(tmp_dir, entry_dir)
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, description, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, description, size, now, now),
+            )
+        self._evict()
+
+    def _evict(self) -> None:
+        """Helper method to remove least recently used entries until the cache fits in max_size.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        conn = self._connect()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_size:
+            return
+        evicted = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_size:
+                break
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            evicted.append((key,))
+            total -= size
+        with conn:
+            conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        logger.info(f"Evicted {len(evicted)} cached results.")
+
+    def info(self) -> dict:
+        """Return the entries of the cache, most recently used first, and hit/miss statistics of this instance.
+
+        Args:
+            None
+
+        Returns:
+            info: Dictionary with entries (a list of dictionaries with key, description, size, created and
+                  last_used), size, max_size, hits and misses.
+        """
+        rows = self._connect().execute(
+            "SELECT key, description, size, created, last_used FROM entries ORDER BY last_used DESC"
+        ).fetchall()
+        entries = [dict(zip(["key", "description", "size", "created", "last_used"], r)) for r in rows]
+        return {
+            "entries": entries,
+            "size": sum(e["size"] for e in entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def clear(self) -> None:
+        """Remove all entries from the cache and reset its statistics.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        conn = self._connect()
+        for (key,) in conn.execute("SELECT key FROM entries").fetchall():
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        with conn:
+            conn.execute("DELETE FROM entries")
+        self.hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        """Close the sqlite index.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
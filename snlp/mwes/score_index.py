@@ -0,0 +1,218 @@
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from snlp.mwes.count_store import CountStore, Vocab, is_count_store
+
+INDEX_FORMAT = "snlp-mwe-index"
+INDEX_VERSION = 1
+# Metadata file of an index directory. It differs from the meta.json of a CountStore on purpose.
+INDEX_META = "index.json"
+
+
+def is_mwe_index(path: str) -> bool:
+    """Check whether path is a directory written by MWEIndex.build.
+
+    Args:
+        path: Path to check.
+
+    Returns:
+        bool
+    """
+    return os.path.isfile(os.path.join(path, INDEX_META))
+
+
+class MWEIndex(object):
+    def __init__(self, mwes: Dict[str, Tuple[Vocab, np.ndarray, np.ndarray, np.ndarray]]) -> None:
+        """Read-only index of the scores of MWEs, typically memory-mapped from a directory written by build.
+        For every MWE type, the MWEs are stored as a Vocab sorted by their UTF-8 bytes, next to their scores,
+        the order of the MWEs by increasing score and the sorted scores. Point lookups and prefix queries are
+        binary searches over the sorted MWEs, and threshold queries are binary searches over the sorted scores,
+        so opening the index builds no Python objects and processes that open the same index share its pages.
+
+        Args:
+            mwes: Dictionary of MWE type to (sorted MWEs, scores, indices of the MWEs by increasing score,
+                  scores in increasing order).
+
+        Returns:
+            None
+        """
+        self.mwes = mwes
+        self.path = None
+
+    def __reduce__(self):
+        # An index that was opened from disk is shipped to other processes by path, like a CountStore.
+        if self.path is not None:
+            return (MWEIndex.load, (self.path,))
+        return (MWEIndex, (self.mwes,))
+
+    @property
+    def mwe_types(self) -> List[str]:
+        return list(self.mwes)
+
+    @classmethod
+    def build(cls, mwe_data: Union[str, dict, CountStore], path: str) -> "MWEIndex":
+        """Write an index of the output of MWE.extract_mwes to directory path and open it.
+
+        The directory contains index.json and, for every MWE type, <i>.data.npy and <i>.offsets.npy (the sorted
+        UTF-8 MWEs), <i>.scores.npy, <i>.by_score.npy and <i>.sorted_scores.npy. It is written to a temporary
+        directory first and then moved into place.
+
+        Args:
+            mwe_data: Path to mwe_data.json or to a mwe_data.store directory, a dictionary of MWE type to its MWEs
+                      and their scores, or a CountStore of scores.
+            path: Directory to write the index to. It is replaced if it exists.
+
+        Returns:
+            index (MWEIndex)
+        """
+        if isinstance(mwe_data, str):
+            if is_count_store(mwe_data):
+                mwe_data = CountStore.load(mwe_data)
+            else:
+                with open(mwe_data, "r") as file:
+                    mwe_data = json.load(file)
+        if isinstance(mwe_data, CountStore):
+            mwe_data = mwe_data.to_dict(include_words=False)
+        mwe_types = [mt for mt in mwe_data if mt != "WORDS"]
+        tmp_path = path.rstrip(os.sep) + ".tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        for i, mt in enumerate(mwe_types):
+            items = sorted((k.encode("utf-8"), v) for k, v in mwe_data[mt].items())
+            offsets = np.zeros(len(items) + 1, dtype=np.int64)
+            np.cumsum([len(k) for k, _ in items], out=offsets[1:])
+            scores = np.array([v for _, v in items], dtype=np.float64)
+            by_score = np.argsort(scores, kind="stable")
+            data = np.frombuffer(b"".join(k for k, _ in items), dtype=np.uint8)
+            np.save(os.path.join(tmp_path, f"{i}.data.npy"), data)
+            np.save(os.path.join(tmp_path, f"{i}.offsets.npy"), offsets)
+            np.save(os.path.join(tmp_path, f"{i}.scores.npy"), scores)
+            np.save(os.path.join(tmp_path, f"{i}.by_score.npy"), by_score)
+            np.save(os.path.join(tmp_path, f"{i}.sorted_scores.npy"), scores[by_score])
+        with open(os.path.join(tmp_path, INDEX_META), "w") as file:
+            json.dump({"format": INDEX_FORMAT, "version": INDEX_VERSION, "mwe_types": mwe_types}, file)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "MWEIndex":
+        """Open an index written by MWEIndex.build.
+
+        Args:
+            path: Directory of the index.
+            mmap: Whether or not memory-map the arrays. Opening a mapped index is close to instant.
+
+        Returns:
+            index (MWEIndex)
+        """
+        if not is_mwe_index(path):
+            raise ValueError(f"{path} is not an MWE index directory.")
+        with open(os.path.join(path, INDEX_META), "r") as file:
+            meta = json.load(file)
+        if meta["version"] > INDEX_VERSION:
+            raise ValueError(f"{path} has version {meta['version']}, which is newer than {INDEX_VERSION}.")
+        mmap_mode = "r" if mmap else None
+
+        def _load(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+
+        mwes = {}
+        for i, mt in enumerate(meta["mwe_types"]):
+            vocab = Vocab(_load(f"{i}.data.npy"), _load(f"{i}.offsets.npy"))
+            scores = _load(f"{i}.scores.npy")
+            mwes[mt] = (vocab, scores, _load(f"{i}.by_score.npy"), _load(f"{i}.sorted_scores.npy"))
+        index = cls(mwes)
+        index.path = path if mmap else None
+        return index
+
+    def _get(self, mwe_type: str) -> Tuple[Vocab, np.ndarray, np.ndarray, np.ndarray]:
+        if mwe_type not in self.mwes:
+            raise ValueError(f"MWEs of type {mwe_type} do not exist in the index.")
+        return self.mwes[mwe_type]
+
+    @staticmethod
+    def _lower_bound(vocab: Vocab, key: bytes) -> int:
+        """Helper method to find the position of the first MWE in vocab whose UTF-8 bytes are not less than key.
+
+        Args:
+            vocab: Vocab sorted by UTF-8 bytes.
+            key: UTF-8 encoded key.
+
+        Returns:
+            position (int)
+        """
+        # Indexing memoryviews of the mapped arrays is much cheaper than indexing the numpy arrays.
+        data, offsets = memoryview(vocab.data), memoryview(vocab.offsets)
+        lo, hi = 0, len(vocab)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(data[offsets[mid] : offsets[mid + 1]]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, mwe_type: str, mwe: str) -> Optional[float]:
+        """Score of an MWE, with O(log n) comparisons.
+
+        Args:
+            mwe_type: Type of the MWE.
+            mwe: MWE with words separated by space, e.g. 'brain drain'.
+
+        Returns:
+            score: Score of mwe, or None if it is not in the index.
+        """
+        vocab, scores, _, _ = self._get(mwe_type)
+        key = mwe.encode("utf-8")
+        i = self._lower_bound(vocab, key)
+        if i < len(vocab) and vocab.data[vocab.offsets[i] : vocab.offsets[i + 1]].tobytes() == key:
+            return float(scores[i])
+        return None
+
+    def prefix(self, mwe_type: str, prefix: str, limit: Optional[int] = None) -> Dict[str, float]:
+        """All MWEs that start with prefix, e.g. 'climate ' for the MWEs whose first word is climate.
+
+        Args:
+            mwe_type: Type of the MWEs.
+            prefix: Prefix of the MWEs.
+            limit: If given, return at most limit MWEs.
+
+        Returns:
+            mwes: Dictionary of MWE to its score, in lexicographic order.
+        """
+        vocab, scores, _, _ = self._get(mwe_type)
+        key = prefix.encode("utf-8")
+        lo = self._lower_bound(vocab, key)
+        # No UTF-8 encoded string contains the byte 0xff, so every MWE that starts with prefix sorts before this.
+        hi = self._lower_bound(vocab, key + b"\xff")
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return dict(zip(vocab[lo:hi], scores[lo:hi].tolist()))
+
+    def threshold(
+        self, mwe_type: str, min_score: float, max_score: Optional[float] = None, limit: Optional[int] = None
+    ) -> Dict[str, float]:
+        """All MWEs whose score is in [min_score, max_score].
+
+        Args:
+            mwe_type: Type of the MWEs.
+            min_score: Minimum score.
+            max_score: Maximum score. Unbounded if not given.
+            limit: If given, return at most limit MWEs, those with the highest scores.
+
+        Returns:
+            mwes: Dictionary of MWE to its score, sorted by decreasing score.
+        """
+        vocab, scores, by_score, sorted_scores = self._get(mwe_type)
+        lo = int(np.searchsorted(sorted_scores, min_score, side="left"))
+        hi = len(sorted_scores) if max_score is None else int(np.searchsorted(sorted_scores, max_score, side="right"))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        ids = np.asarray(by_score[lo:hi])[::-1].tolist()
+        return {vocab[i]: float(scores[i]) for i in ids}
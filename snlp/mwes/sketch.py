@@ -0,0 +1,320 @@
+import hashlib
+import math
+import pickle
+import re
+from typing import Dict, Iterable, List, Optional, Union
+import numpy as np
+
+MEMORY_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+MEMORY_PATTERN = re.compile(r"^\s*([0-9]*\.?[0-9]+)\s*([KMGT]?B?)\s*$", re.IGNORECASE)
+# Rough number of bytes taken by one entry of a heavy-hitter table: the dict slot, the key string and the int.
+ENTRY_BYTES = 160
+
+
+def parse_memory_size(size: Union[int, str]) -> int:
+    """Parse a memory size such as 512MB or 8GB into a number of bytes.
+
+    Args:
+        size: Number of bytes, or a string with one of the units B, KB, MB, GB or TB (powers of 1024).
+
+    Returns:
+        num_bytes (int)
+    """
+    if isinstance(size, (int, np.integer)):
+        num_bytes = int(size)
+    else:
+        match = MEMORY_PATTERN.match(str(size))
+        if not match:
+            raise ValueError(f"Cannot parse memory size {size}. Use e.g. 512MB or 8GB.")
+        unit = match.group(2).upper()
+        unit = unit if unit.endswith("B") or unit == "" else unit + "B"
+        num_bytes = int(float(match.group(1)) * MEMORY_UNITS[unit])
+    if num_bytes <= 0:
+        raise ValueError(f"Memory size must be positive. Currently it is {size}.")
+    return num_bytes
+
+
+def _hashes(items: List[str]) -> np.ndarray:
+    """Stable 128-bit hashes of items, independent of the Python hash seed, as a (len(items), 2) uint64 array."""
+    digests = b"".join(hashlib.blake2b(i.encode("utf-8"), digest_size=16).digest() for i in items)
+    return np.frombuffer(digests, dtype=np.uint64).reshape(-1, 2)
+
+
+class CountMinSketch(object):
+    def __init__(self, width: int, depth: int = 5) -> None:
+        """Count-min sketch: depth rows of width counters, where every item is added to one counter per row.
+
+        The estimate of an item is the minimum of its counters. It never underestimates, and with N the sum
+        of all added counts, it overestimates by more than eps * N with probability at most delta, where
+        eps = e / width and delta = e ** -depth.
+
+        Args:
+            width: Number of counters per row.
+            depth: Number of rows, i.e. of independent hash functions.
+
+        Returns:
+            None
+        """
+        if width < 1 or depth < 1:
+            raise ValueError(f"width and depth must be positive integers. Currently they are {width} and {depth}.")
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    @classmethod
+    def from_memory(cls, num_bytes: int, depth: int = 5) -> "CountMinSketch":
+        """Create the widest sketch of the given depth whose counters fit in num_bytes."""
+        return cls(width=max(num_bytes // (8 * depth), 1), depth=depth)
+
+    @property
+    def eps(self) -> float:
+        return math.e / self.width
+
+    @property
+    def delta(self) -> float:
+        return math.exp(-self.depth)
+
+    def _indices(self, items: List[str]) -> np.ndarray:
+        """Helper method to compute the counter of every item in every row with double hashing.
+
+        Args:
+            items: List of items.
+
+        Returns:
+            indices: (depth, len(items)) array of counter indices.
+        """
+        h = _hashes(items)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        with np.errstate(over="ignore"):
+            return ((h[:, 0][None, :] + rows * h[:, 1][None, :]) % np.uint64(self.width)).astype(np.int64)
+
+    def add(self, counts: Dict[str, int]) -> None:
+        """Add the counts of several items.
+
+        Args:
+            counts: Dictionary of item to count.
+
+        Returns:
+            None
+        """
+        if not counts:
+            return
+        values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        indices = self._indices(list(counts))
+        for row in range(self.depth):
+            np.add.at(self.table[row], indices[row], values)
+        self.total += int(values.sum())
+
+    def estimate(self, items: List[str]) -> np.ndarray:
+        """Estimated counts of items.
+
+        Args:
+            items: List of items.
+
+        Returns:
+            estimates: int64 array of estimated counts.
+        """
+        if len(items) == 0:
+            return np.zeros(0, dtype=np.int64)
+        indices = self._indices(items)
+        return self.table[np.arange(self.depth)[:, None], indices].min(axis=0)
+
+    def merge(self, other: "CountMinSketch") -> None:
+        """Add the counts of a sketch of the same shape, e.g. of another part of the corpus."""
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Only sketches of the same width and depth can be merged.")
+        self.table += other.table
+        self.total += other.total
+
+
+class MisraGries(object):
+    def __init__(self, capacity: int) -> None:
+        """Heavy-hitter table that keeps at most 2 * capacity items, with the Misra-Gries algorithm.
+
+        When the table is full, the (capacity + 1)-th largest count d is subtracted from all counts and
+        items whose count drops to zero are removed. Every decrement of d removes at least (capacity + 1) * d
+        from the total, so with N the sum of all added counts, an item's count is underestimated by at most
+        error <= N / (capacity + 1), and every item that occurs more than N / (capacity + 1) times is kept.
+
+        Args:
+            capacity: Number of items guaranteed to be kept.
+
+        Returns:
+            None
+        """
+        if capacity < 1:
+            raise ValueError(f"capacity must be a positive integer. Currently it is {capacity}.")
+        self.capacity = capacity
+        self.counts = {}
+        self.total = 0
+        self.error = 0
+
+    def add(self, counts: Dict[str, int]) -> None:
+        """Add the counts of several items.
+
+        Args:
+            counts: Dictionary of item to count.
+
+        Returns:
+            None
+        """
+        table = self.counts
+        for k, v in counts.items():
+            if k in table:
+                table[k] += v
+            else:
+                table[k] = v
+            self.total += v
+            if len(table) > 2 * self.capacity:
+                self._decrement()
+                table = self.counts
+
+    def _decrement(self) -> None:
+        """Helper method to subtract the (capacity + 1)-th largest count from all counts and drop the items
+        that are left with zero."""
+        values = np.fromiter(self.counts.values(), dtype=np.int64, count=len(self.counts))
+        d = int(np.partition(values, len(values) - self.capacity - 1)[len(values) - self.capacity - 1])
+        self.counts = {k: v - d for k, v in self.counts.items() if v > d}
+        self.error += d
+
+    def merge(self, other: "MisraGries") -> None:
+        """Add the table of another MisraGries, e.g. of another part of the corpus. The errors add up."""
+        self.add(other.counts)
+        self.total += other.total - sum(other.counts.values())
+        self.error += other.error
+
+
+class ApproximateCounts(object):
+    def __init__(self, mwe_types: List[str], memory_budget: Union[int, str] = "1GB", depth: int = 5) -> None:
+        """Approximate counts of words and MWE candidates in a fixed amount of memory, however large the
+        corpus. Words are counted in a CountMinSketch. For every MWE type, a MisraGries table selects the
+        heavy-hitter candidates, and the counts of these candidates are estimated from both the table and
+        a CountMinSketch of the candidates. A quarter of memory_budget goes to the word sketch, a quarter to
+        the candidate sketches and half to the tables.
+
+        Error bounds, with N the number of words and N_t the number of candidates of type t:
+            counts are never underestimated;
+            word counts are overestimated by more than e / width * N with probability at most e ** -depth;
+            candidate counts are overestimated by at most the error of the MisraGries table, which is at most
+            N_t / (capacity + 1), and by more than e / width * N_t with probability at most e ** -depth;
+            every candidate that occurs more than N_t / (capacity + 1) times is kept.
+        See error_bounds for the actual values.
+
+        Args:
+            mwe_types: Types of MWEs.
+            memory_budget: Memory for the sketches and the tables, in bytes or as a string such as 512MB.
+            depth: Depth of the count-min sketches.
+
+        Returns:
+            None
+        """
+        num_bytes = parse_memory_size(memory_budget)
+        self.mwe_types = list(mwe_types)
+        self.memory_budget = num_bytes
+        num_types = max(len(self.mwe_types), 1)
+        self.words = CountMinSketch.from_memory(num_bytes // 4, depth=depth)
+        self.compound_sketches = {
+            mt: CountMinSketch.from_memory(num_bytes // 4 // num_types, depth=depth) for mt in self.mwe_types
+        }
+        capacity = max(num_bytes // 2 // num_types // (2 * ENTRY_BYTES), 1)
+        self.compounds = {mt: MisraGries(capacity) for mt in self.mwe_types}
+
+    @property
+    def num_words(self) -> int:
+        """Exact number of words counted so far."""
+        return self.words.total
+
+    def add(self, partial: dict) -> None:
+        """Add exact counts of a part of the corpus, in the format of get_counts.
+
+        Args:
+            partial: Dictionary of WORDS and MWE types to their counts.
+
+        Returns:
+            None
+        """
+        self.words.add(partial.get("WORDS", {}))
+        for mt in self.mwe_types:
+            self.compound_sketches[mt].add(partial.get(mt, {}))
+            self.compounds[mt].add(partial.get(mt, {}))
+
+    def merge(self, other: "ApproximateCounts") -> None:
+        """Add the counts of another ApproximateCounts created with the same mwe_types and memory_budget."""
+        self.words.merge(other.words)
+        for mt in self.mwe_types:
+            self.compound_sketches[mt].merge(other.compound_sketches[mt])
+            self.compounds[mt].merge(other.compounds[mt])
+
+    def error_bounds(self) -> Dict[str, Dict[str, float]]:
+        """Error bounds of the current counts.
+
+        Args:
+            None
+
+        Returns:
+            bounds: Dictionary of WORDS and every MWE type to max_error, the maximum overestimation of a count
+                    that holds with the given probability, and, for MWE types, guaranteed_error, which always
+                    holds, and min_count, the count above which every candidate is guaranteed to be kept.
+        """
+        bounds = {"WORDS": {"max_error": self.words.eps * self.num_words, "probability": 1.0 - self.words.delta}}
+        for mt, table in self.compounds.items():
+            sketch = self.compound_sketches[mt]
+            bounds[mt] = {
+                "max_error": min(sketch.eps * sketch.total, float(table.error)),
+                "probability": 1.0 - sketch.delta,
+                "guaranteed_error": float(table.error),
+                "min_count": table.total / (table.capacity + 1.0),
+            }
+        return bounds
+
+    def to_count_data(self, mwe_types: Optional[Iterable[str]] = None) -> dict:
+        """Convert the heavy hitters to the count data format of get_counts. WORDS only contains the estimated
+        counts of the words of the heavy hitters, so it does not sum up to num_words.
+
+        Args:
+            mwe_types: Types of MWEs to be included. Defaults to all types.
+
+        Returns:
+            count_data: Dictionary of WORDS and MWE types to their estimated counts.
+        """
+        res = {}
+        words = {}
+        for mt in mwe_types or self.mwe_types:
+            table = self.compounds[mt]
+            compounds = list(table.counts)
+            # Both the table count plus its error and the sketch estimate are upper bounds of the true count.
+            upper = np.fromiter(table.counts.values(), dtype=np.int64, count=len(compounds)) + table.error
+            estimates = np.minimum(upper, self.compound_sketches[mt].estimate(compounds))
+            order = np.argsort(-estimates, kind="stable")
+            res[mt] = dict(zip([compounds[i] for i in order.tolist()], estimates[order].tolist()))
+            for compound in compounds:
+                words.update(dict.fromkeys(compound.split(" ")))
+        words = list(words)
+        res["WORDS"] = dict(zip(words, self.words.estimate(words).tolist()))
+        return res
+
+    def save(self, path: str) -> None:
+        """Store the counts in a pickle file.
+
+        Args:
+            path: Path to the file.
+
+        Returns:
+            None
+        """
+        with open(path, "wb") as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> "ApproximateCounts":
+        """Load counts stored with save.
+
+        Args:
+            path: Path to the file.
+
+        Returns:
+            counts (ApproximateCounts)
+        """
+        with open(path, "rb") as file:
+            return pickle.load(file)
@@ -0,0 +1,380 @@
+import heapq
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from snlp import logger
+from snlp.mwes.count_store import CountStore, pack_pairs
+from snlp.mwes.sketch import ENTRY_BYTES, parse_memory_size
+
+# Number of (key, count, rank) items per block of a run file. Every block is one line of JSON, so that reading
+# run files, e.g. partial counts copied from other machines, never executes code as unpickling could.
+BLOCK_SIZE = 65536
+PARTIAL_FORMAT = "snlp-partial-counts"
+PARTIAL_VERSION = 4
+# Metadata file of a partial count directory. It differs from the meta.json of a CountStore on purpose.
+PARTIAL_META = "partial.json"
+
+
+def _write_run(path: str, items: Iterable[Tuple[str, int, int]]) -> int:
+    """Helper function to write sorted (key, count, rank) items to a run file, one JSON array per block and line.
+    Returns the rank span of the run, i.e. one more than its highest rank."""
+    items = iter(items)
+    span = 0
+    with open(path, "w", encoding="utf-8") as file:
+        while True:
+            block = list(itertools.islice(items, BLOCK_SIZE))
+            if not block:
+                return span
+            span = max(span, max(rank for _, _, rank in block) + 1)
+            file.write(json.dumps(block, ensure_ascii=False))
+            file.write("\n")
+
+
+def _read_run(path: str) -> Iterator[Tuple[str, int, int]]:
+    """Helper function to stream the (key, count, rank) items of a run file, one block in memory at a time."""
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            for key, count, rank in json.loads(line):
+                yield key, count, rank
+
+
+def _ranked(counts: dict, base: int = 0) -> List[Tuple[str, int, int]]:
+    """Helper function to sort the items of counts by key, ranking every key by its position in counts plus base,
+    i.e. by the order in which it was first counted."""
+    return sorted((k, v, base + i) for i, (k, v) in enumerate(counts.items()))
+
+
+def merge_sorted_counts(streams: List[Iterator[Tuple[str, int, int]]]) -> Iterator[Tuple[str, int, int]]:
+    """K-way merge of streams of (key, count, rank) items sorted by key, summing the counts of equal keys.
+
+    Args:
+        streams: Iterators of (key, count, rank), each sorted by key, with unique keys. The rank of a key is the
+                 position at which it was first counted.
+
+    Returns:
+        merged: Iterator of (key, total count, lowest rank), sorted by key, with unique keys.
+    """
+    current, total, first = None, 0, 0
+    for key, count, rank in heapq.merge(*streams):
+        if key == current:
+            total += count
+            first = min(first, rank)
+        else:
+            if current is not None:
+                yield current, total, first
+            current, total, first = key, count, rank
+    if current is not None:
+        yield current, total, first
+
+
+class ExternalCounter(object):
+    def __init__(self, mwe_types: List[str], memory_limit: Union[int, str], tmp_dir: Optional[str] = None) -> None:
+        """Exact counts of words and MWEs that do not have to fit in memory. Counts are accumulated in
+        dictionaries until their estimated size reaches memory_limit, and are then spilled to disk as one
+        sorted run file per type. At the end, the runs are k-way merged into a CountStore. Every item of a run
+        keeps the rank at which its key was first counted, so that the merged words and compounds are in the
+        same first-seen order as the counts of get_counts in memory.
+
+        Args:
+            mwe_types: Types of MWEs.
+            memory_limit: Memory for the dictionaries, in bytes or as a string such as 8GB.
+            tmp_dir: Directory in which a temporary directory for the run files is created.
+                     Defaults to the system temporary directory.
+
+        Returns:
+            None
+        """
+        self.mwe_types = list(mwe_types)
+        self.memory_limit = parse_memory_size(memory_limit)
+        self.max_entries = max(self.memory_limit // ENTRY_BYTES, 1)
+        self.counts = {k: {} for k in ["WORDS"] + self.mwe_types}
+        self.runs = {k: [] for k in self.counts}
+        # Number of keys of every type that were spilled so far, i.e. the rank of the first key in memory.
+        self._rank_base = {k: 0 for k in self.counts}
+        if tmp_dir is not None:
+            os.makedirs(tmp_dir, exist_ok=True)
+        self.run_dir = tempfile.mkdtemp(prefix="snlp_runs_", dir=tmp_dir)
+
+    def __enter__(self) -> "ExternalCounter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def num_entries(self) -> int:
+        return sum(len(c) for c in self.counts.values())
+
+    def add(self, partial: dict) -> None:
+        """Add the counts of a part of the corpus, spilling to disk if memory_limit is reached.
+
+        Args:
+            partial: Dictionary of WORDS and MWE types to their counts, in the format of get_counts.
+
+        Returns:
+            None
+        """
+        for key, counts in partial.items():
+            target = self.counts[key]
+            for k, v in counts.items():
+                if k in target:
+                    target[k] += v
+                else:
+                    target[k] = v
+        if self.num_entries() >= self.max_entries:
+            self.spill()
+
+    def spill(self) -> None:
+        """Write the counts in memory to one sorted run file per type and clear them.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        logger.info(f"Spilling {self.num_entries()} counts to {self.run_dir}.")
+        for key, counts in self.counts.items():
+            if not counts:
+                continue
+            path = os.path.join(self.run_dir, f"{key}.{len(self.runs[key])}.run")
+            _write_run(path, _ranked(counts, self._rank_base[key]))
+            self.runs[key].append(path)
+            self._rank_base[key] += len(counts)
+        self.counts = {k: {} for k in self.counts}
+
+    def iter_sorted(self, key: str) -> Iterator[Tuple[str, int, int]]:
+        """Merged counts of WORDS or an MWE type, sorted by word or compound.
+
+        Args:
+            key: WORDS or an MWE type.
+
+        Returns:
+            merged: Iterator of (word or compound, count, rank at which it was first counted).
+        """
+        streams = [_read_run(path) for path in self.runs[key]]
+        streams.append(iter(_ranked(self.counts[key], self._rank_base[key])))
+        return merge_sorted_counts(streams)
+
+    def to_count_store(self) -> CountStore:
+        """K-way merge the runs and the counts in memory into a CountStore. Only the vocabulary is held as
+        Python objects, compounds are converted to packed arrays as they are merged.
+
+        Args:
+            None
+
+        Returns:
+            store (CountStore)
+        """
+        return _build_count_store(self.mwe_types, self.iter_sorted)
+
+    def to_partial_counts(self, path: str) -> None:
+        """K-way merge the runs and the counts in memory into partial counts, see write_partial_counts.
+
+        Args:
+            path: Directory to write the partial counts to.
+
+        Returns:
+            None
+        """
+        _write_partial(path, self.mwe_types, self.iter_sorted)
+
+    def close(self) -> None:
+        """Remove the run files.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+
+
+def _build_count_store(
+    mwe_types: List[str], iter_sorted: Callable[[str], Iterator[Tuple[str, int, int]]]
+) -> CountStore:
+    """Helper function to build a CountStore from streams of counts sorted by word or compound. Words and
+    compounds are stored in the order of their ranks, i.e. in the order in which they were first counted.
+
+    Args:
+        mwe_types: Types of MWEs.
+        iter_sorted: Function that returns the sorted (word or compound, count, rank) items of WORDS or an MWE type.
+
+    Returns:
+        store (CountStore)
+    """
+    vocab = []
+    word_counts, ranks = array("q"), array("q")
+    for word, count, rank in iter_sorted("WORDS"):
+        vocab.append(word)
+        word_counts.append(count)
+        ranks.append(rank)
+    order = _rank_order(ranks)
+    vocab = [vocab[i] for i in order]
+    store = CountStore(vocab, _as_int64(word_counts)[order], {})
+    word_ids = store.word_ids
+    for mt in mwe_types:
+        ids1, ids2, values, ranks = array("q"), array("q"), array("q"), array("q")
+        for compound, count, rank in iter_sorted(mt):
+            w1w2 = compound.split(" ")
+            if len(w1w2) != 2:
+                raise ValueError(f"CountStore only supports two-word MWEs. {mt} contains '{compound}'.")
+            ids1.append(word_ids[w1w2[0]])
+            ids2.append(word_ids[w1w2[1]])
+            values.append(count)
+            ranks.append(rank)
+        order = _rank_order(ranks)
+        keys = pack_pairs(_as_int64(ids1)[order], _as_int64(ids2)[order])
+        store.add_pairs(mt, keys, _as_int64(values)[order])
+    return store
+
+
+def _as_int64(values: array) -> np.ndarray:
+    """Helper function to view an array('q') as an int64 numpy array."""
+    return np.frombuffer(values, dtype=np.int64) if len(values) else np.zeros(0, dtype=np.int64)
+
+
+def _rank_order(ranks: array) -> np.ndarray:
+    """Helper function to compute the positions of items in ascending order of their ranks."""
+    return np.argsort(_as_int64(ranks), kind="stable")
+
+
+def is_partial_counts(path: str) -> bool:
+    """Check whether path is a directory written by write_partial_counts.
+
+    Args:
+        path: Path to check.
+
+    Returns:
+        bool
+    """
+    return os.path.isfile(os.path.join(path, PARTIAL_META))
+
+
+def _write_partial(
+    path: str, mwe_types: List[str], iter_sorted: Callable[[str], Iterator[Tuple[str, int, int]]]
+) -> None:
+    """Helper function to write partial counts from streams of counts sorted by word or compound. The directory
+    is written to a temporary directory first and then moved into place. partial.json keeps the rank span of
+    WORDS and every MWE type, by which the ranks of the partials that follow it in a merge are offset.
+
+    Args:
+        path: Directory to write the partial counts to. It is replaced if it exists.
+        mwe_types: Types of MWEs.
+        iter_sorted: Function that returns the sorted (word or compound, count, rank) items of WORDS or an MWE type.
+
+    Returns:
+        None
+    """
+    tmp_path = path.rstrip(os.sep) + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    rank_spans = {"WORDS": _write_run(os.path.join(tmp_path, "WORDS.run"), iter_sorted("WORDS"))}
+    for i, mt in enumerate(mwe_types):
+        rank_spans[mt] = _write_run(os.path.join(tmp_path, f"{i}.run"), iter_sorted(mt))
+    meta = {
+        "format": PARTIAL_FORMAT,
+        "version": PARTIAL_VERSION,
+        "mwe_types": list(mwe_types),
+        "rank_spans": rank_spans,
+    }
+    with open(os.path.join(tmp_path, PARTIAL_META), "w") as file:
+        json.dump(meta, file)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+def write_partial_counts(count_data: Union[dict, CountStore], path: str, mwe_types: Optional[List[str]] = None) -> None:
+    """Write counts of a shard of the corpus as partial counts that can be merged with the partial counts of other
+    shards by merge_partial_counts, e.g. when every machine counts its own shard. The directory contains
+    partial.json and one run file of counts sorted by word or compound for WORDS and every MWE type, which also
+    keeps the order of count_data, so that merged counts are in the order of a single pass over all shards.
+    Run files are text files with one JSON array of [key, count, rank] items per line, so partial counts of
+    other machines can be merged without executing code.
+
+    Args:
+        count_data: Dictionary of WORDS and MWE types to their counts, in the format of get_counts, or a CountStore.
+        path: Directory to write the partial counts to. It is replaced if it exists.
+        mwe_types: Types of MWEs to be written. Defaults to all types of count_data.
+
+    Returns:
+        None
+    """
+    if isinstance(count_data, CountStore):
+        mwe_types = mwe_types or count_data.mwe_types
+        count_data = count_data.to_dict()
+    mwe_types = mwe_types or [k for k in count_data if k != "WORDS"]
+    _write_partial(path, mwe_types, lambda key: iter(_ranked(count_data.get(key, {}))))
+
+
+def _read_partial_meta(path: str) -> dict:
+    """Helper function to read and validate the metadata of partial counts."""
+    if not is_partial_counts(path):
+        raise ValueError(f"{path} is not a partial count directory.")
+    with open(os.path.join(path, PARTIAL_META), "r") as file:
+        meta = json.load(file)
+    if meta["version"] != PARTIAL_VERSION:
+        raise ValueError(
+            f"{path} has version {meta['version']}, but only version {PARTIAL_VERSION} can be read. "
+            "Count the shard again."
+        )
+    return meta
+
+
+def merge_partial_counts(paths: List[str], output_path: Optional[str] = None) -> CountStore:
+    """Combine partial counts written by write_partial_counts or MWE.build_counts(partial=True) with a streaming
+    k-way merge. Only one block of every partial is held in memory at a time, next to the vocabulary. Words and
+    compounds are in the order in which a single pass over the shards of paths, in that order, would count them.
+
+    Args:
+        paths: Directories of partial counts. All of them must contain the same MWE types.
+        output_path: If given, the merged counts are also written to output_path: as partial counts if it ends
+                     with .partial, so that merges can be chained, as json if it ends with .json, and as a
+                     CountStore directory otherwise.
+
+    Returns:
+        store (CountStore)
+    """
+    if len(paths) == 0:
+        raise ValueError("At least one partial count directory must be given.")
+    mwe_types = None
+    files: Dict[str, List[str]] = {"WORDS": [os.path.join(p, "WORDS.run") for p in paths]}
+    # Ranks of every partial are offset by the rank spans of the partials before it, so that the merged counts
+    # are in the order of paths and then in the order in which every shard saw them, also for merged partials.
+    offsets: Dict[str, List[int]] = {}
+    for path in paths:
+        meta = _read_partial_meta(path)
+        if mwe_types is None:
+            mwe_types = meta["mwe_types"]
+        elif sorted(meta["mwe_types"]) != sorted(mwe_types):
+            raise ValueError(f"{path} contains {meta['mwe_types']}, but {paths[0]} contains {mwe_types}.")
+        for i, mt in enumerate(meta["mwe_types"]):
+            files.setdefault(mt, []).append(os.path.join(path, f"{i}.run"))
+        for key, span in meta["rank_spans"].items():
+            key_offsets = offsets.setdefault(key, [0])
+            key_offsets.append(key_offsets[-1] + span)
+    logger.info(f"Merging {len(paths)} partial counts.")
+
+    def _offset(offset: int, items: Iterator[Tuple[str, int, int]]) -> Iterator[Tuple[str, int, int]]:
+        return ((k, v, offset + rank) for k, v, rank in items)
+
+    def _iter_sorted(key: str) -> Iterator[Tuple[str, int, int]]:
+        return merge_sorted_counts([_offset(offsets[key][i], _read_run(f)) for i, f in enumerate(files[key])])
+
+    if output_path is not None and output_path.endswith(".partial"):
+        _write_partial(output_path, mwe_types, _iter_sorted)
+        return merge_partial_counts([output_path])
+    store = _build_count_store(mwe_types, _iter_sorted)
+    if output_path is not None:
+        if output_path.endswith(".json"):
+            store.to_json(output_path)
+        else:
+            store.save(output_path)
+    return store
@@ -0,0 +1,124 @@
+from array import array
+from typing import Iterable, List, Union
+import numpy as np
+import scipy.sparse
+from snlp.mwes.count_store import CountStore
+from snlp.mwes.mwe_utils import _build_mwe_trie, _chunked, _iter_trie_matches, _load_good_mwes
+
+
+class MWEVectorizer(object):
+    def __init__(self, mwes: Iterable[str], binary: bool = False, lower_case: bool = False) -> None:
+        """Map tokenized documents to a sparse matrix of MWE counts over a fixed vocabulary of MWEs, e.g. as
+        features of an sklearn model. Documents are matched with the token trie of replace_mwes, so MWEs are
+        found exactly where replace_mwes would hyphenate them, but no strings are built.
+
+        Args:
+            mwes: MWEs with words separated by space. Column j of the output corresponds to the j-th MWE.
+            binary: Whether or not output 1 for every MWE that occurs in a document instead of its count.
+            lower_case: Whether or not lowercase documents before matching MWEs.
+
+        Returns:
+            None
+        """
+        self.mwes = list(dict.fromkeys(mwes))
+        self.binary = binary
+        self.lower_case = lower_case
+        self.vocabulary_ = {mwe: i for i, mwe in enumerate(self.mwes)}
+        # The end of every MWE in the trie maps to its column.
+        self._trie = _build_mwe_trie(self.mwes)
+
+    @classmethod
+    def from_file(
+        cls,
+        path_to_mwes: Union[str, CountStore],
+        mwe_types: List[str],
+        am_threshold: float = 0.7,
+        binary: bool = False,
+        lower_case: bool = False,
+    ) -> "MWEVectorizer":
+        """Select the MWEs of mwe_types whose am is at least am_threshold from the output of MWE.extract_mwes,
+        in the same way as replace_mwes. The columns are in alphabetical order of the MWEs.
+
+        Args:
+            path_to_mwes: Path to a json file that contains a dictionary of MWE type to its MWEs and their am,
+                          sorted by am, or a CountStore of scores, or the path to a saved one.
+            mwe_types: Types of MWEs.
+            am_threshold: MWEs with an am greater than or equal to this threshold are selected.
+            binary: Whether or not output 1 for every MWE that occurs in a document instead of its count.
+            lower_case: Whether or not lowercase documents before matching MWEs.
+
+        Returns:
+            vectorizer (MWEVectorizer)
+        """
+        return cls(sorted(_load_good_mwes(path_to_mwes, mwe_types, am_threshold)), binary, lower_case)
+
+    def get_feature_names_out(self, input_features=None) -> np.ndarray:
+        """MWE of every column, following the sklearn convention."""
+        return np.array(self.mwes, dtype=object)
+
+    def fit(self, texts: Iterable[str] = None, y=None) -> "MWEVectorizer":
+        """Do nothing, since the vocabulary is fixed. Present for compatibility with sklearn pipelines."""
+        return self
+
+    def fit_transform(self, texts: Iterable[str], y=None) -> scipy.sparse.csr_matrix:
+        return self.transform(texts)
+
+    def _match(self, text: str, indices: array) -> None:
+        """Helper method to append the columns of the MWEs in text to indices. MWEs are found with the same
+        longest-match walk as in replace_mwes.
+
+        Args:
+            text: Tokenized document.
+            indices: Column indices to append to.
+
+        Returns:
+            None
+        """
+        tokens = (text.lower() if self.lower_case else text).split(" ")
+        indices.extend(column for _, _, column in _iter_trie_matches(tokens, self._trie))
+
+    def transform(self, texts: Iterable[str], batch_size: int = 10000) -> scipy.sparse.csr_matrix:
+        """Count the MWEs of every document.
+
+        Args:
+            texts: Iterable of tokenized documents.
+            batch_size: Number of documents whose matches are converted to a sparse matrix at a time.
+
+        Returns:
+            matrix: CSR matrix of shape (number of documents, number of MWEs) with the count of MWE j in
+                    document i, or 1 if binary is True.
+        """
+        if isinstance(texts, str):
+            raise ValueError("texts must be an iterable of documents, not a single string.")
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be a positive integer. Currently it is {batch_size}.")
+        batches = []
+        for batch in _chunked(texts, batch_size):
+            indices = array("q")
+            indptr = array("q", [0])
+            for text in batch:
+                self._match(text, indices)
+                indptr.append(len(indices))
+            batches.append(self._to_csr(indices, indptr))
+        if not batches:
+            return scipy.sparse.csr_matrix((0, len(self.mwes)), dtype=np.int64)
+        return scipy.sparse.vstack(batches, format="csr")
+
+    def _to_csr(self, indices: array, indptr: array) -> scipy.sparse.csr_matrix:
+        """Helper method to convert the matches of a batch to a CSR matrix, summing or binarizing repeated MWEs.
+
+        Args:
+            indices: Column of every match, document after document.
+            indptr: Offsets of the matches of every document in indices.
+
+        Returns:
+            matrix (scipy.sparse.csr_matrix)
+        """
+        indices = np.frombuffer(indices, dtype=np.int64) if len(indices) else np.zeros(0, dtype=np.int64)
+        data = np.ones(len(indices), dtype=np.int64)
+        shape = (len(indptr) - 1, len(self.mwes))
+        matrix = scipy.sparse.csr_matrix((data, indices, np.frombuffer(indptr, dtype=np.int64)), shape=shape)
+        matrix.sum_duplicates()
+        if self.binary:
+            matrix.data[:] = 1
+        return matrix
@@ -0,0 +1,251 @@
+import math
+from typing import Dict, List, Optional, Union
+
+import pandas
+from snlp import logger
+from snlp.mwes.am import IncrementalAM, _format_scores, check_ams
+from snlp.mwes.mwe_utils import _empty_counts, get_counts
+
+# Counts whose weight drops below this fraction of the weight of an expired bucket are rounding errors.
+EXPIRY_TOLERANCE = 1e-9
+# Largest factor between the weights of the newest bucket and of the reference bucket before the counts are
+# rebased, which keeps the weights of exponential decay far from overflowing.
+MAX_WEIGHT = 1e12
+
+
+class WindowedCounts(object):
+    def __init__(
+        self,
+        mwe_types: List[str],
+        window: Optional[int] = None,
+        decay: Optional[float] = None,
+        min_count: float = 0.5,
+    ) -> None:
+        """Counts of words and MWEs over a window of time buckets, e.g. days of a stream of reviews, whose
+        association scores are updated incrementally as buckets enter and expire.
+
+        The counts of the window are the sum of the counts of the last window buckets, i.e. their deltas,
+        optionally weighted by decay ** age, where age is the number of buckets between a bucket and the newest
+        one. Adding a bucket merges its delta into the counts of the window and subtracts the deltas of the
+        buckets that expire, so the deltas of the buckets in the window are kept if window is given. scores
+        only refreshes the compounds whose counts or word counts changed since the last call, with IncrementalAM.
+
+        With decay, counts are stored with weights decay ** -bucket relative to a reference bucket, so that
+        the counts of older buckets do not have to be updated when a new one arrives. All stored counts are
+        then off by the same factor, which is applied to the rows of all compounds at scoring time. Without a
+        window nothing expires, so once per half-life of decay the words and compounds whose weighted count
+        dropped below min_count are removed instead, which bounds the counts by the recent vocabulary rather
+        than by every word ever seen.
+
+        Args:
+            mwe_types: Types of MWEs.
+            window: Number of buckets in the window. Buckets older than window buckets before the newest one
+                    expire. Unbounded if not given, in which case decay must be given.
+            decay: Weight of a bucket relative to the next one, between 0 and 1, e.g. 0.9 for a half-life of
+                   about 6.6 buckets. No decay if not given.
+            min_count: With decay and no window, words and compounds whose weighted count is below min_count
+                       are removed. The counts and scores of the others are not affected.
+
+        Returns:
+            None
+        """
+        if window is None and decay is None:
+            raise ValueError("At least one of window and decay must be given.")
+        if window is not None and window < 1:
+            raise ValueError(f"window must be a positive integer. Currently it is {window}.")
+        if decay is not None and not 0 < decay < 1:
+            raise ValueError(f"decay must be between 0 and 1. Currently it is {decay}.")
+        if min_count < 0:
+            raise ValueError(f"min_count must not be negative. Currently it is {min_count}.")
+        self.mwe_types = list(mwe_types)
+        self.window = window
+        self.decay = decay
+        self.buckets = {}
+        self.latest = None
+        self._counts = _empty_counts(self.mwe_types)
+        self._num_words = 0.0
+        self._reference = None
+        self._state = IncrementalAM(self.mwe_types)
+        self.min_count = min_count
+        # Buckets between two removals of negligible counts, and the bucket of the last removal.
+        self._sweep_every = None
+        if decay is not None and window is None and min_count > 0:
+            self._sweep_every = max(1, math.ceil(math.log(0.5) / math.log(decay)))
+        self._last_sweep = None
+
+    def _weight(self, bucket: int) -> float:
+        """Helper method to compute the weight of the counts of bucket relative to the reference bucket."""
+        if self.decay is None:
+            return 1
+        return self.decay ** (self._reference - bucket)
+
+    def _apply(self, delta: dict, weight: float) -> None:
+        """Helper method to add delta, multiplied by weight, to the counts of the window, in place. Counts that
+        drop to 0 are removed.
+
+        Args:
+            delta: Dictionary of WORDS and MWE types to counts, as returned by get_counts.
+            weight: Weight of the counts. Negative to subtract them.
+
+        Returns:
+            None
+        """
+        tolerance = abs(weight) * EXPIRY_TOLERANCE
+        for key in ["WORDS"] + self.mwe_types:
+            target = self._counts[key]
+            for k, v in delta.get(key, {}).items():
+                value = target.get(k, 0) + v * weight
+                if abs(value) <= tolerance:
+                    target.pop(k, None)
+                else:
+                    target[k] = value
+        self._num_words += sum(delta.get("WORDS", {}).values()) * weight
+        self._state.mark_changed(delta)
+
+    def add(self, bucket: int, delta: dict) -> List[int]:
+        """Add the counts of a time bucket to the window and expire the buckets that fall out of it.
+
+        Args:
+            bucket: Integer id of the time bucket, e.g. the number of days since some date. Counts can be added
+                    to a bucket several times, and buckets can arrive late as long as they are in the window.
+            delta: Dictionary of WORDS and MWE types to the counts of the bucket, as returned by get_counts.
+
+        Returns:
+            expired: Ids of the buckets that expired, oldest first.
+        """
+        if self.window is not None and self.latest is not None and bucket <= self.latest - self.window:
+            raise ValueError(f"Bucket {bucket} is older than the window that ends with bucket {self.latest}.")
+        if self._reference is None:
+            self._reference = bucket
+        if self._weight(bucket) > MAX_WEIGHT:
+            self._rebase(bucket)
+        self.latest = bucket if self.latest is None else max(self.latest, bucket)
+        self._apply(delta, self._weight(bucket))
+        expired = []
+        if self.window is not None:
+            merged = self.buckets.setdefault(bucket, _empty_counts(self.mwe_types))
+            for key in ["WORDS"] + self.mwe_types:
+                target = merged[key]
+                for k, v in delta.get(key, {}).items():
+                    target[k] = target.get(k, 0) + v
+            expired = sorted(b for b in self.buckets if b <= self.latest - self.window)
+            for b in expired:
+                self._apply(self.buckets.pop(b), -self._weight(b))
+            if expired:
+                logger.info(f"Expired buckets {expired[0]} to {expired[-1]}.")
+        elif self._sweep_every is not None:
+            if self._last_sweep is None:
+                self._last_sweep = self.latest
+            elif self.latest - self._last_sweep >= self._sweep_every:
+                self._sweep()
+        return expired
+
+    def add_texts(self, bucket: int, df: pandas.DataFrame, text_column: str, **kwargs) -> List[int]:
+        """Count the texts of a time bucket with get_counts and add them with add.
+
+        Args:
+            bucket: Integer id of the time bucket.
+            df: DataFrame with the texts of the bucket.
+            text_column: Name of the column that contains the texts.
+            kwargs: Other arguments of get_counts, e.g. n_jobs or tag_cache.
+
+        Returns:
+            expired: Ids of the buckets that expired, oldest first.
+        """
+        return self.add(bucket, get_counts(df, text_column, self.mwe_types, **kwargs))
+
+    def _sweep(self) -> None:
+        """Helper method to remove the words and compounds whose weighted count as of the newest bucket is below
+        min_count. Compounds with a removed word are refreshed on the next call of scores.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        threshold = self.min_count / self._scale()
+        removed = {}
+        for key in ["WORDS"] + self.mwe_types:
+            counts = self._counts[key]
+            removed[key] = {k: v for k, v in counts.items() if abs(v) < threshold}
+            for k in removed[key]:
+                del counts[k]
+        self._state.mark_changed(removed)
+        self._last_sweep = self.latest
+        logger.info(f"Removed {sum(len(r) for r in removed.values())} counts below {self.min_count}.")
+
+    def _rebase(self, bucket: int) -> None:
+        """Helper method to make bucket the reference bucket by rescaling all stored counts. This touches all
+        counts, but with decay d it happens once every log(MAX_WEIGHT) / -log(d) buckets.
+
+        Args:
+            bucket: New reference bucket.
+
+        Returns:
+            None
+        """
+        factor = self.decay ** (bucket - self._reference)
+        self._counts = {key: {k: v * factor for k, v in counts.items()} for key, counts in self._counts.items()}
+        self._num_words *= factor
+        self._reference = bucket
+        # The rows of all compounds are in the old scale, so they are all refreshed on the next call of scores.
+        self._state = IncrementalAM(self.mwe_types)
+
+    @property
+    def num_words(self) -> float:
+        """Number of words in the window, weighted by decay."""
+        return self._num_words * self._scale()
+
+    def _scale(self) -> float:
+        """Helper method to compute the factor from the stored counts to the counts as of the newest bucket."""
+        if self.decay is None or self.latest is None:
+            return 1.0
+        return self.decay ** (self.latest - self._reference)
+
+    def count_data(self) -> dict:
+        """Counts of the window, weighted by decay, in the format of get_counts. This copies all counts, so use
+        scores to follow the window.
+
+        Args:
+            None
+
+        Returns:
+            count_data: Dictionary of WORDS and MWE types to their counts.
+        """
+        scale = self._scale()
+        if scale == 1.0:
+            return {key: dict(counts) for key, counts in self._counts.items()}
+        return {key: {k: v * scale for k, v in counts.items()} for key, counts in self._counts.items()}
+
+    def scores(
+        self,
+        am: Union[str, List[str]] = "pmi",
+        word_freq_cutoff: int = 10,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+    ) -> Dict[str, Dict]:
+        """Association scores of the compounds in the window. Only compounds whose counts or word counts
+        changed since the last call are refreshed.
+
+        Args:
+            am: Association measure, or a list of them. See snlp.mwes.am.calculate_am.
+            word_freq_cutoff: Compounds with a word whose weighted count is word_freq_cutoff or less get a
+                              score of 0.0.
+            top_k: If given, only the top_k compounds of every type are returned.
+            min_score: If given, only compounds with a score greater than or equal to min_score are returned.
+
+        Returns:
+            res: Same as calculate_am.
+        """
+        ams = check_ams(am)
+        if self._num_words <= 0:
+            return _format_scores({a: {mt: {} for mt in self.mwe_types} for a in ams}, am)
+        num_updated = self._state.refresh(self._counts)
+        logger.info(f"Refreshed the scores of {num_updated} compounds.")
+        # Rows of expired compounds are dropped once they make up most of the rows.
+        if 2 * sum(len(self._counts[mt]) for mt in self.mwe_types) < self._state.num_rows:
+            self._state.prune()
+        return self._state.scores(
+            self._counts, am, word_freq_cutoff, top_k, min_score, num_words=self._num_words, scale=self._scale()
+        )
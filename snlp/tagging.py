@@ -0,0 +1,238 @@
+import hashlib
+import os
+import sqlite3
+import time
+from typing import List, Optional, Tuple
+
+import nltk
+from snlp import logger
+
+
+class TagCache(object):
+    def __init__(self, path: str, max_entries: int = 5000000, commit_every: int = 10000) -> None:
+        """On-disk cache of POS tags, keyed by a hash of the token sequence and backed by sqlite.
+
+        The cache can be shared across runs and across processes. Entries are evicted in least recently
+        used order once there are more than max_entries of them.
+
+        Args:
+            path: Path to the sqlite file. It is created if it does not exist.
+            max_entries: Maximum number of tagged sentences kept in the cache.
+            commit_every: Number of pending writes after which they are committed to disk.
+
+        Returns:
+            None
+        """
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be a positive integer. Currently it is {max_entries}.")
+        self.path = path
+        self.max_entries = max_entries
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._new = {}
+        self._used = []
+
+    def __getstate__(self) -> dict:
+        # Only the settings are shipped to worker processes, which open their own connection.
+        self.flush()
+        return {"path": self.path, "max_entries": self.max_entries, "commit_every": self.commit_every}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Helper method to open the sqlite connection on first use.
+
+        Args:
+            None
+
+        Returns:
+            conn (sqlite3.Connection)
+        """
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tags (key BLOB PRIMARY KEY, tags TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS tags_last_used ON tags (last_used)")
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def _key(tokens: List[str]) -> bytes:
+        return hashlib.blake2b("\x00".join(tokens).encode("utf-8"), digest_size=16).digest()
+
+    def get(self, tokens: List[str]) -> Optional[List[str]]:
+        """Look up the POS tags of tokens.
+
+        Args:
+            tokens: A tokenized sentence, i.e. list of tokens.
+
+        Returns:
+            tags: List of POS tags, one per token, or None if tokens are not in the cache.
+        """
+        key = self._key(tokens)
+        if key in self._new:
+            row = self._new[key]
+        else:
+            row = self._connect().execute("SELECT tags FROM tags WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        tags = row[0].split(" ")
+        if len(tags) != len(tokens):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used.append((time.time(), key))
+        self._maybe_flush()
+        return tags
+
+    def put(self, tokens: List[str], tags: List[str]) -> None:
+        """Store the POS tags of tokens.
+
+        Args:
+            tokens: A tokenized sentence, i.e. list of tokens.
+            tags: List of POS tags, one per token.
+
+        Returns:
+            None
+        """
+        self._new[self._key(tokens)] = (" ".join(tags), time.time())
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if len(self._new) + len(self._used) >= self.commit_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write pending entries to disk and evict the least recently used entries above max_entries.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if not self._new and not self._used:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO tags (key, tags, last_used) VALUES (?, ?, ?)",
+                ((key, tags, last_used) for key, (tags, last_used) in self._new.items()),
+            )
+            conn.executemany("UPDATE tags SET last_used = ? WHERE key = ?", self._used)
+            excess = conn.execute("SELECT COUNT(*) FROM tags").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM tags WHERE key IN (SELECT key FROM tags ORDER BY last_used LIMIT ?)", (excess,)
+                )
+        self._new = {}
+        self._used = []
+
+    def record(self, hits: int, misses: int) -> None:
+        """Add hits and misses counted elsewhere, e.g. in a worker process, to the statistics of this cache.
+
+        Args:
+            hits: Number of cache hits.
+            misses: Number of cache misses.
+
+        Returns:
+            None
+        """
+        self.hits += hits
+        self.misses += misses
+
+    def stats(self) -> dict:
+        """Return hit/miss statistics of this cache instance and the number of stored entries.
+
+        Args:
+            None
+
+        Returns:
+            stats: Dictionary with hits, misses, hit_rate and entries.
+        """
+        self.flush()
+        entries = self._connect().execute("SELECT COUNT(*) FROM tags").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": float(self.hits) / float(lookups) if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def clear(self) -> None:
+        """Remove all entries from the cache and reset its statistics.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._new = {}
+        self._used = []
+        with self._connect() as conn:
+            conn.execute("DELETE FROM tags")
+        self.hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        """Flush pending entries and close the sqlite connection.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def pos_tag(tokens: List[str], cache: Optional[TagCache] = None) -> List[Tuple[str, str]]:
+    """POS tag tokens with nltk.pos_tag, looking the tags up in cache first if one is given.
+
+    Args:
+        tokens: A tokenized sentence, i.e. list of tokens.
+        cache: Optional TagCache. Tags that are not in the cache are computed and added to it.
+
+    Returns:
+        postag_tokens: List of (token, tag) tuples.
+    """
+    if cache is None:
+        return nltk.pos_tag(tokens)
+    tags = cache.get(tokens)
+    if tags is not None:
+        return list(zip(tokens, tags))
+    postag_tokens = nltk.pos_tag(tokens)
+    cache.put(tokens, [t[1] for t in postag_tokens])
+    return postag_tokens
+
+
+def log_cache_stats(cache: Optional[TagCache]) -> None:
+    """Log the statistics of cache, if a cache is given.
+
+    Args:
+        cache: Optional TagCache.
+
+    Returns:
+        None
+    """
+    if cache is None:
+        return
+    stats = cache.stats()
+    logger.info(
+        f"POS tag cache: {stats['hits']} hits, {stats['misses']} misses "
+        f"(hit rate {stats['hit_rate']:.2%}), {stats['entries']} entries."
+    )
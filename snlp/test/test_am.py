@@ -1,16 +1,143 @@
-# import unittest
-# from snlp.mwes.am import extract_ncs_from_sent, calculate_am, get_counts
-# from snlp.mwes.am import 
+import copy
+import os
+import tempfile
+import unittest
 
+from snlp.mwes.am import calculate_am, calculate_label_am, IncrementalAM
+from snlp.mwes.count_store import CountStore
+from snlp.mwes.mwe_utils import extract_mwes_from_sent, merge_counts
+from snlp.mwes.score_index import MWEIndex
+from snlp.mwes.windowed import WindowedCounts
 
-# class TestAms(unittest.TestCase):
-#     def test_extract_nsc(self):
-#         self.assertRaises(TypeError, extract_ncs_from_sent, 5)
-#         self.assertRaises(TypeError, extract_ncs_from_sent, -2)
-#         self.assertRaises(TypeError, extract_ncs_from_sent, [1, 2, 3])
-#         self.assertRaises(TypeError, extract_ncs_from_sent, [1, 2, 'test'])
-#         self.assertRaises(ValueError, extract_ncs_from_sent, '')
 
+class TestAms(unittest.TestCase):
+    def setUp(self):
+        self.count_data = {
+            "NC": {"climate change": 12, "brain drain": 11, "cat food": 1},
+            "WORDS": {"climate": 20, "change": 30, "brain": 15, "drain": 11, "cat": 40, "food": 5, "the": 100},
+        }
 
-# if __name__ == '__main__':
-#     unittest.main()
\ No newline at end of file
+    def test_extract_mwes_from_sent(self):
+        self.assertRaises(TypeError, extract_mwes_from_sent, 5, "NC")
+        self.assertRaises(TypeError, extract_mwes_from_sent, "climate change", "NC")
+
+    def test_calculate_am_keeps_input(self):
+        count_data = copy.deepcopy(self.count_data)
+        res = calculate_am(count_data=count_data, am="npmi", mwe_types=["NC"])
+        self.assertEqual(self.count_data, count_data)
+        self.assertEqual(0.0, res["NC"]["cat food"])
+        self.assertEqual(["brain drain", "climate change", "cat food"], list(res["NC"]))
+
+    def test_calculate_am_selection(self):
+        full = calculate_am(count_data=self.count_data, am="pmi", mwe_types=["NC"])
+        top = calculate_am(count_data=self.count_data, am="pmi", mwe_types=["NC"], top_k=1)
+        self.assertEqual(list(full["NC"])[:1], list(top["NC"]))
+        res = calculate_am(count_data=self.count_data, am="pmi", mwe_types=["NC"], min_score=0.1)
+        self.assertNotIn("cat food", res["NC"])
+        res = calculate_am(count_data=self.count_data, am="pmi", mwe_types=["NC"], word_freq_cutoff=4)
+        self.assertNotEqual(0.0, res["NC"]["cat food"])
+
+    def test_calculate_am_multiple(self):
+        ams = ["pmi", "npmi", "llr", "tscore", "chi2", "dice", "pmi3"]
+        res = calculate_am(count_data=self.count_data, am=ams, mwe_types=["NC"])
+        for am in ams:
+            self.assertEqual(calculate_am(count_data=self.count_data, am=am, mwe_types=["NC"]), res[am])
+        self.assertEqual(0.85, res["dice"]["NC"]["brain drain"])
+        self.assertRaises(ValueError, calculate_am, self.count_data, "pmi1", ["NC"])
+
+    def test_calculate_am_empty(self):
+        empty = {"NC": {}, "WORDS": {}}
+        for count_data in [empty, CountStore.from_dict(empty)]:
+            self.assertEqual({"NC": {}}, calculate_am(count_data, "pmi", ["NC"]))
+            self.assertEqual({"pmi": {"NC": {}}, "llr": {"NC": {}}}, calculate_am(count_data, ["pmi", "llr"], ["NC"]))
+        self.assertEqual({"NGRAM3": {}}, calculate_am({"NGRAM3": {}, "WORDS": {}}, "pmi", ["NGRAM3"]))
+
+    def test_calculate_am_ngrams(self):
+        count_data = {
+            "NGRAM3": {"state of art": 11, "cat of art": 1},
+            "WORDS": {"state": 11, "of": 30, "art": 11, "cat": 40},
+        }
+        res = calculate_am(count_data=count_data, am=["pmi", "npmi", "dice"], mwe_types=["NGRAM3"], word_freq_cutoff=0)
+        self.assertEqual(["state of art", "cat of art"], list(res["pmi"]["NGRAM3"]))
+        self.assertEqual(0.63, res["dice"]["NGRAM3"]["state of art"])
+        self.assertRaises(ValueError, calculate_am, count_data, "llr", ["NGRAM3"])
+
+    def test_calculate_label_am(self):
+        label_counts = {
+            "pos": {"NC": {"climate change": 9, "brain drain": 1}},
+            "neg": {"NC": {"climate change": 1, "brain drain": 9, "cat food": 2}},
+        }
+        res = calculate_label_am(label_counts, ["pmi", "llr"], ["NC"], freq_cutoff=2)
+        self.assertEqual(["climate change", "brain drain"], list(res["pmi"]["pos"]["NC"]))
+        self.assertEqual("brain drain", next(iter(res["pmi"]["neg"]["NC"])))
+        self.assertEqual(0.68, res["pmi"]["pos"]["NC"]["climate change"])
+
+    def test_incremental_am(self):
+        count_data = copy.deepcopy(self.count_data)
+        state = IncrementalAM(["NC"])
+        state.refresh(count_data)
+        delta = {"NC": {"cat food": 3, "brain drain": 1}, "WORDS": {"cat": 3, "food": 7, "brain": 1, "drain": 1}}
+        merge_counts(count_data, delta)
+        state.mark_changed(delta)
+        self.assertEqual(2, state.refresh(count_data))
+        for am in ["pmi", "npmi"]:
+            self.assertEqual(calculate_am(count_data=count_data, am=am, mwe_types=["NC"]), state.scores(count_data, am))
+
+    def test_windowed_counts(self):
+        delta = {"NC": {"cat food": 3, "brain drain": 1}, "WORDS": {"cat": 3, "food": 7, "brain": 1, "drain": 1}}
+        windowed = WindowedCounts(["NC"], window=2)
+        windowed.add(1, self.count_data)
+        self.assertEqual(calculate_am(self.count_data, "pmi", ["NC"]), windowed.scores("pmi"))
+        self.assertEqual([], windowed.add(2, delta))
+        self.assertEqual([1], windowed.add(3, delta))
+        self.assertEqual({"NC": {"cat food": 6, "brain drain": 2}}, {"NC": windowed.count_data()["NC"]})
+        self.assertEqual(calculate_am(windowed.count_data(), "pmi", ["NC"], word_freq_cutoff=0), windowed.scores("pmi", 0))
+        decayed = WindowedCounts(["NC"], decay=0.5)
+        decayed.add(1, self.count_data)
+        decayed.add(2, delta)
+        self.assertEqual(6.0, decayed.count_data()["NC"]["climate change"])
+        self.assertEqual(
+            calculate_am(decayed.count_data(), "dice", ["NC"], word_freq_cutoff=0), decayed.scores("dice", 0)
+        )
+        # Without a window, counts that decayed below min_count are removed.
+        for bucket in range(3, 10):
+            decayed.add(bucket, delta)
+        count_data = decayed.count_data()
+        self.assertEqual({"brain drain", "cat food"}, set(count_data["NC"]))
+        self.assertNotIn("climate", count_data["WORDS"])
+        self.assertEqual(calculate_am(count_data, "dice", ["NC"], word_freq_cutoff=0), decayed.scores("dice", 0))
+
+    def test_count_store(self):
+        store = CountStore.from_dict(self.count_data)
+        self.assertEqual(self.count_data, store.to_dict())
+        self.assertEqual(12, store.lookup("NC", "climate", "change"))
+        self.assertIsNone(store.lookup("NC", "change", "climate"))
+        for am in ["pmi", "npmi"]:
+            self.assertEqual(calculate_am(self.count_data, am, ["NC"]), calculate_am(store, am, ["NC"]))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "count_data.store")
+            store.save(path)
+            loaded = CountStore.load(path)
+            self.assertEqual(self.count_data, loaded.to_dict())
+            self.assertEqual(11, loaded.lookup("NC", "brain", "drain"))
+        # Ties are broken in the order in which compounds were first counted, in both formats.
+        ties = {"NC": {"cat food": 1, "climate change": 1}, "WORDS": self.count_data["WORDS"]}
+        expected = calculate_am(ties, "pmi", ["NC"], word_freq_cutoff=1000)
+        self.assertEqual(["cat food", "climate change"], list(expected["NC"]))
+        res = calculate_am(CountStore.from_dict(ties), "pmi", ["NC"], word_freq_cutoff=1000)
+        self.assertEqual(list(expected["NC"]), list(res["NC"]))
+
+    def test_mwe_index(self):
+        scores = calculate_am(count_data=self.count_data, am="pmi", mwe_types=["NC"])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index = MWEIndex.build(scores, os.path.join(tmp_dir, "mwe_data.index"))
+            self.assertEqual(scores["NC"]["brain drain"], index.lookup("NC", "brain drain"))
+            self.assertIsNone(index.lookup("NC", "brain"))
+            self.assertEqual(["brain drain"], list(index.prefix("NC", "brain ")))
+            self.assertEqual(list(scores["NC"])[:2], list(index.threshold("NC", 0.1)))
+            self.assertEqual(list(scores["NC"])[:1], list(index.threshold("NC", 0.1, limit=1)))
+            self.assertRaises(ValueError, index.lookup, "JNC", "brain drain")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,66 @@
+import json
+import os
+import pickle
+import re
+import tempfile
 import unittest
+from unittest import mock
 
-from snlp.mwes.mwe_utils import get_ngrams, get_counts
+import numpy as np
+import pandas
+
+from snlp.mwes.checkpoint import CountCheckpoint
+from snlp.mwes.cooccurrence import count_cooccurrences
+from snlp.mwes import mwe_utils
+from snlp.mwes.corpus import infer_format, read_corpus_chunks
+from snlp.mwes.mwe_utils import get_ngrams, get_counts, get_counts_from_source, merge_counts, _build_mwe_trie, _replace_in_sent
+from snlp.mwes.mwe_utils import _iter_trie_matches
+from snlp.mwes.mwe_utils import MWEReplacer, replace_mwes, replace_mwes_in_source, tokenize_texts
+from snlp.mwes.ngrams import count_ngrams
+from snlp.mwes.mwe import MWE
+from snlp.mwes.patterns import MWE_PATTERNS, MWEMatcher, parse_pattern, register_mwe_type
+from snlp.mwes.result_cache import ResultCache, fingerprint
+from snlp.mwes.sketch import ApproximateCounts, MisraGries, parse_memory_size
+from snlp.mwes.spill import ExternalCounter, merge_partial_counts, write_partial_counts
+from snlp.mwes.vectorizer import MWEVectorizer
+from snlp.tagging import TagCache
+
+
+ADJECTIVES = {"black", "happy", "new", "big"}
+CORPUS = [
+    "the black sheep saw climate change",
+    "climate change is a big problem",
+    "a happy cat ate cat food",
+    "brain drain and climate change",
+    "the new cat food is here",
+    "brain drain is a big problem",
+    "black sheep",
+]
+
+
+def _fake_pos_tag(tokens, *args, **kwargs):
+    """Deterministic stand-in for nltk.pos_tag, so that the tests do not need the nltk tagger data."""
+    tags = []
+    for t in tokens:
+        if t in ADJECTIVES:
+            tags.append("JJ")
+        elif t in {"the", "a"}:
+            tags.append("DT")
+        elif t in {"is", "saw", "ate", "and"}:
+            tags.append("VBZ")
+        else:
+            tags.append("NN")
+    return list(zip(tokens, tags))
+
+
+def _fake_word_tokenize(text, *args, **kwargs):
+    """Stand-in for nltk.word_tokenize that splits off punctuation, so that the tests do not need the punkt data."""
+    return re.findall(r"\w+|[^\w\s]", text)
+
+
+def _column_address(df, column):
+    """Address of the buffer of a column, without keeping a reference to it that would trigger copy-on-write."""
+    return df[column].array._ndarray.__array_interface__["data"][0]
 
 
 class TestUtils(unittest.TestCase):
@@ -14,6 +74,408 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(["Cat sat", "sat on", "on mat"], get_ngrams(sentence="Cat sat on mat", n=2))
         self.assertEqual(["happy cat"], get_ngrams(sentence="happy cat", n=2))
         self.assertEqual([], get_ngrams(sentence="cat", n=2))
+
+    def test_merge_counts(self):
+        res = {"NC": {"climate change": 2}, "WORDS": {"climate": 2, "change": 2}}
+        partial = {"NC": {"climate change": 1, "brain drain": 1}, "WORDS": {"climate": 1, "brain": 1}}
+        merge_counts(res, partial)
+        self.assertEqual({"climate change": 3, "brain drain": 1}, res["NC"])
+        self.assertEqual({"climate": 3, "change": 2, "brain": 1}, res["WORDS"])
+
+    @mock.patch("nltk.pos_tag", _fake_pos_tag)
+    def test_get_counts_parallel(self):
+        df = pandas.DataFrame({"text": CORPUS})
+        serial = get_counts(df, "text", ["NC", "JNC"])
+        self.assertEqual(3, serial["NC"]["climate change"])
+        self.assertEqual(serial, get_counts(df, "text", ["NC", "JNC"], n_jobs=2, chunk_size=2))
+
+    @mock.patch("nltk.pos_tag", _fake_pos_tag)
+    def test_get_counts_store(self):
+        df = pandas.DataFrame({"text": CORPUS})
+        expected = get_counts(df, "text", ["NC", "JNC"])
+        store = get_counts(df, "text", ["NC", "JNC"], chunk_size=3, return_store=True)
+        self.assertEqual(expected, store.to_dict())
+        self.assertEqual(list(expected["NC"]), list(store.to_dict()["NC"]))
+        self.assertEqual(list(expected["WORDS"]), list(store.vocab))
+
+    @mock.patch("nltk.pos_tag", _fake_pos_tag)
+    def test_get_counts_labelled(self):
+        df = pandas.DataFrame({"text": CORPUS, "label": ["pos", "neg", "neg", "pos", "neg", "pos", "neg"]})
+        expected = {label: get_counts(df[df["label"] == label], "text", ["NC", "JNC"]) for label in ["pos", "neg"]}
+        for n_jobs in [1, 2]:
+            res = get_counts(df, "text", ["NC", "JNC"], n_jobs=n_jobs, chunk_size=2, label_column="label")
+            self.assertEqual(expected, res)
+        self.assertRaises(ValueError, get_counts, df, "text", ["NC"], label_column="label", return_store=True)
+
+    @mock.patch("nltk.pos_tag", _fake_pos_tag)
+    def test_read_corpus(self):
+        self.assertEqual("tsv", infer_format("data/train.TSV.gz"))
+        self.assertEqual("jsonl", infer_format("train.json"))
+        self.assertRaises(ValueError, infer_format, "train.parquet")
+        df = pandas.DataFrame({"label": range(len(CORPUS)), "text": CORPUS})
+        expected = get_counts(df, "text", ["NC"])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, "corpus.csv")
+            jsonl_path = os.path.join(tmp_dir, "corpus.jsonl.gz")
+            df.to_csv(csv_path, index=False)
+            df.to_json(jsonl_path, orient="records", lines=True)
+            for path in [csv_path, jsonl_path]:
+                chunks = list(read_corpus_chunks(path, "text", chunk_size=3))
+                self.assertEqual([3, 3, 1], [len(c) for c in chunks])
+                self.assertEqual(CORPUS, [t for c in chunks for t in c["text"]])
+                self.assertEqual(expected, get_counts_from_source(path, "text", ["NC"], chunk_size=3))
+            self.assertRaises(KeyError, list, read_corpus_chunks(csv_path, "content"))
+            mwes_path = os.path.join(tmp_dir, "mwe_data.json")
+            with open(mwes_path, "w") as file:
+                json.dump({"NC": {"climate change": 0.9, "cat food": 0.1}}, file)
+            output_path = os.path.join(tmp_dir, "replaced.jsonl")
+            replace_mwes_in_source(mwes_path, ["NC"], csv_path, output_path, "text", chunk_size=3)
+            replaced = pandas.read_json(output_path, lines=True)
+            self.assertEqual(list(range(len(CORPUS))), replaced["label"].tolist())
+            self.assertEqual(replace_mwes(mwes_path, ["NC"], df.copy(), "text")["text"].tolist(), replaced["text"].tolist())
+
+    def test_mwe_matcher(self):
+        tagged = [("the", "DT"), ("black", "JJ"), ("sheep", "NN"), ("climate", "NN"), ("change", "NN"), ("!", ".")]
+        res = MWEMatcher(["NC", "JNC"]).match(tagged)
+        self.assertEqual({"sheep climate": 1, "climate change": 1}, dict(res["NC"]))
+        self.assertEqual({"black sheep": 1}, dict(res["JNC"]))
+        pruned = MWEMatcher(["NC", "JNC"], vocab={"sheep", "climate", "change"})
+        self.assertEqual({"sheep climate": 1, "climate change": 1}, dict(pruned.match(tagged)["NC"]))
+        self.assertEqual({}, dict(pruned.match(tagged)["JNC"]))
+        self.assertFalse(pruned.has_candidates(["black", "sheep", "!", "climate"]))
+        self.assertEqual((frozenset(["JJ"]), frozenset(["NN", "NNS"])), parse_pattern("JJ NN|NNS"))
+        self.assertRaises(ValueError, parse_pattern, "NN")
+
+    @mock.patch.dict(MWE_PATTERNS)
+    def test_binary_storage_types(self):
+        register_mwe_type("NPN", "NN IN NN")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.assertRaises(ValueError, MWE, None, "text", ["NC", "NPN"], output_dir=tmp_dir, storage="binary")
+            self.assertEqual(["NPN"], MWE(None, "text", ["NPN"], output_dir=tmp_dir).mwe_types)
+
+    def test_count_ngrams(self):
+        texts = ["the state of the art", "state of the art , state of mind", "the art"]
+        index = count_ngrams(texts, max_n=4, min_count=2)
+        count_data = index.to_count_data()
+        self.assertEqual({"state of": 3, "of the": 2, "the art": 3}, count_data["NGRAM2"])
+        self.assertEqual({"state of the": 2, "of the art": 2}, count_data["NGRAM3"])
+        self.assertEqual({"state of the art": 2}, count_data["NGRAM4"])
+        self.assertEqual(2, index.lookup("state of the art"))
+        self.assertIsNone(index.lookup("of mind"))
+        self.assertEqual({"state of the": 2}, index.continuations("state", 3))
+
+    @mock.patch("nltk.pos_tag", _fake_pos_tag)
+    def test_mwe_ngram_types(self):
+        df = pandas.DataFrame({"text": CORPUS})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mwe = MWE(df, "text", ["NC", "NGRAM2", "NGRAM3"], output_dir=tmp_dir)
+            mwe.build_counts()
+            with open(mwe.count_file) as file:
+                count_data = json.load(file)
+            expected = count_ngrams(CORPUS, max_n=3, min_count=2).to_count_data()
+            self.assertEqual(get_counts(df, "text", ["NC"]), {k: count_data[k] for k in ["NC", "WORDS"]})
+            self.assertEqual(expected["NGRAM2"], count_data["NGRAM2"])
+            self.assertEqual(expected["NGRAM3"], count_data["NGRAM3"])
+            mwe.extract_mwes(am="pmi", word_freq_cutoff=0)
+            with open(mwe.mwe_file) as file:
+                self.assertIn("big problem", json.load(file)["NGRAM2"])
+            self.assertRaises(ValueError, mwe.build_counts, partial=True)
+            self.assertRaises(ValueError, mwe.update_counts, df)
+            self.assertRaises(ValueError, register_mwe_type, "NGRAM5", "NN NN")
+            self.assertRaises(ValueError, MWE, df, "text", ["NGRAM1"], output_dir=tmp_dir)
+
+    @mock.patch("nltk.pos_tag")
+    def test_mwe_ngram_types_skip_tagging(self, tagger):
+        df = pandas.DataFrame({"text": CORPUS})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mwe = MWE(df, "text", ["NGRAM2"], output_dir=tmp_dir)
+            mwe.build_counts()
+            with open(mwe.count_file) as file:
+                count_data = json.load(file)
+        tagger.assert_not_called()
+        self.assertEqual(get_counts(df, "text", [])["WORDS"], count_data["WORDS"])
+        self.assertEqual(count_ngrams(CORPUS, max_n=2, min_count=2).to_count_data()["NGRAM2"], count_data["NGRAM2"])
+
+    def test_count_cooccurrences(self):
+        texts = ["make a decision", "make the final decision , now", "decision make"]
+        cooccurrences = count_cooccurrences(texts, window=3, batch_size=2)
+        self.assertEqual(2, cooccurrences.lookup("make", "decision"))
+        self.assertEqual(1, cooccurrences.lookup("decision", "make"))
+        self.assertEqual(0, cooccurrences.lookup("a", "now"))
+        self.assertEqual(3, cooccurrences.word_counts[cooccurrences.word_ids["decision"]])
+        self.assertEqual("make decision", next(iter(cooccurrences.scores("pmi", word_freq_cutoff=0, min_count=2))))
+        # Summing equal pairs after every batch gives the same matrix as summing them once at the end.
+        with mock.patch("snlp.mwes.cooccurrence.COMPACT_PAIRS", 1):
+            compacted = count_cooccurrences(texts, window=3, batch_size=1)
+        self.assertEqual(0, (cooccurrences.matrix != compacted.matrix).nnz)
+        # Independent words have a pmi of about 0 for a window larger than 1 as well.
+        rng = np.random.RandomState(0)
+        vocab = [f"w{i}" for i in range(10)]
+        texts = [" ".join(rng.choice(vocab, size=200)) for _ in range(200)]
+        scores = count_cooccurrences(texts, window=3).scores("pmi", word_freq_cutoff=0)
+        self.assertEqual(100, len(scores))
+        self.assertLess(np.abs(list(scores.values())).max(), 0.1)
+
+    def test_replace_longest_match(self):
+        good_mwes = {"state of", "state of the art", "the art"}
+        trie = _build_mwe_trie(good_mwes)
+        sent = "the state of the art and a state of mind"
+        self.assertEqual("the state-of-the-art and a state-of mind", _replace_in_sent(sent, trie, False, False))
+        self.assertEqual("state-of-the-art state-of", _replace_in_sent(sent, trie, True, False))
+        self.assertEqual("statement of the arts", _replace_in_sent("statement of the arts", trie, False, False))
+        trie = _build_mwe_trie(["state of", "state of the art", "the art"])
+        self.assertEqual([(1, 5, 1), (7, 9, 0)], list(_iter_trie_matches(sent.split(" "), trie)))
+
+    def test_mwe_replacer(self):
+        replacer = MWEReplacer({"state of", "state of the art"}, lower_case=True)
+        self.assertEqual("the state-of-the-art", replacer.replace("The State of the art"))
+        self.assertEqual(["state-of mind", "art"], replacer.replace_batch(["state of mind", "art"]))
+        self.assertRaises(AttributeError, setattr, replacer, "only_mwes", True)
+        loaded = pickle.loads(pickle.dumps(replacer))
+        self.assertEqual(replacer.mwes, loaded.mwes)
+        self.assertEqual("state-of-the-art", loaded.replace("state of the art"))
+
+    def test_replace_mwes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "mwe_data.json")
+            with open(path, "w") as file:
+                json.dump({"NC": {"climate change": 0.9, "cat food": 0.1}}, file)
+            df = pandas.DataFrame({"text": ["climate change is real", "cat food", "climate change"]}, index=[3, 1, 2])
+            expected = ["climate-change is real", "cat food", "climate-change"]
+            new_df = replace_mwes(path, ["NC"], df, "text", chunk_size=2, copy=True)
+            self.assertEqual(expected, new_df["text"].tolist())
+            self.assertEqual("climate change", df["text"].iloc[2])
+            # In place, the column is written chunk by chunk into the same buffer instead of being copied.
+            for dtype in [None, object]:
+                df = pandas.DataFrame({"text": ["climate change is real", "cat food", "climate change"]}, dtype=dtype)
+                address = _column_address(df, "text")
+                self.assertIs(df, replace_mwes(path, ["NC"], df, "text", chunk_size=2))
+                self.assertEqual(expected, df["text"].tolist())
+                self.assertEqual(address, _column_address(df, "text"))
+            # Other dtypes cannot hold the new sentences, so the whole column is replaced.
+            df = pandas.DataFrame({"text": ["climate change is real", "cat food", "climate change"]}, dtype="category")
+            self.assertIs(df, replace_mwes(path, ["NC"], df, "text", chunk_size=2))
+            self.assertEqual(expected, df["text"].tolist())
+
+    def test_mwe_vectorizer(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "mwe_data.json")
+            with open(path, "w") as file:
+                json.dump({"NC": {"climate change": 0.9, "state of the art": 0.8, "state of": 0.7, "cat food": 0.1}}, file)
+            vectorizer = MWEVectorizer.from_file(path, ["NC"])
+            self.assertEqual(["climate change", "state of", "state of the art"], vectorizer.get_feature_names_out().tolist())
+            texts = ["climate change and climate change", "cat food", "state of the art , state of mind"]
+            matrix = vectorizer.transform(texts, batch_size=2)
+            self.assertEqual((3, 3), matrix.shape)
+            self.assertEqual([[2, 0, 0], [0, 0, 0], [0, 1, 1]], matrix.toarray().tolist())
+            binary = MWEVectorizer(vectorizer.mwes, binary=True).transform(texts)
+            self.assertEqual([[1, 0, 0], [0, 0, 0], [0, 1, 1]], binary.toarray().tolist())
+
+    def test_approximate_counts(self):
+        table = MisraGries(capacity=2)
+        table.add({"a b": 10, "c d": 1, "e f": 1, "g h": 5, "i j": 1})
+        self.assertEqual({"a b", "g h"}, set(table.counts))
+        self.assertLessEqual(table.error, table.total / 3.0)
+        counts = ApproximateCounts(["NC"], memory_budget="64KB")
+        counts.add({"NC": {"climate change": 3, "brain drain": 1}, "WORDS": {"climate": 3, "change": 4}})
+        count_data = counts.to_count_data()
+        self.assertEqual({"climate change": 3, "brain drain": 1}, count_data["NC"])
+        self.assertLessEqual(3, count_data["WORDS"]["climate"])
+        self.assertEqual(7, counts.num_words)
+        self.assertEqual(8 * 1024 ** 3, parse_memory_size("8GB"))
+
+    def test_external_counter(self):
+        partials = [
+            {"NC": {"climate change": 2}, "WORDS": {"climate": 2, "change": 2}},
+            {"NC": {"brain drain": 1, "climate change": 1}, "WORDS": {"brain": 1, "drain": 1, "climate": 1}},
+            {"NC": {"brain drain": 3}, "WORDS": {"brain": 3, "drain": 3, "change": 1}},
+        ]
+        expected = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with ExternalCounter(["NC"], memory_limit=1, tmp_dir=tmp_dir) as counter:
+                for partial in partials:
+                    counter.add(partial)
+                    merge_counts(expected, partial)
+                self.assertEqual(3, len(counter.runs["NC"]))
+                res = counter.to_count_store().to_dict()
+                self.assertEqual(expected, res)
+                # Words and compounds are in the order in which they were first counted, as in memory.
+                self.assertEqual(["climate", "change", "brain", "drain"], list(res["WORDS"]))
+                self.assertEqual(["climate change", "brain drain"], list(res["NC"]))
+
+    def test_partial_counts(self):
+        first = {"NC": {"climate change": 2}, "WORDS": {"climate": 2, "change": 3}}
+        second = {"NC": {"climate change": 1, "brain drain": 4}, "WORDS": {"climate": 1, "brain": 4, "drain": 4}}
+        expected = merge_counts(merge_counts({"NC": {}, "WORDS": {}}, first), second)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [os.path.join(tmp_dir, f"{i}.partial") for i in range(2)]
+            write_partial_counts(first, paths[0])
+            write_partial_counts(second, paths[1])
+            self.assertEqual(expected, merge_partial_counts(paths).to_dict())
+            self.assertEqual(list(expected["WORDS"]), list(merge_partial_counts(paths).to_dict()["WORDS"]))
+            reverse = merge_partial_counts(paths[::-1]).to_dict()
+            self.assertEqual(["climate", "brain", "drain", "change"], list(reverse["WORDS"]))
+            merged = os.path.join(tmp_dir, "merged.partial")
+            merge_partial_counts(paths, output_path=merged)
+            self.assertEqual(expected, merge_partial_counts([merged]).to_dict())
+            self.assertEqual(list(expected["WORDS"]), list(merge_partial_counts([merged]).to_dict()["WORDS"]))
+            # Chained merges of interleaved shards keep the order of a flat merge.
+            shards = [
+                {"NC": {"cat food": 1, "brain drain": 2}, "WORDS": {"cat": 1, "food": 1, "brain": 2, "drain": 2}},
+                {"NC": {"dog food": 3, "brain drain": 1}, "WORDS": {"dog": 3, "food": 3, "brain": 1, "drain": 1}},
+                {"NC": {"art work": 1, "cat food": 2}, "WORDS": {"art": 1, "work": 1, "cat": 2, "food": 2}},
+            ]
+            shard_paths = [os.path.join(tmp_dir, f"shard{i}.partial") for i in range(3)]
+            for shard, path in zip(shards, shard_paths):
+                write_partial_counts(shard, path)
+            flat = merge_partial_counts(shard_paths).to_dict()
+            merge_partial_counts(shard_paths[:2], output_path=merged)
+            chained = merge_partial_counts([merged, shard_paths[2]]).to_dict()
+            self.assertEqual(flat, chained)
+            self.assertEqual(list(flat["WORDS"]), list(chained["WORDS"]))
+            self.assertEqual(list(flat["NC"]), list(chained["NC"]))
+            self.assertEqual(["cat food", "brain drain", "dog food", "art work"], list(chained["NC"]))
+            write_partial_counts({"JNC": {}, "WORDS": {}}, paths[1])
+            self.assertRaises(ValueError, merge_partial_counts, paths)
+            # Run files are JSON lines, and partials of older, pickled versions are rejected.
+            with open(os.path.join(paths[0], "WORDS.run")) as file:
+                self.assertEqual([["change", 3, 1], ["climate", 2, 0]], json.loads(file.readline()))
+            with open(os.path.join(paths[0], "partial.json"), "w") as file:
+                json.dump({"format": "snlp-partial-counts", "version": 1, "mwe_types": ["NC"]}, file)
+            self.assertRaises(ValueError, merge_partial_counts, paths[:1])
+
+    @mock.patch("nltk.pos_tag", _fake_pos_tag)
+    def test_build_partial_counts(self):
+        df = pandas.DataFrame({"text": CORPUS})
+        expected = get_counts(df, "text", ["NC", "JNC"])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mwe = MWE(df, "text", ["NC", "JNC"], output_dir=tmp_dir)
+            self.assertRaises(ValueError, mwe.build_counts, partial=True, word_freq_cutoff=1)
+            for memory_limit in [None, 1]:
+                mwe.build_counts(partial=True, chunk_size=2, memory_limit=memory_limit)
+                res = merge_partial_counts([mwe.count_file]).to_dict()
+                self.assertEqual(expected, res)
+                self.assertEqual([list(c) for c in expected.values()], [list(c) for c in res.values()])
+
+    def test_count_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "counts", "count_data.checkpoint")
+            checkpoint = CountCheckpoint(path, every=2, params={"mwe_types": ["NC"]})
+            self.assertIsNone(checkpoint.load())
+            checkpoint.save({"NC": {"climate change": 1}, "WORDS": {"climate": 1, "change": 1}}, 20)
+            counts, offset = checkpoint.load()
+            self.assertEqual(20, offset)
+            self.assertEqual({"climate change": 1}, counts["NC"])
+            self.assertRaises(ValueError, CountCheckpoint(path, params={"mwe_types": ["JNC"]}).load)
+            checkpoint.clear()
+            self.assertFalse(os.path.exists(path))
+
+    @mock.patch("nltk.pos_tag", _fake_pos_tag)
+    def test_build_counts_resume(self):
+        count_shard = mwe_utils._count_shard
+        calls = []
+
+        def _interrupted_shard(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            return count_shard(*args, **kwargs)
+
+        df = pandas.DataFrame({"text": CORPUS})
+        for word_freq_cutoff in [None, 1]:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                fresh = MWE(df, "text", ["NC", "JNC"], output_dir=os.path.join(tmp_dir, "fresh"))
+                fresh.build_counts(chunk_size=2, word_freq_cutoff=word_freq_cutoff)
+                mwe = MWE(df, "text", ["NC", "JNC"], output_dir=os.path.join(tmp_dir, "resumed"))
+                kwargs = {"chunk_size": 2, "word_freq_cutoff": word_freq_cutoff, "checkpoint_every": 1}
+                calls.clear()
+                with mock.patch.object(mwe_utils, "_count_shard", _interrupted_shard):
+                    self.assertRaises(KeyboardInterrupt, mwe.build_counts, **kwargs)
+                    self.assertTrue(os.path.exists(mwe.checkpoint_file))
+                    self.assertFalse(os.path.exists(mwe.count_file))
+                    calls.clear()
+                    mwe.build_counts(resume=True, **kwargs)
+                # Only the last two of four chunks are counted again.
+                self.assertEqual(2, len(calls))
+                self.assertFalse(os.path.exists(mwe.checkpoint_file))
+                with open(fresh.count_file) as file:
+                    expected = json.load(file)
+                with open(mwe.count_file) as file:
+                    res = json.load(file)
+                self.assertEqual(expected, res)
+                self.assertEqual([list(c) for c in expected.values()], [list(c) for c in res.values()])
+
+    @mock.patch("snlp.mwes.mwe_utils.word_tokenize", _fake_word_tokenize)
+    def test_tokenize_texts(self):
+        texts = [f"Sentence {i}, with climate change!" for i in range(7)]
+        expected = [f"Sentence {i} , with climate change !" for i in range(7)]
+        self.assertEqual(expected, tokenize_texts(texts, chunk_size=3))
+        self.assertEqual(expected, tokenize_texts(texts, n_jobs=2, chunk_size=3))
+        self.assertEqual([], tokenize_texts([], n_jobs=2))
+
+    @mock.patch("nltk.pos_tag", _fake_pos_tag)
+    def test_mwe_tokenize(self):
+        raw = pandas.DataFrame({"text": ["Climate change, again.", "Brain drain!"]})
+        calls = []
+
+        def _counted_word_tokenize(text, *args, **kwargs):
+            calls.append(text)
+            return _fake_word_tokenize(text)
+
+        with tempfile.TemporaryDirectory() as tmp_dir, mock.patch(
+            "snlp.mwes.mwe_utils.word_tokenize", _counted_word_tokenize
+        ):
+            cache = ResultCache(os.path.join(tmp_dir, "cache"))
+            mwe = MWE(raw.copy(), "text", ["NC"], output_dir=tmp_dir, tokenize=True, cache=cache)
+            self.assertEqual(["Climate change , again .", "Brain drain !"], mwe.df["text"].tolist())
+            self.assertEqual(2, len(calls))
+            # The same corpus is read from the cache instead of being tokenized again.
+            again = MWE(raw.copy(), "text", ["NC"], output_dir=tmp_dir, tokenize=True, cache=cache)
+            self.assertEqual(mwe.df["text"].tolist(), again.df["text"].tolist())
+            self.assertEqual(2, len(calls))
+            # New data of update_counts is tokenized as well, without changing new_df.
+            mwe.build_counts()
+            new_df = pandas.DataFrame({"text": ["Brain drain, again."]})
+            mwe.update_counts(new_df)
+            self.assertEqual(3, len(calls))
+            self.assertEqual("Brain drain, again.", new_df["text"].iloc[0])
+            with open(mwe.count_file) as file:
+                count_data = json.load(file)
+            self.assertEqual({"Climate change": 1, "Brain drain": 2}, count_data["NC"])
+            self.assertEqual(2, count_data["WORDS"][","])
+
+    def test_result_cache(self):
+        self.assertEqual(fingerprint({"a": 1, "b": 2}), fingerprint({"b": 2, "a": 1}))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ResultCache(os.path.join(tmp_dir, "cache"), max_size=10)
+            path = os.path.join(tmp_dir, "count_data.json")
+            for key, content in [("a", "123456"), ("b", "7890")]:
+                with open(path, "w") as file:
+                    file.write(content)
+                cache.put(key, [path])
+            target = os.path.join(tmp_dir, "out", "count_data.json")
+            self.assertTrue(cache.get("a", [target]))
+            with open(target) as file:
+                self.assertEqual("123456", file.read())
+            cache.put("c", [path])
+            self.assertEqual(["c", "a"], [e["key"] for e in cache.info()["entries"]])
+            self.assertFalse(cache.get("b", [target]))
+            cache.clear()
+            self.assertEqual([], cache.info()["entries"])
+
+    def test_tag_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = TagCache(os.path.join(tmp_dir, "tags.db"), max_entries=2)
+            self.assertIsNone(cache.get(["climate", "change"]))
+            cache.put(["climate", "change"], ["NN", "NN"])
+            self.assertEqual(["NN", "NN"], cache.get(["climate", "change"]))
+            cache.put(["black", "sheep"], ["JJ", "NN"])
+            cache.put(["cat", "sat"], ["NN", "VBD"])
+            stats = cache.stats()
+            self.assertEqual(2, stats["entries"])
+            self.assertEqual(1, stats["hits"])
+            self.assertEqual(1, stats["misses"])
+            cache.close()
         
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,6 +1,5 @@
 import string
-from typing import List, Tuple
-import nltk
+from typing import List, Optional, Tuple
 import time
 from statistics import median
 import os
@@ -14,6 +13,7 @@ import fasttext
 
 from wordcloud import WordCloud, get_single_color_func
 from snlp import logger
+from snlp.tagging import TagCache, pos_tag, log_cache_stats
 from tqdm import tqdm
 from nltk.corpus import stopwords
 from plotly.subplots import make_subplots
@@ -392,6 +392,7 @@ def do_analysis(
     language: str = "english",
     skip_stopwords_punc: bool = True,
     save_report: bool = False,
+    tag_cache: Optional[TagCache] = None,
 ) -> None:
     """Generate analysis report and eitherr renders the report via Plotly show api or saves it offline to html.
 
@@ -404,6 +405,7 @@ def do_analysis(
         language (str): Language of the text in df[text_col]
         skip_stopwords_punc (bool): Whether or not skip stopwords and punctuations in the analysis. Default: True
         save_report (bool): Whether or not save the report as an html file. Default: False
+        tag_cache (snlp.tagging.TagCache): Optional cache in which POS tags are looked up before calling the tagger.
 
     Returns:
         None
@@ -472,14 +474,15 @@ def do_analysis(
             logger.warning("Processing entry --- %s --- lead to exception: %s" % (text, e.args[0]))
             continue
 
-        postag_tokens = nltk.pos_tag(tokens)
+        postag_tokens = pos_tag(tokens, cache=tag_cache)
         nouns = get_pos(postag_tokens, "NN")
         update_count(NNs, nouns)
         verbs = get_pos(postag_tokens, "VB")
         update_count(Vs, verbs)
         adjectives = get_pos(postag_tokens, "JJ")
         update_count(JJs, adjectives)
-    
+    log_cache_stats(tag_cache)
+
     freq_df = pd.DataFrame({'tokens': token_to_count.keys(), 'count':token_to_count.values()})
     freq_df['proportion'] = freq_df['count']/freq_df['count'].sum()
     vocab_size = freq_df.shape[0]